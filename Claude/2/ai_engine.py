@@ -1,24 +1,29 @@
-import ollama
+import os
+import sys
+import time
 import sqlite3
-from database import get_connection
+import database
+from perf_trace import span, record
 from campaign_logic import get_campaigns
 
-def load_chat_history():
-    conn = get_connection()
-    rows = conn.execute("SELECT role, content FROM chat_history WHERE session_id='MAIN' ORDER BY id ASC").fetchall()
-    conn.close()
-    return [{"role": r[0], "content": r[1]} for r in rows]
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))  # moduli condivisi nella root del repo
+from llm_scheduler import get_scheduler
+from chat_store import ChatStore, DEFAULT_SESSION
 
-def save_chat_message(role, content):
-    conn = get_connection()
-    conn.execute("INSERT INTO chat_history (session_id, role, content) VALUES (?,?,?)", ('MAIN', role, content))
-    conn.commit(); conn.close()
+def _chat():
+    return ChatStore(database.DB_NAME)
 
-def clear_chat_history():
-    conn = get_connection()
-    conn.execute("DELETE FROM chat_history WHERE session_id='MAIN'"); conn.commit(); conn.close()
+def load_chat_history(session_id=DEFAULT_SESSION, before_id=None):
+    """Ultima pagina della sessione (o quella prima di before_id): (messaggi, cursore per la pagina precedente)"""
+    return _chat().page(session_id, before_id)
 
-def ai_thread(msgs, sp_ctx, kb_ctx, soc_hist, resp):
+def save_chat_message(role, content, session_id=DEFAULT_SESSION):
+    return _chat().append(session_id, role, content)
+
+def clear_chat_history(session_id=DEFAULT_SESSION):
+    _chat().clear(session_id)
+
+def ai_thread(msgs, sp_ctx, kb_ctx, soc_hist, resp, session_id=DEFAULT_SESSION):
     c=get_campaigns(); sp=c['spend'].sum() if not c.empty else 0; rv=c['revenue'].sum() if not c.empty else 0
     
     sys = f"""SEI UN MANAGER DI ETICHETTA DISCOGRAFICA (Data-Driven).
@@ -39,9 +44,20 @@ def ai_thread(msgs, sp_ctx, kb_ctx, soc_hist, resp):
     """
     
     try:
-        # Usa un modello veloce se mistral-nemo è pesante, altrimenti lascia mistral-nemo
-        for ch in ollama.chat(model="mistral-nemo", messages=[{'role':'system','content':sys}]+msgs, stream=True):
-            resp['content']+=ch['message']['content']
-        save_chat_message('assistant', resp['content'])
+        llm = get_scheduler()  # coda unica (chat prima dei batch) verso il modello tenuto caldo
+        with span("ai_thread", model=llm.active_model(), prompt_chars=len(sys)) as sp:
+            t0 = time.perf_counter(); t_first = None; n_tok = 0
+            ticket = llm.submit([{'role':'system','content':sys}]+[{'role':m['role'],'content':m['content']} for m in msgs])
+            for text in ticket.stream():
+                if t_first is None: t_first = time.perf_counter()
+                n_tok += 1  # in streaming ollama manda ~un token per chunk
+                resp['content']+=text
+            # Tempo al primo token e velocità di generazione (rows = token -> token/s nella pagina Performance)
+            if t_first is not None:
+                record("ai_thread.queue_wait", ticket.wait_ms or 0)
+                record("ai_thread.ttft", (t_first - t0) * 1000)
+                record("ai_thread.generate", (time.perf_counter() - t_first) * 1000, rows=n_tok)
+            sp.rows = n_tok
+            save_chat_message('assistant', resp['content'], session_id)
         resp['done']=True
     except Exception as e: resp['content']+=f"Errore AI: {str(e)}"; resp['done']=True
\ No newline at end of file
@@ -1,18 +1,12 @@
 import pandas as pd
-import sqlite3
+import numpy as np
 from datetime import datetime, timedelta
-from database import get_connection
+from database import get_connection, cached_read
+import storage
 
 def get_campaigns():
-    conn = get_connection()
-    try:
-        # Recupera campagne ordinate per data inizio
-        df = pd.read_sql_query("SELECT * FROM campaigns ORDER BY start_date DESC", conn)
-        return df
-    except:
-        return pd.DataFrame()
-    finally:
-        conn.close()
+    # Recupera campagne ordinate per data inizio (in cache finché non cambia 'campaigns')
+    return cached_read("SELECT * FROM campaigns ORDER BY start_date DESC", ("campaigns",))
 
 def save_campaign(d):
     """
@@ -36,29 +30,9 @@ def save_campaign(d):
     e_date = d.get('end_date', (datetime.now() + timedelta(days=7)).strftime('%Y-%m-%d'))
 
     try:
-        # Query dinamica che crea la tabella se non esiste con le nuove colonne data
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS campaigns (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT,
-                platform TEXT,
-                status TEXT,
-                budget REAL,
-                spend REAL,
-                revenue REAL,
-                roas REAL,
-                impressions INTEGER,
-                clicks INTEGER,
-                streams INTEGER,
-                start_date TEXT,
-                end_date TEXT
-            )
-        """)
-        
-        conn.execute("""
-            INSERT INTO campaigns (name, platform, status, budget, spend, revenue, roas, impressions, clicks, streams, start_date, end_date) 
-            VALUES (?,?,?,?,?,?,?,?,?,?,?,?)
-        """, (d['name'], d['platform'], 'Active', d['budget'], d['spend'], estimated_revenue, roas, d['impressions'], 0, d['streams'], s_date, e_date))
+        storage.add_campaign(conn, storage.Campaign(
+            d['name'], d['platform'], budget=d['budget'], spend=d['spend'], revenue=estimated_revenue, roas=roas,
+            impressions=d['impressions'], streams=d['streams'], start_date=s_date, end_date=e_date))
         
         conn.commit()
         return True, "Campagna salvata correttamente"
@@ -67,44 +41,168 @@ def save_campaign(d):
     finally:
         conn.close()
 
-def analyze_campaign_impact(campaign_id):
+# ============ IMPACT ENGINE (vettoriale) ============
+
+BASELINE_DAYS = 14   # giorni prima della campagna usati come riferimento
+POST_DAYS = 14       # giorni dopo la fine campagna (effetto "coda")
+MAX_LAG = 14         # lag massimo (giorni) per la cross-correlazione spesa -> crescita
+GROWTH_KEYWORDS = ('follower', 'stream')  # metriche di cui si correlano le variazioni giornaliere
+
+def _load_social_series(conn, platforms, date_from, date_to):
+    """Una sola query parametrizzata -> {platform: DataFrame giornaliero (date x metric)}"""
+    marks = ",".join("?" * len(platforms))
+    df = pd.read_sql_query(
+        f"""SELECT platform, metric_type, date_recorded, value FROM social_stats
+            WHERE platform IN ({marks}) AND date_recorded BETWEEN ? AND ?""",
+        conn, params=(*platforms, date_from, date_to)
+    )
+    days = pd.date_range(date_from, date_to, freq='D')
+    out = {}
+    if df.empty:
+        return out
+    df['date_recorded'] = pd.to_datetime(df['date_recorded'], errors='coerce')
+    df = df.dropna(subset=['date_recorded'])
+    for plat, g in df.groupby('platform'):
+        out[plat] = g.pivot_table(index='date_recorded', columns='metric_type', values='value', aggfunc='sum').reindex(days)
+    return out
+
+def _masked_mean(values, mask):
+    """Media per colonna dei giorni in `mask` ignorando i NaN (NaN se non c'è nessun valore).
+    Come np.nanmean, ma senza il RuntimeWarning "Mean of empty slice" (che np.errstate non ferma)"""
+    valid = mask[:, None] & ~np.isnan(values)
+    return np.where(valid, values, 0.0).sum(axis=0) / valid.sum(axis=0)
+
+def _lagged_correlation(spend, series, max_lag=MAX_LAG):
     """
-    INCROCIO DATI: Cerca correlazioni tra la campagna Ads e la crescita organica sui social.
+    Correlazione di Pearson tra spend[t] e series[t+lag] per lag = 0..max_lag,
+    calcolata per tutti i lag insieme (finestra scorrevole NumPy). NaN dove non calcolabile.
+    """
+    n = len(spend) - max_lag
+    if n < 3:
+        return np.full(max_lag + 1, np.nan)
+    x = spend[:n]
+    y = np.lib.stride_tricks.sliding_window_view(series, n)[:max_lag + 1]
+    valid = ~np.isnan(y) & ~np.isnan(x)
+    cnt = valid.sum(axis=1)
+    xv = np.where(valid, x, 0.0)
+    yv = np.where(valid, y, 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mx = xv.sum(axis=1) / cnt
+        my = yv.sum(axis=1) / cnt
+        dx = np.where(valid, x - mx[:, None], 0.0)
+        dy = np.where(valid, y - my[:, None], 0.0)
+        corr = (dx * dy).sum(axis=1) / np.sqrt((dx ** 2).sum(axis=1) * (dy ** 2).sum(axis=1))
+    corr[cnt < 3] = np.nan
+    return corr
+
+def analyze_campaigns_impact(campaign_ids=None, baseline_days=BASELINE_DAYS, post_days=POST_DAYS, max_lag=MAX_LAG):
+    """
+    INCROCIO DATI in batch: per tutte le campagne (o quelle in campaign_ids) calcola
+    media giornaliera prima / durante / dopo la campagna e l'uplift per metrica, più la
+    cross-correlazione (0..max_lag giorni) tra spesa giornaliera e variazioni di follower/stream.
+
+    Ritorna (impact_df, correlation_df). Due query in tutto, indipendentemente dal numero di campagne.
     """
+    empty = (pd.DataFrame(), pd.DataFrame())
     conn = get_connection()
     try:
-        # 1. Prendi dati campagna
-        camp = conn.execute("SELECT * FROM campaigns WHERE id=?", (campaign_id,)).fetchone()
-        if not camp: return None
+        if campaign_ids is None:
+            camps = pd.read_sql_query("SELECT * FROM campaigns", conn)
+        else:
+            ids = [int(x) for x in campaign_ids]
+            if not ids:
+                return empty
+            camps = pd.read_sql_query(f"SELECT * FROM campaigns WHERE id IN ({','.join('?' * len(ids))})", conn, params=ids)
+        if camps.empty:
+            return empty
+        
+        camps['start'] = pd.to_datetime(camps['start_date'], errors='coerce')
+        camps['end'] = pd.to_datetime(camps['end_date'], errors='coerce')
+        camps = camps.dropna(subset=['start', 'end'])
+        if camps.empty:
+            return empty
         
-        # Accesso per indice (row factory standard è tuple)
-        # id=0, name=1, plat=2, ..., start=11, end=12 (basato su insert sopra)
-        # Per sicurezza uso query pandas
-        df_c = pd.read_sql_query(f"SELECT * FROM campaigns WHERE id={campaign_id}", conn)
-        if df_c.empty: return None
+        date_from = (camps['start'].min() - pd.Timedelta(days=baseline_days)).strftime('%Y-%m-%d')
+        date_to = (camps['end'].max() + pd.Timedelta(days=max(post_days, max_lag))).strftime('%Y-%m-%d')
+        series = _load_social_series(conn, sorted(camps['platform'].dropna().unique()), date_from, date_to)
+    finally:
+        conn.close()
+    
+    impact_rows, corr_rows = [], []
+    for plat, c_plat in camps.groupby('platform'):
+        daily = series.get(plat)
+        if daily is None or daily.empty:
+            continue
+        days = daily.index.values.astype('datetime64[D]')
+        values = daily.to_numpy(dtype=float)
+        metrics = list(daily.columns)
         
-        c_row = df_c.iloc[0]
-        start_date = c_row['start_date']
-        end_date = c_row['end_date']
-        platform = c_row['platform']
+        # Spesa giornaliera della piattaforma: ogni campagna spalmata uniformemente sui suoi giorni
+        spend_daily = np.zeros(len(days))
         
-        # 2. Cerca dati social in quel periodo per la stessa piattaforma
-        # Esempio: Se ho fatto Ads su TikTok, voglio vedere se i follower TikTok sono saliti
-        query_social = f"""
-            SELECT metric_type, SUM(value) as total_val 
-            FROM social_stats 
-            WHERE platform = '{platform}' 
-            AND date_recorded BETWEEN '{start_date}' AND '{end_date}'
-            GROUP BY metric_type
-        """
-        df_impact = pd.read_sql_query(query_social, conn)
+        for _, c in c_plat.iterrows():
+            start = np.datetime64(c['start'].date(), 'D')
+            end = np.datetime64(c['end'].date(), 'D')
+            m_base = (days >= start - np.timedelta64(baseline_days, 'D')) & (days < start)
+            m_in = (days >= start) & (days <= end)
+            m_post = (days > end) & (days <= end + np.timedelta64(post_days, 'D'))
+            
+            n_days = max(int(m_in.sum()), 1)
+            spend_daily[m_in] += float(c.get('spend') or 0) / n_days
+            
+            with np.errstate(invalid='ignore', divide='ignore'):
+                base = _masked_mean(values, m_base)
+                during = _masked_mean(values, m_in)
+                post = _masked_mean(values, m_post)
+                total = np.nansum(np.where(m_in[:, None], values, np.nan), axis=0)
+                uplift = (during - base) / np.abs(base) * 100
+                post_uplift = (post - base) / np.abs(base) * 100
+            
+            for j, metric in enumerate(metrics):
+                impact_rows.append({
+                    "campaign_id": c['id'], "campaign": c['name'], "platform": plat, "metric_type": metric,
+                    "total_val": total[j], "baseline_avg": base[j], "campaign_avg": during[j], "post_avg": post[j],
+                    "uplift_pct": uplift[j], "post_uplift_pct": post_uplift[j],
+                })
         
-        return {
-            "campaign": c_row['name'],
-            "period": f"{start_date} -> {end_date}",
-            "impact_data": df_impact
-        }
-    except Exception as e:
-        return None
+        # Cross-correlazione spesa -> variazione giornaliera (una volta per piattaforma)
+        for j, metric in enumerate(metrics):
+            if not any(k in metric.lower() for k in GROWTH_KEYWORDS):
+                continue
+            delta = np.diff(values[:, j], prepend=np.nan)
+            corr = _lagged_correlation(spend_daily, delta, max_lag)
+            if np.all(np.isnan(corr)):
+                continue
+            best = int(np.nanargmax(np.abs(corr)))
+            corr_rows.append({"platform": plat, "metric_type": metric, "best_lag_days": best,
+                              "best_corr": corr[best], **{f"lag_{k}": corr[k] for k in range(len(corr))}})
+    
+    impact = pd.DataFrame(impact_rows)
+    if not impact.empty:
+        impact = impact.replace([np.inf, -np.inf], np.nan)
+    return impact, pd.DataFrame(corr_rows)
+
+def analyze_campaign_impact(campaign_id):
+    """
+    INCROCIO DATI: Cerca correlazioni tra la campagna Ads e la crescita organica sui social.
+    (Wrapper della versione batch per una singola campagna)
+    """
+    conn = get_connection()
+    try:
+        row = conn.execute("SELECT name, start_date, end_date, platform FROM campaigns WHERE id=?", (campaign_id,)).fetchone()
     finally:
-        conn.close()
\ No newline at end of file
+        conn.close()
+    if not row:
+        return None
+    
+    impact, corr = analyze_campaigns_impact([campaign_id])
+    name, start_date, end_date, platform = row
+    if not impact.empty:
+        impact = impact.drop(columns=['campaign_id', 'campaign', 'platform'])
+    corr_plat = corr[corr['platform'] == platform] if not corr.empty else corr
+    return {
+        "campaign": name,
+        "period": f"{start_date} -> {end_date}",
+        "impact_data": impact,
+        "lag_correlation": corr_plat
+    }
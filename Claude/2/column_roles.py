@@ -0,0 +1,117 @@
+"""
+COLUMN_ROLES.PY - Riconoscimento delle colonne per ruolo (data, spesa, impression...)
+
+Prima ogni sezione di csv_to_readable_text cercava le sue colonne con
+next(c for c in df.columns if 'x' in c.lower() ...), rifacendo lower() di ogni
+intestazione decine di volte per file. Qui:
+
+  - le intestazioni vengono normalizzate una volta (NFC + minuscole);
+  - tutte le parole chiave dei ruoli stanno in UNA regex compilata (alternanza in
+    lookahead, la più lunga per prima): una sola passata per intestazione trova
+    ogni parola contenuta, anche sovrapposta ('viewer' implica 'view');
+  - ColumnResolver dà ruolo -> prima colonna corrispondente, condiviso dalle sezioni.
+
+Un ruolo è una lista di alternative (tutte le parole di un'alternativa devono
+comparire) più eventuali parole che escludono la colonna: stessa semantica dei
+vecchi `'a' in c.lower() and 'b' in c.lower()`.
+"""
+
+import re
+import unicodedata
+
+# ruolo -> ([alternative di parole richieste], parole escluse)
+ROLES = {
+    "date_any":          ([("data",), ("date",)], ()),
+    "date":              ([("date",)], ()),
+    "hour":              ([("hour",)], ()),
+    "spend":             ([("speso",), ("spend",)], ()),
+    "impressions":       ([("impression",)], ("totali",)),
+    "link_clicks":       ([("clic", "link")], ()),
+    "roas":              ([("roas",)], ()),
+    "cpm":               ([("cpm",)], ()),
+    "ad_name":           ([("nome", "inserzione")], ()),
+    "day_hour":          ([("ora", "giorno")], ()),
+    "age":               ([("età",), ("age",)], ()),
+    "destination":       ([("destinazione",)], ()),
+    "views_total":       ([("view", "total")], ()),
+    "likes_total":       ([("like", "total")], ()),
+    "title":             ([("title",), ("video title",)], ()),
+    "men":               ([("uomini",)], ()),
+    "women":             ([("donne",)], ()),
+    "active":            ([("active",), ("follower",)], ()),
+    "followers":         ([("follower",)], ("difference",)),
+    "difference":        ([("difference",)], ()),
+    "video_views":       ([("view", "video")], ()),
+    "likes":             ([("like",)], ()),
+    "comments":          ([("comment",)], ()),
+    "shares":            ([("share",)], ()),
+    "viewers_total":     ([("total", "viewer")], ()),
+    "viewers_new":       ([("new", "viewer")], ()),
+    "viewers_returning": ([("returning", "viewer")], ()),
+    "gender":            ([("gender",)], ()),
+    "distribution":      ([("distribution",), ("percent",)], ()),
+    "territory":         ([("territor",), ("countr",)], ()),
+    "geo":               ([("città",), ("citt",), ("paesi",), ("countr",), ("territor",)], ()),
+}
+
+# Parole cercate sull'intestazione completa in detect_file_type
+HEADER_TOKENS = ("data", "primary", "importo speso", "impression", "cpm", "video", "total views", "uomini", "donne")
+
+def _compile(tokens):
+    tokens = sorted(set(tokens), key=len, reverse=True)
+    # Lookahead: un match per posizione, il token più lungo che parte lì
+    rx = re.compile("(?=(" + "|".join(re.escape(t) for t in tokens) + "))")
+    # Un token trovato implica tutti i token che contiene ('viewer' -> 'view')
+    implied = {t: frozenset(u for u in tokens if u in t) for t in tokens}
+    return rx, implied
+
+_ALL_TOKENS = {w for alts, excl in ROLES.values() for alt in alts for w in alt} | {w for _, excl in ROLES.values() for w in excl} | set(HEADER_TOKENS)
+_RX, _IMPLIED = _compile(_ALL_TOKENS)
+
+def normalize(name):
+    return unicodedata.normalize("NFC", str(name)).lower()
+
+def tokens_in(text):
+    """Insieme delle parole chiave contenute in `text` (già normalizzato)"""
+    found = set()
+    for m in _RX.finditer(text):
+        found |= _IMPLIED[m.group(1)]
+    return found
+
+def _matches(found, role):
+    alts, excl = ROLES[role]
+    return any(all(w in found for w in alt) for alt in alts) and not any(w in found for w in excl)
+
+class ColumnResolver:
+    """Colonne di un DataFrame normalizzate una volta; ruolo -> colonna (in cache)"""
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.lower = [normalize(c) for c in self.columns]
+        self._found = [tokens_in(low) for low in self.lower]
+        self._header = None
+        self._cache = {}
+
+    def get(self, role, default=None):
+        """Prima colonna che soddisfa il ruolo (None/default se nessuna)"""
+        if role not in self._cache:
+            self._cache[role] = next((c for c, f in zip(self.columns, self._found) if _matches(f, role)), None)
+        hit = self._cache[role]
+        return hit if hit is not None else default
+
+    def all(self, role):
+        return [c for c, f in zip(self.columns, self._found) if _matches(f, role)]
+
+    def first(self, predicate):
+        """Prima colonna il cui nome normalizzato soddisfa predicate(nome)"""
+        return next((c for c, low in zip(self.columns, self.lower) if predicate(low)), None)
+
+    def header_has(self, token):
+        """token in ' '.join(intestazioni): come il vecchio cols_str di detect_file_type"""
+        if self._header is None:
+            self._header = tokens_in(" ".join(self.lower))
+        return token in self._header
+
+    def role_map(self):
+        """ruolo -> colonna per tutti i ruoli presenti"""
+        return {r: c for r in ROLES if (c := self.get(r)) is not None}
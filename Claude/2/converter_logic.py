@@ -0,0 +1,730 @@
+"""
+CONVERTER_LOGIC.PY - CSV to Human-Readable Text
+Parsing numeri/date, riconoscimento tipo file e generazione del report testuale
+(usato da main.py, importabile senza avviare la UI Streamlit)
+"""
+
+import pandas as pd
+import re
+import time
+from datetime import datetime
+
+from perf_trace import span, traced, record
+from column_roles import ColumnResolver
+from social_logic import column_values
+
+# ============ CSV TO TEXT CONVERTER ============
+
+@traced("converter.parse_number", aggregate=True)
+def parse_numeric_value(value):
+    """Converte valore in numero"""
+    if pd.isna(value) or value == '':
+        return None
+    
+    s = str(value).strip().lower()
+    s_clean = re.sub(r'[^\d.,km]', '', s)
+    
+    try:
+        if 'k' in s_clean:
+            num = float(re.sub(r'[^\d.]', '', s_clean.replace('k', ''))) * 1000
+        elif 'm' in s_clean:
+            num = float(re.sub(r'[^\d.]', '', s_clean.replace('m', ''))) * 1000000
+        else:
+            # Gestisci formato italiano
+            if ',' in s_clean and '.' in s_clean:
+                if s_clean.rfind(',') > s_clean.rfind('.'):
+                    s_clean = s_clean.replace('.', '').replace(',', '.')
+            elif ',' in s_clean:
+                s_clean = s_clean.replace(',', '.')
+            num = float(re.sub(r'[^\d.]', '', s_clean))
+        return num
+    except:
+        return None
+
+def format_number(value):
+    """Formatta numeri in modo leggibile e compatto"""
+    if pd.isna(value) or value == '' or str(value).lower() in ['nan', 'none', 'n/a', '--']:
+        return "—"
+    
+    num = parse_numeric_value(value)
+    if num is None:
+        return str(value)[:15]  # Limita testo
+    
+    # Formattazione compatta
+    if num >= 1000000000:  # Miliardi
+        return f"{num/1000000000:.2f}B"
+    elif num >= 1000000:  # Milioni
+        return f"{num/1000000:.2f}M"
+    elif num >= 1000:  # Migliaia
+        return f"{num/1000:.1f}K"
+    elif num >= 1:
+        return f"{num:,.0f}"
+    else:
+        return f"{num:.2f}"
+
+@traced("converter.format_date", aggregate=True)
+def format_date(value):
+    """Formatta date in modo leggibile e compatto"""
+    if pd.isna(value) or value == '':
+        return "—"
+    
+    s = str(value).strip()
+    
+    # ISO format
+    if 'T' in s:
+        try:
+            dt = datetime.fromisoformat(s.replace('Z', '+00:00'))
+            return dt.strftime('%d/%m/%Y')
+        except:
+            pass
+    
+    # Prova altri formati comuni
+    for fmt in ['%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%m/%d/%Y']:
+        try:
+            dt = datetime.strptime(s.split()[0], fmt)
+            return dt.strftime('%d/%m/%Y')
+        except:
+            continue
+    
+    return s[:12]  # Limita lunghezza
+
+def detect_file_type(df, filename, cols=None):
+    """Rileva il tipo di file per applicare formattazione specifica"""
+    fn_lower = filename.lower()
+    cols = cols or ColumnResolver(df.columns)
+    has = cols.header_has  # parola presente nell'intestazione (tutte le colonne)
+    
+    # Instagram serie temporali
+    if any(x in fn_lower for x in ['clic', 'copertura', 'follower', 'interazioni', 'visite', 'visualizzazioni']):
+        if has('data') and has('primary'):
+            return "INSTAGRAM_TIMESERIES"
+    
+    # Meta Ads
+    if any(x in fn_lower for x in ['inserzioni', 'eta_destinazi', 'giorno_ora', 'tlp_inserz']):
+        if has('importo speso') or has('impression') or has('cpm'):
+            return "META_ADS"
+    
+    # TikTok Content
+    if 'content' in fn_lower or (has('video') and has('total views')):
+        return "TIKTOK_CONTENT"
+    
+    # Demografici
+    if 'pubblico' in fn_lower or (has('uomini') and has('donne')):
+        return "DEMOGRAPHICS"
+    
+    # TikTok Demografici specifici
+    if 'followeractivity' in fn_lower:
+        return "TIKTOK_FOLLOWER_ACTIVITY"
+    if 'followerhistory' in fn_lower or 'follower history' in fn_lower:
+        return "TIKTOK_FOLLOWER_HISTORY"
+    if 'followergender' in fn_lower or 'followertop' in fn_lower:
+        return "TIKTOK_DEMOGRAPHICS"
+    if 'viewers' in fn_lower and 'tiktok' in fn_lower:
+        return "TIKTOK_VIEWERS"
+    if 'overview' in fn_lower and 'tiktok' in fn_lower:
+        return "TIKTOK_OVERVIEW"
+    
+    return "GENERIC"
+
+# Ruoli letti da ciascun handler: per gli export larghi si caricano solo queste colonne
+HANDLER_ROLES = {
+    "META_ADS": ("spend", "impressions", "link_clicks", "roas", "cpm", "ad_name", "day_hour", "age", "destination"),
+}
+WIDE_COLUMNS = 40      # sotto questa larghezza si legge tutto il file
+GENERIC_PREFIX = 12    # colonne iniziali per la parte generica del report (metriche e anteprima)
+
+def needed_columns(header, filename=""):
+    """
+    Colonne da caricare per il report di un file con questa intestazione
+    (per load_csv_simple(columns=...)); None = tutte.
+    """
+    if len(header) <= WIDE_COLUMNS:
+        return None
+    cols = ColumnResolver(header)
+    roles = HANDLER_ROLES.get(detect_file_type(None, filename, cols))
+    if roles is None:
+        return None
+    keep = set(header[:GENERIC_PREFIX]) | {cols.get(r) for r in roles}
+    return [c for c in header if c in keep]
+
+def _blank(value):
+    """Cella testo vuota (o NaN diventato 'nan')"""
+    return not value or value.lower() == "nan"
+
+def _take(lines):
+    """Blocco pronto da emettere: le righe accumulate, poi la lista si svuota"""
+    chunk = "\n".join(lines)
+    lines.clear()
+    return chunk
+
+@traced("csv_to_readable_text")
+def csv_to_readable_text(df, filename=""):
+    """Converte DataFrame in testo leggibile e intuitivo"""
+    return "\n".join(_report_sections(df, filename))
+
+def iter_readable_text(df, filename=""):
+    """
+    Come csv_to_readable_text ma a sezioni: ogni elemento è un blocco di righe già
+    pronto ("\n".join dei blocchi = report completo). Registra in perf_trace solo
+    il tempo passato a calcolare (non quello del consumatore) e il tempo alla
+    prima sezione.
+    """
+    t_start = time.perf_counter()
+    busy, first_ms, n = 0.0, None, 0
+    sections = _report_sections(df, filename)
+    while True:
+        t0 = time.perf_counter()
+        try:
+            chunk = next(sections)
+        except StopIteration:
+            break
+        busy += time.perf_counter() - t0
+        if first_ms is None:
+            first_ms = round((time.perf_counter() - t_start) * 1000, 2)
+        n += 1
+        yield chunk
+    record("converter.stream", busy * 1000, rows=len(df), first_section_ms=first_ms, sections=n)
+
+def _report_sections(df, filename=""):
+    if df.empty:
+        yield "⚠️ Il file CSV è vuoto o non contiene dati validi."
+        return
+    
+    # Intestazioni normalizzate una volta: ruolo -> colonna condiviso da tutte le sezioni
+    cols = ColumnResolver(df.columns)
+    with span("converter.detect_type", rows=len(df)) as sp:
+        file_type = detect_file_type(df, filename, cols)
+        sp.meta["file_type"] = file_type
+    output = []
+    
+    # Header intuitivo
+    output.append("=" * 80)
+    output.append(f"📄 {filename}")
+    output.append("=" * 80)
+    output.append("")
+    # L'intestazione esce subito, prima dei passaggi sulle righe
+    yield _take(output)
+    
+    # ========== INSTAGRAM SERIE TEMPORALI ==========
+    if file_type == "INSTAGRAM_TIMESERIES":
+        date_col = cols.get('date_any')
+        value_col = cols.first(lambda low: 'primary' in low or low not in ['data', 'date'])
+        
+        if date_col and value_col:
+            # Estrai metriche chiave
+            values = []
+            dates = []
+            for _, row in df.iterrows():
+                date_val = format_date(row[date_col])
+                num_val = parse_numeric_value(row[value_col])
+                if num_val is not None and date_val != "—":
+                    values.append(num_val)
+                    dates.append(date_val)
+            
+            if values:
+                total = sum(values)
+                avg = total / len(values)
+                max_val = max(values)
+                min_val = min(values)
+                max_idx = values.index(max_val)
+                min_idx = values.index(min_val)
+                
+                # Trend
+                if len(values) > 1:
+                    first_half = sum(values[:len(values)//2]) / (len(values)//2)
+                    second_half = sum(values[len(values)//2:]) / (len(values) - len(values)//2)
+                    trend = "📈 Crescita" if second_half > first_half * 1.1 else "📉 Calo" if second_half < first_half * 0.9 else "➡️ Stabile"
+                else:
+                    trend = "—"
+                
+                output.append(f"📊 ANALISI: {filename.split('/')[-1].replace('.csv', '')}")
+                output.append("")
+                output.append(f"   Periodo: {dates[0] if dates else '—'} → {dates[-1] if dates else '—'}")
+                output.append(f"   Giorni analizzati: {len(values)}")
+                output.append("")
+                output.append("   📈 PERFORMANCE:")
+                output.append(f"      • Totale: {format_number(total)}")
+                output.append(f"      • Media giornaliera: {format_number(avg)}")
+                output.append(f"      • Picco massimo: {format_number(max_val)} ({dates[max_idx] if max_idx < len(dates) else '—'})")
+                output.append(f"      • Valore minimo: {format_number(min_val)} ({dates[min_idx] if min_idx < len(dates) else '—'})")
+                output.append(f"      • Trend: {trend}")
+                output.append("")
+                
+                # Ultimi 7 giorni
+                if len(values) >= 7:
+                    output.append("   📅 ULTIMI 7 GIORNI:")
+                    for i in range(max(0, len(values)-7), len(values)):
+                        output.append(f"      {dates[i] if i < len(dates) else '—':<12} → {format_number(values[i]):>10}")
+                    output.append("")
+    
+    # ========== META ADS ==========
+    elif file_type == "META_ADS":
+        # Estrai metriche chiave
+        spend_col = cols.get('spend')
+        imp_col = cols.get('impressions')
+        click_col = cols.get('link_clicks')
+        roas_col = cols.get('roas')
+        cpm_col = cols.get('cpm')
+        
+        # Identifica colonne per filtrare righe di riepilogo
+        name_col = cols.get('ad_name')
+        ora_col = cols.get('day_hour')
+        eta_col = cols.get('age')
+        dest_col = cols.get('destination')
+        
+        # Una lista per colonna, calcolata una volta (per categoria sulle colonne category)
+        n = len(df)
+        def text(col):
+            return column_values(df, col, lambda v: str(v).strip()) if col else [""] * n
+        def number(col):
+            return column_values(df, col, parse_numeric_value) if col else [None] * n
+        names, ore, eta, dest = text(name_col), text(ora_col), text(eta_col), text(dest_col)
+        spend, imp, clicks, roas = number(spend_col), number(imp_col), number(click_col), number(roas_col)
+        # Righe di riepilogo: nome, ora ed età vuoti
+        no_key = [_blank(a) and _blank(b) and _blank(c) for a, b, c in zip(names, ore, eta)]
+        
+        # Cerca riga di riepilogo (riga con valori grandi ma campi chiave vuoti)
+        summary_row = None
+        if spend_col and imp_col:
+            for i in range(n):
+                # Se ha valori grandi ma campi chiave vuoti, è probabilmente un totale
+                if no_key[i] and (spend[i] or 0) > 50 and (imp[i] or 0) > 1000:
+                    summary_row = i
+                    break
+        
+        total_spend = 0
+        total_imp = 0
+        total_clicks = 0
+        total_roas = 0
+        roas_count = 0
+        
+        # Se abbiamo trovato una riga di riepilogo, usala per spesa/impression
+        # ma somma i clic dalle righe dettagliate (la riga di riepilogo spesso non ha clic)
+        if summary_row is not None:
+            if spend_col:
+                total_spend = spend[summary_row] or 0
+            if imp_col:
+                total_imp = imp[summary_row] or 0
+            # I clic vanno sommati dalle righe dettagliate (escluse quelle di riepilogo)
+            if click_col:
+                for i in range(n):
+                    if not no_key[i]:
+                        total_clicks += clicks[i] or 0
+            
+            if roas_col:
+                roas_val = roas[summary_row]
+                if roas_val and roas_val > 0:
+                    total_roas = roas_val
+                    roas_count = 1
+        else:
+            # Altrimenti, somma solo le righe dettagliate (escludi riepiloghi)
+            for i in range(n):
+                # Skip righe con campi chiave vuoti (sono riepiloghi)
+                if no_key[i]:
+                    continue
+                
+                # Skip righe con "Tutte le..." o "Nessun dettaglio" (sono totali parziali)
+                dest_val = dest[i]
+                if dest_val and ("tutte le" in dest_val.lower() or "nessun dettaglio" in dest_val.lower()):
+                    continue
+                
+                if spend_col:
+                    total_spend += spend[i] or 0
+                if imp_col:
+                    total_imp += imp[i] or 0
+                if click_col:
+                    total_clicks += clicks[i] or 0
+                if roas_col:
+                    roas_val = roas[i]
+                    if roas_val and roas_val > 0:
+                        total_roas += roas_val
+                        roas_count += 1
+        
+        output.append(f"💰 CAMPAGNA: {filename.split('/')[-1].replace('.csv', '')}")
+        output.append("")
+        output.append("   💵 PERFORMANCE:")
+        # Mostra spesa con precisione maggiore se < 1000
+        if total_spend < 1000:
+            output.append(f"      • Spesa totale: €{total_spend:.2f}")
+        else:
+            output.append(f"      • Spesa totale: €{format_number(total_spend)}")
+        output.append(f"      • Impression: {format_number(total_imp)}")
+        output.append(f"      • Clic: {format_number(total_clicks)}")
+        if total_imp > 0:
+            ctr_calc = (total_clicks / total_imp) * 100
+            output.append(f"      • CTR: {ctr_calc:.2f}%")
+        if total_clicks > 0:
+            cpc = total_spend / total_clicks
+            output.append(f"      • CPC: €{cpc:.3f}")
+        if total_imp > 0 and total_spend > 0:
+            cpm_calc = (total_spend / total_imp) * 1000
+            output.append(f"      • CPM: €{cpm_calc:.2f}")
+        if roas_count > 0:
+            avg_roas = total_roas / roas_count
+            output.append(f"      • ROAS medio: {avg_roas:.2f}x")
+        output.append("")
+        yield _take(output)
+        
+        # Analisi per ora del giorno (se presente)
+        if ora_col and spend_col:
+            output.append("   ⏰ PERFORMANCE PER FASCIA ORARIA (Top 5):")
+            ora_stats = {}
+            for i in range(n):
+                # Skip se ora è vuota o se è una riga di riepilogo
+                ora = ore[i]
+                if _blank(ora) or _blank(names[i]):
+                    continue
+                
+                row_spend = spend[i] or 0
+                row_clicks = clicks[i] or 0 if click_col else 0
+                if row_spend > 0:
+                    if ora not in ora_stats:
+                        ora_stats[ora] = {'spend': 0, 'clicks': 0}
+                    ora_stats[ora]['spend'] += row_spend
+                    ora_stats[ora]['clicks'] += row_clicks
+            
+            sorted_ora = sorted(ora_stats.items(), key=lambda x: x[1]['spend'], reverse=True)
+            for i, (ora, stats) in enumerate(sorted_ora[:5], 1):
+                ctr_ora = (stats['clicks'] / total_imp * 100) if total_imp > 0 else 0
+                output.append(f"      {i}. {ora:<20} | €{format_number(stats['spend']):>8} | CTR: {ctr_ora:.2f}%")
+            output.append("")
+            yield _take(output)
+        
+        # Top inserzioni - raggruppa per nome inserzione e somma spesa
+        if name_col and spend_col:
+            ads_dict = {}
+            for i in range(n):
+                name = names[i]
+                # Escludi righe con nome vuoto (riepiloghi)
+                if _blank(name):
+                    continue
+                
+                # Escludi righe con "Tutte le..." o simili
+                if "tutte le" in name.lower() or "nessun dettaglio" in name.lower():
+                    continue
+                
+                row_spend = spend[i] or 0
+                if row_spend > 0:
+                    if name not in ads_dict:
+                        ads_dict[name] = 0
+                    ads_dict[name] += row_spend
+            
+            # Converti in lista e ordina
+            top_ads = [(name[:40], spend) for name, spend in ads_dict.items()]
+            top_ads.sort(key=lambda x: x[1], reverse=True)
+            
+            if top_ads:
+                output.append("   🏆 TOP 5 INSERZIONI PER SPESA:")
+                for i, (name, spend) in enumerate(top_ads[:5], 1):
+                    output.append(f"      {i}. {name:<40} €{format_number(spend)}")
+                output.append("")
+    
+    # ========== TIKTOK CONTENT ==========
+    elif file_type == "TIKTOK_CONTENT":
+        views_col = cols.get('views_total')
+        likes_col = cols.get('likes_total')
+        title_col = cols.get('title')
+        
+        if views_col:
+            views_list = []
+            for _, row in df.iterrows():
+                views = parse_numeric_value(row[views_col]) or 0
+                title = str(row[title_col])[:50] if title_col else "—"
+                likes = parse_numeric_value(row[likes_col]) or 0 if likes_col else 0
+                if views > 0:
+                    views_list.append((title, views, likes))
+            
+            if views_list:
+                views_list.sort(key=lambda x: x[1], reverse=True)
+                total_views = sum(v[1] for v in views_list)
+                avg_views = total_views / len(views_list)
+                
+                output.append(f"🎬 CONTENUTI: {filename.split('/')[-1].replace('.csv', '')}")
+                output.append("")
+                output.append(f"   📊 Totale video: {len(views_list)}")
+                output.append(f"   👁️ Visualizzazioni totali: {format_number(total_views)}")
+                output.append(f"   📈 Media per video: {format_number(avg_views)}")
+                output.append("")
+                output.append("   🏆 TOP 5 VIDEO:")
+                for i, (title, views, likes) in enumerate(views_list[:5], 1):
+                    output.append(f"      {i}. {title[:45]}")
+                    output.append(f"         👁️ {format_number(views):>10} | ❤️ {format_number(likes):>8}")
+                output.append("")
+    
+    # ========== DEMOGRAPHICS ==========
+    elif file_type == "DEMOGRAPHICS":
+        # Cerca colonne genere
+        uomini_col = cols.get('men')
+        donne_col = cols.get('women')
+        age_col = cols.get('age', df.columns[0] if len(df.columns) > 0 else None)
+        
+        if uomini_col and donne_col:
+            output.append(f"👥 DEMOGRAFIA: {filename.split('/')[-1].replace('.csv', '')}")
+            output.append("")
+            
+            total_m = 0
+            total_f = 0
+            
+            output.append("   👤 DISTRIBUZIONE PER ETÀ E GENERE:")
+            for _, row in df.iterrows():
+                age = str(row[age_col])[:15] if age_col else "—"
+                m = parse_numeric_value(row[uomini_col]) or 0
+                f = parse_numeric_value(row[donne_col]) or 0
+                total_m += m
+                total_f += f
+                tot = m + f
+                if tot > 0:
+                    pct_m = (m / tot) * 100
+                    pct_f = (f / tot) * 100
+                    output.append(f"      {age:<15} | 👨 {pct_m:>5.1f}% | 👩 {pct_f:>5.1f}%")
+            
+            tot_gen = total_m + total_f
+            if tot_gen > 0:
+                output.append("")
+                output.append(f"   📊 TOTALE: 👨 {total_m} ({total_m/tot_gen*100:.1f}%) | 👩 {total_f} ({total_f/tot_gen*100:.1f}%)")
+            output.append("")
+            
+            # Città/Paesi se presenti
+            geo_cols = cols.all('geo')
+            if geo_cols:
+                output.append("   🌍 DISTRIBUZIONE GEOGRAFICA:")
+                # Prendi prima riga con valori geografici
+                for _, row in df.iterrows():
+                    if geo_cols[0] in row and not pd.isna(row[geo_cols[0]]):
+                        geo_val = str(row[geo_cols[0]])
+                        if len(geo_val) > 3:  # Evita valori numerici
+                            output.append(f"      • {geo_val}")
+                output.append("")
+    
+    # ========== TIKTOK FOLLOWER ACTIVITY ==========
+    elif file_type == "TIKTOK_FOLLOWER_ACTIVITY":
+        date_col = cols.get('date')
+        hour_col = cols.get('hour')
+        active_col = cols.get('active')
+        
+        if date_col and hour_col and active_col:
+            # Calcola media per ora del giorno
+            hour_stats = {}
+            for hour, active in zip(column_values(df, hour_col, str), column_values(df, active_col, parse_numeric_value)):
+                active = active or 0
+                if hour not in hour_stats:
+                    hour_stats[hour] = []
+                hour_stats[hour].append(active)
+            
+            if hour_stats:
+                output.append(f"⏰ ATTIVITÀ FOLLOWER: {filename.split('/')[-1].replace('.csv', '')}")
+                output.append("")
+                output.append("   📊 MEDIA FOLLOWER ATTIVI PER ORA:")
+                sorted_hours = sorted(hour_stats.items(), key=lambda x: sum(x[1])/len(x[1]), reverse=True)
+                for hour, values in sorted_hours[:8]:  # Top 8 ore
+                    avg = sum(values) / len(values)
+                    output.append(f"      • Ore {hour:>2}:00 → {format_number(avg):>6} follower attivi (media)")
+                output.append("")
+                
+                # Ora più attiva
+                if sorted_hours:
+                    best_hour, best_values = sorted_hours[0]
+                    best_avg = sum(best_values) / len(best_values)
+                    output.append(f"   ⭐ ORA PIÙ ATTIVA: {best_hour}:00 con {format_number(best_avg)} follower attivi in media")
+                output.append("")
+    
+    # ========== TIKTOK FOLLOWER HISTORY ==========
+    elif file_type == "TIKTOK_FOLLOWER_HISTORY":
+        date_col = cols.get('date')
+        follower_col = cols.get('followers')
+        diff_col = cols.get('difference')
+        
+        if date_col and follower_col:
+            followers = []
+            dates = []
+            diffs = []
+            
+            diff_values = column_values(df, diff_col, parse_numeric_value) if diff_col else [0] * len(df)
+            for date_val, foll, diff in zip(column_values(df, date_col, format_date),
+                                            column_values(df, follower_col, parse_numeric_value), diff_values):
+                foll = foll or 0
+                diff = diff or 0
+                if foll > 0:
+                    followers.append(foll)
+                    dates.append(date_val)
+                    diffs.append(diff)
+            
+            if followers:
+                output.append(f"📈 CRESCITA FOLLOWER: {filename.split('/')[-1].replace('.csv', '')}")
+                output.append("")
+                output.append(f"   Periodo: {dates[0] if dates else '—'} → {dates[-1] if dates else '—'}")
+                output.append(f"   Follower iniziali: {format_number(followers[0])}")
+                output.append(f"   Follower finali: {format_number(followers[-1])}")
+                
+                growth = followers[-1] - followers[0]
+                growth_pct = (growth / followers[0] * 100) if followers[0] > 0 else 0
+                output.append(f"   Crescita totale: {format_number(growth)} ({growth_pct:+.1f}%)")
+                output.append("")
+                
+                # Giorni con più crescita
+                if diffs:
+                    positive_days = [(dates[i], diffs[i]) for i in range(len(diffs)) if diffs[i] > 0]
+                    positive_days.sort(key=lambda x: x[1], reverse=True)
+                    if positive_days:
+                        output.append("   🚀 GIORNI CON PIÙ CRESCITA:")
+                        for i, (date, diff) in enumerate(positive_days[:5], 1):
+                            output.append(f"      {i}. {date:<12} → +{format_number(diff)} follower")
+                        output.append("")
+    
+    # ========== TIKTOK OVERVIEW ==========
+    elif file_type == "TIKTOK_OVERVIEW":
+        date_col = cols.get('date')
+        views_col = cols.get('video_views')
+        likes_col = cols.get('likes')
+        comments_col = cols.get('comments')
+        shares_col = cols.get('shares')
+        
+        if date_col:
+            total_views = 0
+            total_likes = 0
+            total_comments = 0
+            total_shares = 0
+            
+            for _, row in df.iterrows():
+                if views_col:
+                    total_views += parse_numeric_value(row[views_col]) or 0
+                if likes_col:
+                    total_likes += parse_numeric_value(row[likes_col]) or 0
+                if comments_col:
+                    total_comments += parse_numeric_value(row[comments_col]) or 0
+                if shares_col:
+                    total_shares += parse_numeric_value(row[shares_col]) or 0
+            
+            output.append(f"📊 OVERVIEW TIKTOK: {filename.split('/')[-1].replace('.csv', '')}")
+            output.append("")
+            output.append(f"   Periodo analizzato: {len(df)} giorni")
+            output.append("")
+            output.append("   📈 TOTALE METRICHE:")
+            output.append(f"      • Visualizzazioni video: {format_number(total_views)}")
+            output.append(f"      • Like: {format_number(total_likes)}")
+            output.append(f"      • Commenti: {format_number(total_comments)}")
+            output.append(f"      • Condivisioni: {format_number(total_shares)}")
+            if total_views > 0:
+                engagement = ((total_likes + total_comments + total_shares) / total_views) * 100
+                output.append(f"      • Engagement rate: {engagement:.2f}%")
+            output.append("")
+            
+            # Media giornaliera
+            days = len(df)
+            if days > 0:
+                output.append("   📅 MEDIA GIORNALIERA:")
+                output.append(f"      • Visualizzazioni: {format_number(total_views/days)}")
+                output.append(f"      • Like: {format_number(total_likes/days)}")
+                output.append(f"      • Commenti: {format_number(total_comments/days)}")
+            output.append("")
+    
+    # ========== TIKTOK VIEWERS ==========
+    elif file_type == "TIKTOK_VIEWERS":
+        date_col = cols.get('date')
+        total_col = cols.get('viewers_total')
+        new_col = cols.get('viewers_new')
+        return_col = cols.get('viewers_returning')
+        
+        if date_col and total_col:
+            total_viewers = 0
+            new_viewers = 0
+            return_viewers = 0
+            
+            for _, row in df.iterrows():
+                total_viewers += parse_numeric_value(row[total_col]) or 0
+                if new_col:
+                    new_viewers += parse_numeric_value(row[new_col]) or 0
+                if return_col:
+                    return_viewers += parse_numeric_value(row[return_col]) or 0
+            
+            output.append(f"👁️ VIEWERS TIKTOK: {filename.split('/')[-1].replace('.csv', '')}")
+            output.append("")
+            output.append(f"   Periodo: {len(df)} giorni")
+            output.append("")
+            output.append("   📊 TOTALE VIEWERS:")
+            output.append(f"      • Viewers totali: {format_number(total_viewers)}")
+            if new_viewers > 0:
+                output.append(f"      • Nuovi viewers: {format_number(new_viewers)} ({new_viewers/total_viewers*100:.1f}%)")
+            if return_viewers > 0:
+                output.append(f"      • Viewers di ritorno: {format_number(return_viewers)} ({return_viewers/total_viewers*100:.1f}%)")
+            output.append("")
+    
+    # ========== TIKTOK DEMOGRAPHICS ==========
+    elif file_type == "TIKTOK_DEMOGRAPHICS":
+        output.append(f"👥 DEMOGRAFIA TIKTOK: {filename.split('/')[-1].replace('.csv', '')}")
+        output.append("")
+        
+        # Cerca colonne chiave
+        gender_col = cols.get('gender')
+        distribution_col = cols.get('distribution')
+        territory_col = cols.get('territory')
+        
+        if gender_col and distribution_col:
+            output.append("   👤 DISTRIBUZIONE PER GENERE:")
+            for _, row in df.iterrows():
+                gender = str(row[gender_col])[:15]
+                dist = parse_numeric_value(row[distribution_col]) or 0
+                if dist < 1 and dist > 0:
+                    dist = dist * 100  # Converti da decimale a percentuale
+                if dist > 0:
+                    output.append(f"      • {gender:<15} → {dist:>5.1f}%")
+            output.append("")
+        
+        if territory_col:
+            value_col = next((c for c in df.columns if c != territory_col and parse_numeric_value(df[c].iloc[0] if len(df) > 0 else None) is not None), None)
+            if value_col:
+                output.append("   🌍 TOP TERRITORI:")
+                territories = []
+                for _, row in df.iterrows():
+                    terr = str(row[territory_col])[:30]
+                    val = parse_numeric_value(row[value_col]) or 0
+                    if val > 0:
+                        territories.append((terr, val))
+                territories.sort(key=lambda x: x[1], reverse=True)
+                for i, (terr, val) in enumerate(territories[:10], 1):
+                    output.append(f"      {i:>2}. {terr:<30} → {format_number(val):>10}")
+                output.append("")
+    
+    if output:
+        yield _take(output)
+
+    # ========== FORMATTAZIONE GENERICA ==========
+    # Sempre, anche dopo le sezioni specifiche: righe, colonne, metriche e anteprima
+    output.append(f"📊 DATI: {filename.split('/')[-1].replace('.csv', '')}")
+    output.append("")
+    output.append(f"   Righe: {len(df)} | Colonne: {df.attrs.get('source_columns', len(df.columns))}")
+    output.append("")
+    
+    # Statistiche numeriche
+    numeric_cols = {}
+    for col in df.columns:
+        values = []
+        for v in df[col].dropna().head(100):
+            num = parse_numeric_value(v)
+            if num is not None:
+                values.append(num)
+        if len(values) > 0:
+            numeric_cols[col] = {
+                'total': sum(values),
+                'avg': sum(values) / len(values),
+                'max': max(values)
+            }
+    
+    if numeric_cols:
+        output.append("   📈 METRICHE PRINCIPALI:")
+        for col, stats in list(numeric_cols.items())[:5]:
+            output.append(f"      • {col[:35]:<35} | Tot: {format_number(stats['total']):>10} | Media: {format_number(stats['avg']):>10}")
+        output.append("")
+    
+    # Anteprima
+    output.append("   📋 ANTEPRIMA (prime 5 righe):")
+    preview_cols = df.columns[:4] if len(df.columns) > 4 else df.columns
+    for idx, row in df.head(5).iterrows():
+        row_str = " | ".join([f"{str(row[col])[:15]:<15}" for col in preview_cols])
+        output.append(f"      {row_str}")
+    output.append("")
+    
+    output.append("=" * 80)
+    output.append("✅ Report completato")
+    
+    yield _take(output)
@@ -1,89 +1,108 @@
+import os
+import sys
 import sqlite3
-import pandas as pd
 
-DB_NAME = "enterprise_os.db"
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))  # moduli condivisi nella root del repo
+import workspace
+import storage
+
+# Artista attivo: il suo shard enterprise_os.db (per l'artista storico il file di sempre)
+ARTIST = workspace.get().name
+DB_NAME = workspace.get(ARTIST).path("enterprise_os.db")
+
+def use_workspace(artist):
+    """Punta get_connection (e tutto ciò che legge DB_NAME) allo shard di `artist`"""
+    global ARTIST, DB_NAME
+    ws = workspace.get(artist)
+    ARTIST, DB_NAME = ws.name, ws.path("enterprise_os.db")
+    return DB_NAME
 
 def get_connection():
-    return sqlite3.connect(DB_NAME, check_same_thread=False)
+    # Dal pool di workspace (close() rimette la connessione nel pool), schema comune già migrato
+    return storage.connect(DB_NAME)
+
+# ============ CACHE LETTURE CON INVALIDAZIONE ============
+
+def bump_table_version(conn, *tables):
+    """Da chiamare nella stessa transazione di ogni scrittura: invalida le letture in cache"""
+    storage.bump_table_version(conn, *tables)
+
+def cached_read(sql, tables, params=()):
+    """SELECT sullo shard attivo, in cache finché nessuna delle `tables` viene modificata (storage.cached_read)"""
+    return storage.cached_read(DB_NAME, sql, tables, params)
 
 def init_advanced_db():
     conn = get_connection()
     c = conn.cursor()
     
-    # 1. TABELLA STATISTICHE GENERALI (Esistente)
-    c.execute('''CREATE TABLE IF NOT EXISTS social_stats (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    platform TEXT,
-                    metric_type TEXT,
-                    value REAL,
-                    date_recorded DATE,
-                    source_type TEXT
-                )''')
-    
-    # 2. TABELLA LOG UPLOAD (Esistente)
-    c.execute('''CREATE TABLE IF NOT EXISTS upload_logs (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    filename TEXT,
-                    platform TEXT,
-                    upload_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    status TEXT
-                )''')
+    # 1-6, 8. social_stats, upload_logs, knowledge_base, campaigns, posts_inventory,
+    # posts_performance e table_versions: schema comune di storage.py, migrato da get_connection()
 
-    # 3. TABELLA KNOWLEDGE BASE (Esistente)
-    c.execute('''CREATE TABLE IF NOT EXISTS knowledge_base (
+    # 7. CHAT HISTORY (Fix per l'errore che avevi)
+    c.execute('''CREATE TABLE IF NOT EXISTS chat_history (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    source TEXT,
+                    session_id TEXT,
+                    role TEXT,
                     content TEXT,
                     timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )''')
+    # Pagine di una sessione lette per (session_id, id): vedi chat_store.py
+    c.execute("CREATE INDEX IF NOT EXISTS idx_chat_history_session ON chat_history (session_id, id)")
     
-    # 4. TABELLA CAMPAGNE ADS (Esistente)
-    c.execute('''CREATE TABLE IF NOT EXISTS campaigns (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT,
-                    platform TEXT,
-                    budget REAL,
-                    spend REAL,
-                    revenue REAL,
-                    streams INTEGER,
-                    impressions INTEGER,
-                    start_date DATE,
-                    end_date DATE
+    # 9. FILE INGERITI DAL WATCHER (hash per dedup)
+    c.execute('''CREATE TABLE IF NOT EXISTS ingest_files (
+                    path TEXT PRIMARY KEY,
+                    sha256 TEXT,
+                    size INTEGER,
+                    mtime REAL,
+                    file_type TEXT,
+                    rows_processed INTEGER,
+                    ingested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )''')
 
-    # --- NUOVE TABELLE (CONTENT INTELLIGENCE) ---
-
-    # 5. INVENTARIO POST (Chi è il post?)
-    c.execute('''CREATE TABLE IF NOT EXISTS posts_inventory (
-                    post_id TEXT PRIMARY KEY,
-                    platform TEXT,
-                    date_published DATE,
-                    caption TEXT,
-                    link TEXT,
-                    content_type TEXT,
-                    duration INTEGER
-                )''')
-
-    # 6. PERFORMANCE POST (Come va il post nel tempo?)
-    c.execute('''CREATE TABLE IF NOT EXISTS posts_performance (
+    # 10. TEMPI PER FASE (perf_trace: upload, report, AI)
+    c.execute('''CREATE TABLE IF NOT EXISTS perf_events (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    post_id TEXT,
-                    date_recorded DATE,
-                    views INTEGER,
-                    likes INTEGER,
-                    comments INTEGER,
-                    shares INTEGER,
-                    FOREIGN KEY(post_id) REFERENCES posts_inventory(post_id)
+                    ts REAL,
+                    stage TEXT,
+                    duration_ms REAL,
+                    rows INTEGER,
+                    meta TEXT
                 )''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_perf_events_stage ON perf_events (stage, ts)")
 
-    # 7. CHAT HISTORY (Fix per l'errore che avevi)
-    c.execute('''CREATE TABLE IF NOT EXISTS chat_history (
+    # 11. HASH DEL CONTENUTO IN KNOWLEDGE BASE (dedup dello scraper, colonna aggiunta ai DB esistenti)
+    if "content_hash" not in [r[1] for r in c.execute("PRAGMA table_info(knowledge_base)")]:
+        c.execute("ALTER TABLE knowledge_base ADD COLUMN content_hash TEXT")
+        from knowledge_scraper import content_hash
+        from knowledge_codec import unpack
+        rows = c.execute("SELECT id, content FROM knowledge_base").fetchall()
+        c.executemany("UPDATE knowledge_base SET content_hash=? WHERE id=?", [(content_hash(unpack(t)), i) for i, t in rows])
+    c.execute("CREATE INDEX IF NOT EXISTS idx_knowledge_hash ON knowledge_base (content_hash)")
+
+    # 12. PASSAGGI + BANDE LSH (knowledge_dedup: quasi-duplicati)
+    fresh = c.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='knowledge_passages'").fetchone() is None
+    c.execute('''CREATE TABLE IF NOT EXISTS knowledge_passages (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    session_id TEXT,
-                    role TEXT,
-                    content TEXT,
-                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    doc_id INTEGER,
+                    pos INTEGER,
+                    signature BLOB
                 )''')
-    
+    c.execute('''CREATE TABLE IF NOT EXISTS knowledge_lsh (
+                    band INTEGER,
+                    bucket INTEGER,
+                    passage_id INTEGER
+                )''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_knowledge_lsh ON knowledge_lsh (band, bucket)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_knowledge_passages_doc ON knowledge_passages (doc_id)")
+    if fresh:
+        from knowledge_dedup import reindex
+        reindex(conn)
+
+    # 13. CONTENUTO COMPRESSO (knowledge_codec): colonne e compressione nella migrazione 3 di storage.py
+    # 14. CUBO ORARIO META ADS (meta_cube: inserzione × giorno × ora × metrica)
+    from meta_cube import ensure_schema
+    ensure_schema(conn)
+
     conn.commit()
     conn.close()
\ No newline at end of file
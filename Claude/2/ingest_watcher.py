@@ -0,0 +1,225 @@
+"""
+INGEST_WATCHER.PY - Auto-import degli export CSV
+Controlla knowledge_docs/CSV/{IG,meta,tiktok}, aspetta che i file smettano di
+cambiare (debounce) e carica nel DB solo i file nuovi o modificati.
+
+Uso:
+    python ingest_watcher.py                      # loop continuo su enterprise_os.db
+    python ingest_watcher.py --once               # una sola scansione
+    python ingest_watcher.py --db ../../yangkidd_pro.db
+    python ingest_watcher.py --artist "Altro Artista"  # shard workspaces/altro-artista/enterprise_os.db
+"""
+
+import os
+import io
+import time
+import hashlib
+import argparse
+import threading
+
+import database
+from database import get_connection, init_advanced_db
+from social_ingest import smart_csv_loader, save_social_bulk, log_upload_event
+
+# ============ CONFIG ============
+
+WATCH_ROOT = os.path.join("knowledge_docs", "CSV")
+
+# Sottocartella -> piattaforma salvata in social_stats
+FOLDER_PLATFORMS = {
+    "IG": "Instagram",
+    "meta": "Meta Ads",
+    "tiktok": "TikTok",
+}
+
+WATCH_EXTENSIONS = ('.csv', '.txt')
+POLL_SECONDS = 2.0
+DEBOUNCE_SECONDS = 5.0
+
+# ============ HELPERS ============
+
+class _DiskUpload(io.BytesIO):
+    """Imita l'UploadedFile di Streamlit (getvalue + name) per un file su disco"""
+    def __init__(self, data, name):
+        super().__init__(data)
+        self.name = name
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def scan_folder(root=WATCH_ROOT):
+    """Ritorna {path: (platform, size, mtime)} per tutti i file monitorati"""
+    found = {}
+    for folder, platform in FOLDER_PLATFORMS.items():
+        base = os.path.join(root, folder)
+        if not os.path.isdir(base):
+            continue
+        for entry in os.scandir(base):
+            if not entry.is_file() or not entry.name.lower().endswith(WATCH_EXTENSIONS):
+                continue
+            # I report già convertiti (*_readable.txt) non sono export
+            if entry.name.lower().endswith('_readable.txt'):
+                continue
+            st_ = entry.stat()
+            found[entry.path] = (platform, st_.st_size, st_.st_mtime)
+    return found
+
+def get_ingested(path):
+    """(sha256, size, mtime) dell'ultimo ingest del file, o None"""
+    conn = get_connection()
+    try:
+        return conn.execute("SELECT sha256, size, mtime FROM ingest_files WHERE path=?", (path,)).fetchone()
+    except:
+        return None
+    finally:
+        conn.close()
+
+def mark_ingested(path, sha, size, mtime, file_type, rows):
+    conn = get_connection()
+    try:
+        conn.execute(
+            "INSERT OR REPLACE INTO ingest_files (path, sha256, size, mtime, file_type, rows_processed) VALUES (?,?,?,?,?,?)",
+            (path, sha, size, mtime, file_type, rows)
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+# ============ INGEST ============
+
+def ingest_file(path, platform, size=None, mtime=None):
+    """Carica un singolo file se il contenuto è cambiato. Ritorna (righe, status)"""
+    if size is None or mtime is None:
+        st_ = os.stat(path)
+        size, mtime = st_.st_size, st_.st_mtime
+
+    sha = file_sha256(path)
+    prev = get_ingested(path)
+    if prev and prev[0] == sha:
+        # Stesso contenuto (es. file solo "toccato"): aggiorna solo mtime
+        if prev[1] != size or prev[2] != mtime:
+            mark_ingested(path, sha, size, mtime, None, 0)
+        return 0, "SKIP (hash invariato)"
+
+    with open(path, 'rb') as f:
+        upload = _DiskUpload(f.read(), os.path.basename(path))
+
+    df, status, file_type = smart_csv_loader(upload)
+    if df is None or file_type in ("ERROR", "UNKNOWN"):
+        log_upload_event(upload.name, platform, f"ERRORE watcher: {status} ({file_type})")
+        # Registra comunque l'hash per non riprovare lo stesso file rotto a ogni giro
+        mark_ingested(path, sha, size, mtime, file_type, 0)
+        return 0, f"ERRORE: tipo {file_type} ({status})"
+
+    rows, msg = save_social_bulk(df, platform, file_type)
+    if msg == "OK":
+        mark_ingested(path, sha, size, mtime, file_type, rows)
+        log_upload_event(upload.name, platform, f"OK watcher ({file_type}, {rows} righe)")
+    else:
+        log_upload_event(upload.name, platform, f"ERRORE watcher: {msg}")
+    return rows, msg
+
+class IngestWatcher:
+    """
+    Polling con debounce: un file viene importato solo quando size e mtime
+    restano uguali per DEBOUNCE_SECONDS (evita di leggere export scritti a metà).
+    """
+
+    def __init__(self, root=WATCH_ROOT, poll=POLL_SECONDS, debounce=DEBOUNCE_SECONDS, log=print):
+        self.root = root
+        self.poll = poll
+        self.debounce = debounce
+        self.log = log
+        self._pending = {}  # path -> (size, mtime, stable_since)
+        self._seen = {}     # path -> (size, mtime) già allineati al DB
+        self._stop = threading.Event()
+
+    def _known(self, path, size, mtime):
+        if self._seen.get(path) == (size, mtime):
+            return True
+        prev = get_ingested(path)
+        if prev is not None and prev[1] == size and prev[2] == mtime:
+            self._seen[path] = (size, mtime)
+            return True
+        return False
+
+    def poll_once(self, now=None):
+        """Una scansione. Ritorna la lista dei file importati in questo giro"""
+        now = time.time() if now is None else now
+        ingested = []
+        current = scan_folder(self.root)
+
+        # File spariti: dimentica lo stato pendente
+        for path in list(self._pending):
+            if path not in current:
+                del self._pending[path]
+
+        for path, (platform, size, mtime) in current.items():
+            if path not in self._pending and self._known(path, size, mtime):
+                continue
+
+            prev = self._pending.get(path)
+            if prev is None or prev[0] != size or prev[1] != mtime:
+                # Nuovo o ancora in scrittura: (ri)parte il timer di debounce
+                self._pending[path] = (size, mtime, now)
+                continue
+
+            if now - prev[2] < self.debounce:
+                continue
+
+            del self._pending[path]
+            try:
+                rows, msg = ingest_file(path, platform, size, mtime)
+                self._seen[path] = (size, mtime)
+                self.log(f"[watcher] {path} -> {rows} righe ({msg})")
+                ingested.append(path)
+            except Exception as e:
+                self.log(f"[watcher] {path} -> errore: {e}")
+        return ingested
+
+    def run(self):
+        self.log(f"[watcher] monitoraggio di {self.root} ogni {self.poll}s (debounce {self.debounce}s)")
+        while not self._stop.is_set():
+            self.poll_once()
+            self._stop.wait(self.poll)
+
+    def start(self):
+        """Avvia il watcher in un thread daemon (utile dentro un'app Streamlit)"""
+        t = threading.Thread(target=self.run, name="ingest-watcher", daemon=True)
+        t.start()
+        return t
+
+    def stop(self):
+        self._stop.set()
+
+# ============ CLI ============
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Auto-import degli export social da knowledge_docs/CSV")
+    ap.add_argument("--root", default=WATCH_ROOT)
+    ap.add_argument("--db", default=None, help="File SQLite di destinazione (default: enterprise_os.db)")
+    ap.add_argument("--artist", default=None, help="Workspace dell'artista (default: ARTIST o YangKidd)")
+    ap.add_argument("--poll", type=float, default=POLL_SECONDS)
+    ap.add_argument("--debounce", type=float, default=DEBOUNCE_SECONDS)
+    ap.add_argument("--once", action="store_true", help="Importa subito tutto ciò che è cambiato ed esce")
+    args = ap.parse_args()
+
+    if args.artist:
+        database.use_workspace(args.artist)
+    if args.db:
+        database.DB_NAME = args.db
+    init_advanced_db()
+
+    if args.once:
+        for path, (platform, size, mtime) in scan_folder(args.root).items():
+            rows, msg = ingest_file(path, platform, size, mtime)
+            print(f"{path} -> {rows} righe ({msg})")
+    else:
+        try:
+            IngestWatcher(args.root, args.poll, args.debounce).run()
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,154 @@
+"""
+KNOWLEDGE_DEDUP.PY - Quasi-duplicati in knowledge_base (MinHash + LSH in SQLite)
+
+Ogni documento viene diviso in passaggi (paragrafi accorpati fino a PASSAGE_CHARS).
+Per ogni passaggio si calcola una firma MinHash (NUM_PERM minimi sugli shingle di
+SHINGLE parole); la firma è divisa in BANDS bande e ogni banda finisce in un bucket
+della tabella knowledge_lsh. Due passaggi simili condividono quasi sempre almeno un
+bucket: i candidati si trovano con una query indicizzata (nessun confronto con tutto
+il corpus) e si confermano con la Jaccard stimata dalle firme (>= THRESHOLD).
+
+All'inserimento (insert_document):
+  - passaggi già presenti -> scartati, il documento salva solo quelli nuovi (merge);
+  - documento nuovo per meno di MIN_NEW_RATIO -> rifiutato per intero.
+"""
+
+import re
+import hashlib
+import numpy as np
+
+from knowledge_codec import pack, unpack
+
+# ============ CONFIG ============
+
+NUM_PERM = 64
+BANDS = 16                  # 16 bande x 4 righe: candidati da Jaccard ~0.5 in su
+ROWS = NUM_PERM // BANDS
+THRESHOLD = 0.8             # Jaccard stimata oltre cui un passaggio è duplicato
+SHINGLE = 5                 # parole per shingle
+PASSAGE_CHARS = 1200
+MIN_PASSAGE_WORDS = 20      # passaggi più corti (titoli, piè di pagina) non si indicizzano
+MIN_NEW_RATIO = 0.2         # sotto questa quota di testo nuovo il documento non si salva
+
+_PRIME = np.uint64((1 << 31) - 1)
+_rng = np.random.RandomState(42)   # seme fisso: le firme salvate restano confrontabili
+_A = _rng.randint(1, (1 << 31) - 1, NUM_PERM).astype(np.uint64)
+_B = _rng.randint(0, (1 << 31) - 1, NUM_PERM).astype(np.uint64)
+
+# ============ FIRME ============
+
+def split_passages(text, max_chars=PASSAGE_CHARS):
+    """Paragrafi (righe vuote) accorpati fino a max_chars; i paragrafi lunghi vanno spezzati sulle frasi"""
+    parts = []
+    for para in re.split(r"\n\s*\n", text or ""):
+        para = para.strip()
+        while len(para) > max_chars:
+            cut = para.rfind(". ", 0, max_chars)
+            cut = cut + 1 if cut > max_chars // 2 else max_chars
+            parts.append(para[:cut].strip())
+            para = para[cut:].strip()
+        if para:
+            parts.append(para)
+    passages, buf = [], ""
+    for p in parts:
+        if buf and len(buf) + len(p) + 2 > max_chars:
+            passages.append(buf)
+            buf = p
+        else:
+            buf = f"{buf}\n\n{p}" if buf else p
+    if buf:
+        passages.append(buf)
+    return passages
+
+def _shingles(text):
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < SHINGLE:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + SHINGLE]) for i in range(len(words) - SHINGLE + 1)}
+
+def signature(text):
+    """Firma MinHash (uint32[NUM_PERM]); None se il passaggio è troppo corto"""
+    if len(re.findall(r"\w+", text)) < MIN_PASSAGE_WORDS:
+        return None
+    sh = np.fromiter((int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little")
+                      for s in _shingles(text)), dtype=np.uint64)
+    sh %= _PRIME
+    # (a*x + b) mod p per ogni permutazione: a, x < 2^31 -> nessun overflow su uint64
+    return ((np.outer(_A, sh) + _B[:, None]) % _PRIME).min(axis=1).astype(np.uint32)
+
+def _buckets(sig):
+    """Chiave (intero firmato a 64 bit) per ogni banda"""
+    return [int.from_bytes(hashlib.blake2b(sig[b * ROWS:(b + 1) * ROWS].tobytes(), digest_size=8).digest(),
+                           "little", signed=True) for b in range(BANDS)]
+
+def similarity(sig_a, sig_b):
+    """Jaccard stimata: quota di minimi uguali"""
+    return float(np.mean(sig_a == sig_b))
+
+# ============ INDICE ============
+
+def find_duplicate(conn, sig):
+    """id del passaggio già indicizzato più simile (>= THRESHOLD), oppure None"""
+    keys = _buckets(sig)
+    where = " OR ".join(["(band=? AND bucket=?)"] * BANDS)
+    params = [v for b, k in enumerate(keys) for v in (b, k)]
+    cands = conn.execute(
+        f"SELECT DISTINCT p.id, p.signature FROM knowledge_lsh l JOIN knowledge_passages p ON p.id = l.passage_id "
+        # Solo documenti ancora presenti (righe cancellate a mano da knowledge_base)
+        f"JOIN knowledge_base k ON k.id = p.doc_id WHERE {where}", params).fetchall()
+    best, best_sim = None, THRESHOLD
+    for pid, blob in cands:
+        sim = similarity(sig, np.frombuffer(blob, dtype=np.uint32))
+        if sim >= best_sim:
+            best, best_sim = pid, sim
+    return best
+
+def index_passage(conn, doc_id, pos, sig):
+    cur = conn.execute("INSERT INTO knowledge_passages (doc_id, pos, signature) VALUES (?,?,?)",
+                       (doc_id, pos, sig.tobytes()))
+    conn.executemany("INSERT INTO knowledge_lsh (band, bucket, passage_id) VALUES (?,?,?)",
+                     [(b, k, cur.lastrowid) for b, k in enumerate(_buckets(sig))])
+
+def insert_document(conn, source, content, extra=None):
+    """
+    Inserisce il documento tenendo solo i passaggi non già presenti.
+    extra: colonne aggiuntive di knowledge_base (es. {"content_hash": ...}).
+    Ritorna (id o None se rifiutato, passaggi nuovi, passaggi duplicati). Nessun commit.
+    """
+    passages = split_passages(content)
+    keep, sigs, dups = [], [], 0
+    for p in passages:
+        sig = signature(p)
+        if sig is not None:
+            # Controllo anche contro i passaggi già accettati di questo stesso documento
+            if find_duplicate(conn, sig) is not None or any(similarity(sig, s) >= THRESHOLD for s in sigs if s is not None):
+                dups += 1
+                continue
+        keep.append(p)
+        sigs.append(sig)
+    kept_chars = sum(len(p) for p in keep)
+    if not passages or kept_chars < MIN_NEW_RATIO * sum(len(p) for p in passages):
+        return None, 0, dups
+    text = content if not dups else "\n\n".join(keep)
+    blob, orig_len, preview = pack(text)
+    cols = {"source": source, "content": blob, "orig_len": orig_len, "preview": preview, **(extra or {})}
+    cur = conn.execute(f"INSERT INTO knowledge_base ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})",
+                       tuple(cols.values()))
+    doc_id = cur.lastrowid
+    new = 0
+    for pos, sig in enumerate(sigs):
+        if sig is not None:
+            index_passage(conn, doc_id, pos, sig)
+            new += 1
+    return doc_id, new, dups
+
+def reindex(conn):
+    """Indicizza i documenti di knowledge_base che non hanno ancora passaggi (DB esistenti)"""
+    rows = conn.execute("SELECT id, content FROM knowledge_base k WHERE NOT EXISTS "
+                        "(SELECT 1 FROM knowledge_passages p WHERE p.doc_id = k.id)").fetchall()
+    for doc_id, content in rows:
+        for pos, p in enumerate(split_passages(unpack(content))):
+            sig = signature(p)
+            if sig is not None:
+                index_passage(conn, doc_id, pos, sig)
+    return len(rows)
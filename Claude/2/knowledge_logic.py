@@ -1,35 +1,64 @@
 import os
-import requests
-from bs4 import BeautifulSoup
-from PyPDF2 import PdfReader
-from database import get_connection
+from database import get_connection, bump_table_version
+from knowledge_codec import unpack
+from perf_trace import span, traced
+from knowledge_dedup import insert_document
+import knowledge_scraper
+from knowledge_scraper import Fetcher, parse_html, urls_from_sitemap, content_hash, save_unique
+
+# requests, bs4 e PyPDF2 sono importati dentro le funzioni (import al primo utilizzo)
 
 PDF_FOLDER = "knowledge_docs"
 
+_FETCHER = None
+
+def _fetcher():
+    # Un solo Fetcher (sessione HTTP + limiti per host) riusato tra le chiamate
+    global _FETCHER
+    if _FETCHER is None: _FETCHER = Fetcher()
+    return _FETCHER
+
+@traced("knowledge.ingest")
 def ingest_local_pdfs():
     if not os.path.exists(PDF_FOLDER): os.makedirs(PDF_FOLDER); return "Cartella creata."
     files = [f for f in os.listdir(PDF_FOLDER) if f.endswith('.pdf')]
     if not files: return "Nessun PDF."
+    from PyPDF2 import PdfReader
     conn = get_connection()
-    c = 0
+    c = skipped = 0
     for f in files:
         if conn.execute("SELECT count(*) FROM knowledge_base WHERE source=?",(f"PDF:{f}",)).fetchone()[0]==0:
             try:
-                r=PdfReader(os.path.join(PDF_FOLDER,f)); txt="\n".join([p.extract_text() for p in r.pages])
-                conn.execute("INSERT INTO knowledge_base (source,content) VALUES (?,?)",(f"PDF:{f}",txt)); c+=1
+                with span("knowledge.pdf_extract", file=f) as sp:
+                    r=PdfReader(os.path.join(PDF_FOLDER,f)); txt="\n".join([p.extract_text() for p in r.pages]); sp.rows=len(r.pages)
+                with span("knowledge.insert") as sp:
+                    # Stesso libro già importato con altro nome: passaggi duplicati scartati
+                    doc_id,new,dups=insert_document(conn,f"PDF:{f}",txt,{"content_hash":content_hash(txt)}); sp.rows=new
+                    if doc_id is not None: c+=1
+                    else: skipped+=1
             except: pass
-    conn.commit(); conn.close(); return f"Importati {c}"
+    if c: bump_table_version(conn,"knowledge_base")
+    conn.commit(); conn.close(); return f"Importati {c}" + (f" ({skipped} duplicati scartati)" if skipped else "")
 
 def scrape_webpage(url):
+    # Stessa pipeline del batch (sessione a pool, cache HTTP, parser più veloce disponibile)
     try:
-        r=requests.get(url,headers={'User-Agent':'Mozilla/5.0'},timeout=10)
-        s=BeautifulSoup(r.text,'html.parser'); [x.decompose() for x in s(["script","style"])]
-        return s.title.string," ".join([p.text for p in s.find_all('p')])
+        html, _ = _fetcher().fetch(url)
+        return parse_html(html)
     except Exception as e: return None,str(e)
 
-def save_knowledge(s,c): 
-    conn=get_connection(); conn.execute("INSERT INTO knowledge_base (source,content) VALUES (?,?)",(s,c)); conn.commit(); conn.close()
+def scrape_urls(urls, progress=None):
+    """Import in batch (download in parallelo + dedup): vedi knowledge_scraper.scrape_urls"""
+    return knowledge_scraper.scrape_urls(urls, _fetcher(), progress=progress)
+
+def scrape_sitemap(url, progress=None):
+    return scrape_urls(urls_from_sitemap(url, _fetcher()), progress)
+
+def save_knowledge(s,c):
+    # False se lo stesso contenuto (hash del testo normalizzato) è già presente
+    return save_unique([(s,c)])[0]
 
-def get_knowledge_context():
+def get_knowledge_context(max_chars=2000):
+    # Si decomprime solo l'inizio di ogni documento (quello che finisce nel prompt)
     conn=get_connection(); r=conn.execute("SELECT source,content FROM knowledge_base").fetchall(); conn.close()
-    return "\n".join([f"-- {x[0]} --\n{x[1][:2000]}" for x in r]) if r else ""
\ No newline at end of file
+    return "\n".join([f"-- {x[0]} --\n{unpack(x[1],max_chars)}" for x in r]) if r else ""
\ No newline at end of file
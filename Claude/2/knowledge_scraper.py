@@ -0,0 +1,271 @@
+"""
+KNOWLEDGE_SCRAPER.PY - Import in batch di pagine web nella knowledge base
+
+    python knowledge_scraper.py https://sito/a https://sito/b
+    python knowledge_scraper.py --sitemap https://sito/sitemap.xml
+
+- download in parallelo (MAX_WORKERS) con una sessione HTTP a pool di connessioni
+  e al massimo PER_HOST richieste contemporanee verso lo stesso sito;
+- cache HTTP su disco (HTTP_CACHE_DIR): richieste condizionali con ETag /
+  Last-Modified, su 304 si riusa la copia salvata;
+- parsing con lxml se installato, altrimenti html.parser;
+- dedup: il testo normalizzato viene hashato (sha256) e non si inserisce due volte
+  lo stesso contenuto (né nello stesso batch né se è già in knowledge_base); i
+  quasi-duplicati li gestisce knowledge_dedup.
+
+Le dipendenze (requests, bs4) sono importate al primo utilizzo.
+"""
+
+import os
+import re
+import json
+import hashlib
+import argparse
+import threading
+import xml.etree.ElementTree as ET
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import database
+from database import get_connection, bump_table_version
+from knowledge_dedup import insert_document
+
+# ============ CONFIG ============
+
+MAX_WORKERS = 8
+PER_HOST = 2
+TIMEOUT = 10
+USER_AGENT = "Mozilla/5.0 (YangKidd Knowledge Scraper)"
+HTTP_CACHE_DIR = os.path.join("knowledge_docs", ".http_cache")
+MIN_TEXT_CHARS = 200   # pagine con meno testo (cookie wall, 404 "morbidi") non vengono salvate
+
+# ============ HTTP ============
+
+def make_session(pool_size=MAX_WORKERS):
+    import requests
+    from requests.adapters import HTTPAdapter
+    s = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=1)
+    s.mount("http://", adapter)
+    s.mount("https://", adapter)
+    s.headers["User-Agent"] = USER_AGENT
+    return s
+
+class HttpCache:
+    """Corpo + validatori (ETag, Last-Modified) per URL, un file .json e uno .body per voce"""
+
+    def __init__(self, folder=HTTP_CACHE_DIR):
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+
+    def _path(self, url):
+        return os.path.join(self.folder, hashlib.sha1(url.encode("utf-8")).hexdigest())
+
+    def get(self, url):
+        p = self._path(url)
+        try:
+            with open(p + ".json", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(p + ".body", "rb") as f:
+                return meta, f.read()
+        except (OSError, ValueError):
+            return None, None
+
+    def put(self, url, headers, body, encoding):
+        meta = {"url": url, "etag": headers.get("ETag"), "last_modified": headers.get("Last-Modified"),
+                "encoding": encoding}
+        if not meta["etag"] and not meta["last_modified"]:
+            return  # senza validatori non si può rivalidare: inutile salvarla
+        p = self._path(url)
+        with open(p + ".body", "wb") as f:
+            f.write(body)
+        with open(p + ".json", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+class Fetcher:
+    """GET condizionali in parallelo con limite per host"""
+
+    def __init__(self, session=None, cache=None, per_host=PER_HOST, timeout=TIMEOUT):
+        self.session = session or make_session()
+        self.cache = cache if cache is not None else HttpCache()
+        self.per_host = per_host
+        self.timeout = timeout
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _host_slot(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = threading.Semaphore(self.per_host)
+            return self._hosts[host]
+
+    def fetch(self, url):
+        """Ritorna (testo html, da_cache)"""
+        meta, body = self.cache.get(url) if self.cache else (None, None)
+        headers = {}
+        if meta:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+        with self._host_slot(url):
+            r = self.session.get(url, headers=headers, timeout=self.timeout)
+        if r.status_code == 304 and body is not None:
+            return body.decode(meta.get("encoding") or "utf-8", errors="replace"), True
+        r.raise_for_status()
+        encoding = r.encoding or r.apparent_encoding or "utf-8"
+        if self.cache:
+            self.cache.put(url, r.headers, r.content, encoding)
+        return r.content.decode(encoding, errors="replace"), False
+
+# ============ PARSING ============
+
+def _parser():
+    try:
+        import lxml  # noqa: F401
+        return "lxml"
+    except ImportError:
+        return "html.parser"
+
+def parse_html(html):
+    """(titolo, testo dei paragrafi) come faceva scrape_webpage"""
+    from bs4 import BeautifulSoup
+    s = BeautifulSoup(html, _parser())
+    for x in s(["script", "style", "noscript"]):
+        x.decompose()
+    title = s.title.get_text(strip=True) if s.title else None
+    return title, " ".join(p.get_text(" ", strip=True) for p in s.find_all("p"))
+
+def urls_from_sitemap(url, fetcher=None, max_urls=500):
+    """URL di una sitemap (segue un livello di sitemapindex)"""
+    fetcher = fetcher or Fetcher()
+    xml, _ = fetcher.fetch(url)
+    root = ET.fromstring(xml.encode("utf-8"))
+    ns = re.match(r"\{.*\}", root.tag)
+    ns = ns.group(0) if ns else ""
+    locs = [e.text.strip() for e in root.iter(f"{ns}loc") if e.text]
+    if root.tag == f"{ns}sitemapindex":
+        urls = []
+        for sub in locs:
+            try:
+                urls += urls_from_sitemap(sub, fetcher, max_urls - len(urls))
+            except Exception as e:
+                print(f"Sitemap {sub} non leggibile: {e}")
+            if len(urls) >= max_urls:
+                break
+        return urls[:max_urls]
+    return locs[:max_urls]
+
+# ============ DEDUP + SALVATAGGIO ============
+
+def content_hash(text):
+    """sha256 del testo normalizzato (minuscole, spazi compressi)"""
+    norm = re.sub(r"\s+", " ", text or "").strip().lower()
+    return hashlib.sha256(norm.encode("utf-8")).hexdigest()
+
+def save_unique(items):
+    """
+    items: lista di (source, content). Inserisce in una sola transazione i contenuti
+    il cui hash non è già nel batch o in knowledge_base, passando da
+    knowledge_dedup.insert_document (scarta i passaggi quasi-duplicati).
+    Ritorna una lista di bool (True = salvato, False = duplicato), nell'ordine di items.
+    """
+    conn = get_connection()
+    saved = []
+    try:
+        seen = set()
+        for source, content in items:
+            h = content_hash(content)
+            if h in seen or conn.execute("SELECT 1 FROM knowledge_base WHERE content_hash=? LIMIT 1", (h,)).fetchone():
+                saved.append(False)
+                continue
+            seen.add(h)
+            # Quasi-duplicati: si salvano solo i passaggi nuovi (o niente)
+            doc_id, _new, _dups = insert_document(conn, source, content, {"content_hash": h})
+            saved.append(doc_id is not None)
+        if any(saved):
+            bump_table_version(conn, "knowledge_base")
+        conn.commit()
+    finally:
+        conn.close()
+    return saved
+
+def scrape_urls(urls, fetcher=None, workers=MAX_WORKERS, progress=None):
+    """
+    Scarica e analizza gli URL in parallelo, poi salva i contenuti nuovi.
+    progress(i, n, risultato) viene chiamato a ogni pagina completata.
+    Ritorna la lista dei risultati {url, title, chars, cached, duplicate, saved, error}.
+    """
+    fetcher = fetcher or Fetcher()
+    urls = list(dict.fromkeys(u.strip() for u in urls if u and u.strip()))
+
+    def work(url):
+        html, cached = fetcher.fetch(url)
+        title, text = parse_html(html)
+        return title, text, cached
+
+    results, to_save = [], []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(work, u): u for u in urls}
+        for i, fut in enumerate(as_completed(futures), 1):
+            url = futures[fut]
+            res = {"url": url, "title": None, "chars": 0, "cached": False, "duplicate": False, "saved": False, "error": None}
+            try:
+                title, text, cached = fut.result()
+                res.update(title=title, chars=len(text), cached=cached)
+                if len(text) >= MIN_TEXT_CHARS:
+                    to_save.append((res, f"WEB:{title or url}", text))
+                else:
+                    res["error"] = "testo troppo corto"
+            except Exception as e:
+                res["error"] = str(e)[:200]
+            results.append(res)
+            if progress:
+                progress(i, len(urls), res)
+
+    for (res, _, _), ok in zip(to_save, save_unique([(src, text) for _, src, text in to_save])):
+        res["saved"], res["duplicate"] = ok, not ok
+    return results
+
+def start_background(urls, on_done=None):
+    """Lancia scrape_urls in un thread daemon; lo stato si legge da job['done'], job['progress'], job['results']"""
+    job = {"done": False, "progress": (0, len(urls)), "results": None}
+
+    def run():
+        try:
+            job["results"] = scrape_urls(urls, progress=lambda i, n, _r: job.__setitem__("progress", (i, n)))
+        finally:
+            job["done"] = True
+            if on_done:
+                on_done(job)
+
+    threading.Thread(target=run, name="knowledge-scraper", daemon=True).start()
+    return job
+
+# ============ CLI ============
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Importa pagine web nella knowledge base")
+    ap.add_argument("urls", nargs="*")
+    ap.add_argument("--sitemap", action="append", default=[])
+    ap.add_argument("--db", default=None, help="File SQLite (default: enterprise_os.db)")
+    ap.add_argument("--artist", default=None, help="Workspace dell'artista (default: ARTIST o YangKidd)")
+    ap.add_argument("--workers", type=int, default=MAX_WORKERS)
+    args = ap.parse_args()
+
+    if args.artist:
+        database.use_workspace(args.artist)
+    if args.db:
+        database.DB_NAME = args.db
+    database.init_advanced_db()
+
+    fetcher = Fetcher()
+    urls = list(args.urls)
+    for sm in args.sitemap:
+        urls += urls_from_sitemap(sm, fetcher)
+    for r in scrape_urls(urls, fetcher, args.workers,
+                         progress=lambda i, n, r: print(f"[{i}/{n}] {r['url']} -> {r['error'] or str(r['chars']) + ' caratteri'}{' (cache)' if r['cached'] else ''}")):
+        if r["duplicate"]:
+            print(f"  duplicato: {r['url']}")
+    print("Fatto.")
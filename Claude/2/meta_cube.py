@@ -0,0 +1,212 @@
+"""
+META_CUBE.PY - Cubo orario Meta Ads (inserzione × giorno × ora × metrica)
+
+GIORNO_ORA.csv (breakdown per giorno e ora del giorno, ~160 colonne) finiva in
+social_stats solo come "Spend - {nome}" del giorno di caricamento: la dimensione
+oraria si perdeva e per sapere "a che ora conviene spendere" bisognava
+ricaricare il CSV e rifare le somme nel convertitore.
+
+All'ingest (save_social_bulk, META_ADS con colonna ora) le poche colonne utili
+diventano celle di una tabella a chiavi intere:
+
+    meta_ads_dim  (ad INTEGER PK, ext_id, name)             -> inserzioni
+    meta_cube     (ad, day, hour, metric, value)            WITHOUT ROWID
+
+day = giorni dal 1970-01-01, hour = 0..23, metric = codice in METRICS.
+Le righe con "Inizio dei report" != "Fine dei report" (totali su un periodo)
+restano fuori: non appartengono a un giorno. Ricaricare lo stesso export
+sovrascrive le stesse celle (UPSERT).
+
+    from meta_cube import best_hours
+    best_hours(days=7, by="cpc")   # ore con il costo per clic più basso negli ultimi 7 giorni di dati
+"""
+
+import re
+import argparse
+from datetime import date, timedelta
+
+import pandas as pd
+
+from database import get_connection, cached_read, bump_table_version
+from column_roles import ColumnResolver
+
+# metrica -> codice intero salvato in meta_cube.metric
+METRICS = {"spend": 1, "impressions": 2, "link_clicks": 3, "clicks_all": 4, "reach": 5}
+
+_EPOCH = date(1970, 1, 1)
+_HOUR_RE = re.compile(r"^\s*(\d{1,2})")
+
+# ============ SCHEMA ============
+
+def ensure_schema(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS meta_ads_dim (
+                    ad INTEGER PRIMARY KEY AUTOINCREMENT,
+                    ext_id TEXT UNIQUE,
+                    name TEXT
+                )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS meta_cube (
+                    ad INTEGER,
+                    day INTEGER,
+                    hour INTEGER,
+                    metric INTEGER,
+                    value REAL,
+                    PRIMARY KEY (ad, day, hour, metric)
+                ) WITHOUT ROWID''')
+    # Le query per periodo partono dal giorno: indice coprente, niente accessi alla tabella
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_meta_cube_day ON meta_cube (day, hour, metric, value)")
+
+# ============ INGEST ============
+
+def _columns(df):
+    """Colonne del breakdown orario (None se l'export non ha ora o giorno)"""
+    cols = ColumnResolver(df.columns)
+    found = {
+        "hour": cols.get("day_hour") or cols.get("hour"),
+        "start": cols.first(lambda c: c.startswith(("inizio dei report", "reporting starts"))),
+        "end": cols.first(lambda c: c.startswith(("fine dei report", "reporting ends"))),
+        "name": cols.get("ad_name") or cols.first(lambda c: c == "ad name"),
+        "ext_id": cols.first(lambda c: c in ("id dell'inserzione", "ad id")),
+        "spend": cols.get("spend"),
+        "impressions": cols.get("impressions"),
+        "link_clicks": cols.get("link_clicks"),
+        "clicks_all": cols.first(lambda c: c.startswith(("clic (tutti)", "clicks (all)"))),
+        "reach": cols.first(lambda c: c in ("copertura", "reach")),
+    }
+    if not (found["hour"] and found["start"] and found["name"]):
+        return None
+    return found
+
+def is_hourly(df):
+    return _columns(df) is not None
+
+def _number(series):
+    # Gli export Meta hanno numeri grezzi ("1.56", "611"): virgola decimale tollerata
+    return pd.to_numeric(series.astype(str).str.replace(",", ".", regex=False), errors="coerce").fillna(0.0)
+
+def build_cells(df):
+    """
+    DataFrame del CSV -> (inserzioni {ext_id: nome}, celle [(ext_id, day, hour, metric, value)]).
+    Vettoriale: una passata per colonna, non per riga.
+    """
+    c = _columns(df)
+    if c is None:
+        return {}, []
+    names = df[c["name"]].astype(str).str.strip()
+    ext = df[c["ext_id"]].astype(str).str.strip() if c["ext_id"] else names
+    # astype(str): le colonne category darebbero date categoriche, non confrontabili tra loro
+    start = pd.to_datetime(df[c["start"]].astype(str), errors="coerce")
+    end = pd.to_datetime(df[c["end"]].astype(str), errors="coerce") if c["end"] else start
+    hour = pd.to_numeric(df[c["hour"]].astype(str).str.extract(_HOUR_RE, expand=False), errors="coerce")
+
+    keep = names.ne("nan") & names.ne("") & start.notna() & (start == end) & hour.between(0, 23)
+    if not keep.any():
+        return {}, []
+    day = (start[keep] - pd.Timestamp(_EPOCH)).dt.days.astype(int)
+    hour = hour[keep].astype(int)
+    ext = ext[keep]
+
+    cells = []
+    for metric, code in METRICS.items():
+        if not c[metric]:
+            continue
+        values = _number(df.loc[keep, c[metric]])
+        cells.extend(zip(ext, day, hour, [code] * len(values), values))
+    ads = dict(zip(ext, names[keep]))
+    return ads, cells
+
+def ingest(conn, df):
+    """Scrive il cubo dell'export nella transazione di `conn` (commit del chiamante); ritorna le celle scritte"""
+    ads, cells = build_cells(df)
+    if not cells:
+        return 0
+    ensure_schema(conn)
+    conn.executemany('''INSERT INTO meta_ads_dim (ext_id, name) VALUES (?, ?)
+                        ON CONFLICT(ext_id) DO UPDATE SET name = excluded.name''', ads.items())
+    marks = ",".join("?" * len(ads))
+    keys = dict(conn.execute(f"SELECT ext_id, ad FROM meta_ads_dim WHERE ext_id IN ({marks})", tuple(ads)).fetchall())
+    conn.executemany('''INSERT INTO meta_cube (ad, day, hour, metric, value) VALUES (?,?,?,?,?)
+                        ON CONFLICT(ad, day, hour, metric) DO UPDATE SET value = excluded.value''',
+                     [(keys[e], int(d), int(h), m, float(v)) for e, d, h, m, v in cells])
+    bump_table_version(conn, "meta_cube", "meta_ads_dim")
+    return len(cells)
+
+# ============ QUERY ============
+
+def best_hours(days=30, by="ctr", ad=None, limit=5, min_impressions=100):
+    """
+    Ore del giorno ordinate per `by` ("ctr" decrescente, "cpc" crescente) sugli
+    ultimi `days` giorni presenti nel cubo (non da oggi: gli export arrivano in ritardo).
+    ad: nome dell'inserzione per limitarsi a una sola. Letture in cache (cached_read)
+    finché il cubo non cambia.
+    """
+    if by not in ("ctr", "cpc"):
+        raise ValueError(f"best_hours: ordinamento '{by}' non supportato (ctr, cpc)")
+    sql = f'''SELECT hour,
+                     SUM(CASE WHEN metric={METRICS["spend"]} THEN value END) AS spend,
+                     SUM(CASE WHEN metric={METRICS["impressions"]} THEN value END) AS impressions,
+                     SUM(CASE WHEN metric={METRICS["link_clicks"]} THEN value END) AS link_clicks
+              FROM meta_cube
+              WHERE day > (SELECT MAX(day) FROM meta_cube) - ?'''
+    params = [int(days)]
+    if ad is not None:
+        sql += " AND ad IN (SELECT ad FROM meta_ads_dim WHERE name = ?)"
+        params.append(ad)
+    sql += " GROUP BY hour"
+    df = cached_read(sql, ("meta_cube", "meta_ads_dim"), params).fillna(0)
+    df = df[df["impressions"] >= min_impressions].assign(
+        ctr=lambda d: (d["link_clicks"] / d["impressions"] * 100).round(2),
+        cpc=lambda d: (d["spend"] / d["link_clicks"].where(d["link_clicks"] > 0)).round(3),
+    )
+    if by == "cpc":
+        df = df[df["cpc"].notna()].sort_values("cpc")
+    else:
+        df = df.sort_values("ctr", ascending=False)
+    return df.head(limit).reset_index(drop=True)
+
+def day_range():
+    """(primo, ultimo) giorno nel cubo come date, o None se vuoto"""
+    conn = get_connection()
+    try:
+        ensure_schema(conn)
+        lo, hi = conn.execute("SELECT MIN(day), MAX(day) FROM meta_cube").fetchone()
+    finally:
+        conn.close()
+    if lo is None:
+        return None
+    return _EPOCH + timedelta(days=lo), _EPOCH + timedelta(days=hi)
+
+# ============ CLI ============
+
+if __name__ == "__main__":
+    import database
+    from social_ingest import smart_csv_loader
+
+    parser = argparse.ArgumentParser(description="Cubo orario Meta Ads: ingest di export e migliori ore")
+    parser.add_argument("files", nargs="*", help="export Meta con breakdown per ora (es. GIORNO_ORA.csv)")
+    parser.add_argument("--artist", default=None, help="workspace dell'artista (default: ARTIST o YangKidd)")
+    parser.add_argument("--db", default=None)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--by", choices=("ctr", "cpc"), default="ctr")
+    parser.add_argument("--ad", default=None)
+    args = parser.parse_args()
+    if args.artist:
+        database.use_workspace(args.artist)
+    if args.db:
+        database.DB_NAME = args.db
+
+    from report_cache import _Uploaded
+    for path in args.files:
+        with open(path, "rb") as f:
+            df, status, _ = smart_csv_loader(_Uploaded(f.read(), path))
+        if df is None:
+            print(f"{path}: {status}")
+            continue
+        conn = get_connection()
+        try:
+            n = ingest(conn, df)
+            conn.commit()
+        finally:
+            conn.close()
+        print(f"{path}: {n} celle")
+    print(f"Periodo nel cubo: {day_range()}")
+    print(best_hours(args.days, args.by, args.ad).to_string(index=False))
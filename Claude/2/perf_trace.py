@@ -0,0 +1,232 @@
+"""
+PERF_TRACE.PY - Tempi per fase dei percorsi caldi (upload, report, DB, AI)
+
+    with span("csv.read_csv", rows=len(df)):
+        ...
+
+    @traced("save_social_bulk", rows=lambda res: res[0])
+    def save_social_bulk(...): ...
+
+    @traced("social.clean_number", aggregate=True)   # chiamata per ogni cella
+    def clean_number(...): ...
+
+Ogni span finisce in un ring buffer in memoria e nella tabella perf_events.
+Le funzioni chiamate migliaia di volte (aggregate=True) non generano un evento
+a chiamata: tempo e numero di chiamate si sommano e vengono scritti come un solo
+evento alla chiusura dello span più esterno. Gli eventi vanno nel write buffer
+(write_buffer.py) alla chiusura dello span esterno, mai dentro i loop, e su SQLite
+in batch.
+
+perf_events tiene gli ultimi PERF_TRACE_MAX_EVENTS eventi: ogni TRIM_EVERY eventi
+accodati (e al primo flush del processo) nel write buffer va anche un DELETE dei
+più vecchi, sulla chiave primaria.
+
+Disattivabile con PERF_TRACE=0.
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+from collections import deque
+from functools import wraps
+
+import database
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))  # moduli condivisi nella root del repo
+from write_buffer import get_buffer
+
+ENABLED = os.environ.get("PERF_TRACE", "1") != "0"
+RING_SIZE = 2000
+MAX_EVENTS = int(os.environ.get("PERF_TRACE_MAX_EVENTS", "100000"))
+TRIM_EVERY = 1000   # eventi accodati tra una pulizia di perf_events e la successiva
+
+# Ultimi eventi del processo (la pagina Performance li legge anche senza DB)
+RING = deque(maxlen=RING_SIZE)
+
+_local = threading.local()
+_table_ready = set()  # DB su cui perf_events esiste già
+_since_trim = {}      # DB -> eventi accodati dall'ultima pulizia
+
+# ============ REGISTRAZIONE ============
+
+def _state():
+    if not hasattr(_local, "depth"):
+        _local.depth = 0
+        _local.pending = []
+        _local.agg = {}
+    return _local
+
+def _record(st, stage, duration_ms, rows=None, meta=None):
+    ev = (time.time(), stage, round(duration_ms, 3), rows, json.dumps(meta, ensure_ascii=False) if meta else None)
+    RING.append(ev)
+    st.pending.append(ev)
+
+def _close_root(st):
+    """Fine dello span più esterno: scarica gli aggregati e scrive tutto in una transazione"""
+    for stage, (total_s, calls) in st.agg.items():
+        _record(st, stage, total_s * 1000, calls)
+    st.agg = {}
+    events, st.pending = st.pending, []
+    flush(events)
+
+def _ensure_table(conn):
+    if database.DB_NAME in _table_ready:
+        return
+    conn.execute('''CREATE TABLE IF NOT EXISTS perf_events (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    ts REAL,
+                    stage TEXT,
+                    duration_ms REAL,
+                    rows INTEGER,
+                    meta TEXT
+                )''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_perf_events_stage ON perf_events (stage, ts)")
+    _table_ready.add(database.DB_NAME)
+
+def flush(events):
+    if not events:
+        return
+    try:
+        if database.DB_NAME not in _table_ready:
+            conn = database.get_connection()
+            try:
+                _ensure_table(conn)
+                conn.commit()
+            finally:
+                conn.close()
+        # Accodati nel write buffer: scritti in batch insieme alle altre operazioni
+        buf = get_buffer(database.DB_NAME)
+        buf.add_many("INSERT INTO perf_events (ts, stage, duration_ms, rows, meta) VALUES (?,?,?,?,?)", events)
+        # Ritenzione: la prima volta (il DB può essere già grande) e poi ogni TRIM_EVERY eventi
+        queued = _since_trim.get(database.DB_NAME, TRIM_EVERY) + len(events)
+        if queued >= TRIM_EVERY:
+            buf.add("DELETE FROM perf_events WHERE id <= (SELECT MAX(id) FROM perf_events) - ?", (MAX_EVENTS,))
+            queued = 0
+        _since_trim[database.DB_NAME] = queued
+    except Exception as e:
+        # Il tracing non deve mai rompere un upload
+        print(f"perf_trace: scrittura perf_events fallita ({e})")
+
+class span:
+    """Context manager: misura il blocco e lo registra come `stage`. rows/meta modificabili dentro il blocco"""
+
+    def __init__(self, stage, rows=None, **meta):
+        self.stage = stage
+        self.rows = rows
+        self.meta = meta
+
+    def __enter__(self):
+        if ENABLED:
+            _state().depth += 1
+            self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not ENABLED:
+            return False
+        ms = (time.perf_counter() - self.t0) * 1000
+        st = _state()
+        if exc_type is not None:
+            self.meta["error"] = exc_type.__name__
+        _record(st, self.stage, ms, self.rows, self.meta or None)
+        st.depth -= 1
+        if st.depth == 0:
+            _close_root(st)
+        return False
+
+def record(stage, duration_ms, rows=None, **meta):
+    """Registra una durata misurata a mano (es. tempo al primo token dello streaming AI)"""
+    if not ENABLED:
+        return
+    st = _state()
+    _record(st, stage, duration_ms, rows, meta or None)
+    if st.depth == 0:
+        _close_root(st)
+
+def traced(stage, rows=None, aggregate=False):
+    """
+    Decoratore. rows: funzione (risultato -> numero righe) per il throughput.
+    aggregate=True: somma tempo e chiamate, un solo evento per operazione.
+    """
+    def deco(fn):
+        if not ENABLED:
+            return fn
+
+        if aggregate:
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                t0 = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    agg = _state().agg
+                    tot = agg.get(stage)
+                    dt = time.perf_counter() - t0
+                    agg[stage] = (tot[0] + dt, tot[1] + 1) if tot else (dt, 1)
+            return wrapper
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage) as sp:
+                res = fn(*args, **kwargs)
+                if rows is not None:
+                    try:
+                        sp.rows = rows(res)
+                    except Exception:
+                        pass
+                return res
+        return wrapper
+    return deco
+
+# ============ LETTURA ============
+
+def load_events(since_ts=None, limit=50000):
+    """Eventi da perf_events (i più recenti), come DataFrame"""
+    import pandas as pd
+    get_buffer(database.DB_NAME).flush()  # anche gli eventi ancora in coda
+    conn = database.get_connection()
+    try:
+        _ensure_table(conn)
+        q = "SELECT ts, stage, duration_ms, rows, meta FROM perf_events"
+        params = ()
+        if since_ts is not None:
+            q += " WHERE ts >= ?"
+            params = (since_ts,)
+        return pd.read_sql_query(q + " ORDER BY id DESC LIMIT ?", conn, params=params + (limit,))
+    finally:
+        conn.close()
+
+def ring_events():
+    import pandas as pd
+    return pd.DataFrame(list(RING), columns=["ts", "stage", "duration_ms", "rows", "meta"])
+
+def stage_percentiles(events):
+    """Per fase: chiamate, p50/p90/p99/max (ms) e righe al secondo dove c'è un conteggio"""
+    import pandas as pd
+    if events.empty:
+        return pd.DataFrame(columns=["stage", "n", "p50_ms", "p90_ms", "p99_ms", "max_ms", "rows_per_s"])
+    # Il throughput si calcola solo sugli eventi che hanno un conteggio righe
+    events = events.assign(rows_ms=events["duration_ms"].where(events["rows"].notna()))
+    g = events.groupby("stage")
+    out = pd.DataFrame({
+        "n": g.size(),
+        "p50_ms": g["duration_ms"].quantile(0.5),
+        "p90_ms": g["duration_ms"].quantile(0.9),
+        "p99_ms": g["duration_ms"].quantile(0.99),
+        "max_ms": g["duration_ms"].max(),
+        "rows_per_s": g["rows"].sum(min_count=1) / (g["rows_ms"].sum() / 1000),
+    }).round(2)
+    return out.sort_values("p90_ms", ascending=False).reset_index()
+
+def clear_events():
+    RING.clear()
+    get_buffer(database.DB_NAME).flush()
+    conn = database.get_connection()
+    try:
+        _ensure_table(conn)
+        conn.execute("DELETE FROM perf_events")
+        conn.commit()
+    finally:
+        conn.close()
@@ -0,0 +1,256 @@
+"""
+REPORT_CACHE.PY - Cache dei report testuali del convertitore
+
+Chiave: sha256 dei bytes del file + nome file (entra nel report e nel
+riconoscimento del tipo) + versione del convertitore. La versione è l'hash dei
+sorgenti di converter_logic.py, social_logic.py e column_roles.py: cambiare il
+codice invalida da solo tutti i report salvati.
+
+  - in memoria: LRU limitata a MEMORY_MAX_CHARS caratteri di report;
+  - su disco (opzionale): un .txt per chiave in REPORT_CACHE_DIR/<versione>
+    (default knowledge_docs/.report_cache, vuoto = disattivata). Le cartelle
+    delle versioni precedenti vengono cancellate alla prima scrittura e oltre
+    REPORT_CACHE_DISK_MB si eliminano i report letti meno di recente (mtime).
+
+Per i file della cartella knowledge_docs/CSV l'hash viene ricordato per
+(path, dimensione, mtime): un file non modificato non viene neanche riletto.
+Gli errori di caricamento non finiscono in cache.
+
+ReportStream dà il report a sezioni (converter_logic.iter_readable_text) per
+mostrarlo man mano: il report entra in cache solo quando è stato generato tutto.
+"""
+
+import io
+import os
+import shutil
+import hashlib
+import threading
+from collections import OrderedDict
+
+from perf_trace import span
+
+CSV_FOLDER = os.path.join("knowledge_docs", "CSV")
+DISK_DIR = os.environ.get("REPORT_CACHE_DIR", os.path.join("knowledge_docs", ".report_cache"))
+MEMORY_MAX_CHARS = 50_000_000
+DISK_MAX_BYTES = int(float(os.environ.get("REPORT_CACHE_DISK_MB", "500")) * 1024 * 1024)
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+
+def converter_version():
+    h = hashlib.sha1()
+    for name in ("converter_logic.py", "social_logic.py", "column_roles.py"):
+        with open(os.path.join(_HERE, name), "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()[:12]
+
+VERSION = converter_version()
+
+class _Uploaded(io.BytesIO):
+    """Bytes + nome, come l'UploadedFile di Streamlit che load_csv_simple si aspetta"""
+    def __init__(self, data, name):
+        super().__init__(data)
+        self.name = name
+
+class ReportCache:
+    def __init__(self, max_chars=MEMORY_MAX_CHARS, disk_dir=DISK_DIR, disk_max_bytes=DISK_MAX_BYTES):
+        self.max_chars = max_chars
+        self.disk_root = disk_dir or None
+        self.disk_dir = os.path.join(disk_dir, VERSION) if disk_dir else None
+        self.disk_max_bytes = disk_max_bytes
+        self._disk_bytes = None   # calcolato alla prima scrittura (con la pulizia delle vecchie versioni)
+        self._lru = OrderedDict()
+        self._chars = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def key(self, data, filename):
+        return hashlib.sha256(data).hexdigest()[:32] + "-" + hashlib.sha1(f"{filename}|{VERSION}".encode("utf-8")).hexdigest()[:12]
+
+    def get(self, key):
+        with self._lock:
+            text = self._lru.get(key)
+            if text is not None:
+                self._lru.move_to_end(key)
+                return text
+        if self.disk_dir:
+            path = os.path.join(self.disk_dir, key + ".txt")
+            try:
+                with open(path, encoding="utf-8") as f:
+                    text = f.read()
+                os.utime(path)   # mtime = ultimo uso: l'eliminazione oltre il limite parte dai più vecchi
+            except OSError:
+                return None
+            self._remember(key, text)
+            return text
+        return None
+
+    def put(self, key, text):
+        self._remember(key, text)
+        if self.disk_dir:
+            try:
+                os.makedirs(self.disk_dir, exist_ok=True)
+                tmp = os.path.join(self.disk_dir, key + ".tmp")
+                with open(tmp, "w", encoding="utf-8") as f:
+                    f.write(text)
+                path = os.path.join(self.disk_dir, key + ".txt")
+                os.replace(tmp, path)
+                self._trim_disk(os.path.getsize(path))
+            except OSError as e:
+                print(f"report_cache: scrittura su disco fallita ({e})")
+
+    def _disk_files(self):
+        """[(mtime, dimensione, path)] dei report su disco della versione corrente"""
+        out = []
+        for entry in os.scandir(self.disk_dir):
+            if entry.name.endswith(".txt"):
+                st = entry.stat()
+                out.append((st.st_mtime, st.st_size, entry.path))
+        return out
+
+    def _trim_disk(self, added):
+        with self._lock:
+            if self._disk_bytes is None:
+                # Prima scrittura: via le cartelle (e i .txt sparsi) delle versioni precedenti
+                for entry in os.scandir(self.disk_root):
+                    if entry.path == self.disk_dir:
+                        continue
+                    if entry.is_dir():
+                        shutil.rmtree(entry.path, ignore_errors=True)
+                    elif entry.name.endswith((".txt", ".tmp")):
+                        os.remove(entry.path)
+                self._disk_bytes = sum(size for _, size, _ in self._disk_files())
+            else:
+                self._disk_bytes += added
+            if self._disk_bytes <= self.disk_max_bytes:
+                return
+            # Oltre il limite: si eliminano i report usati meno di recente (l'ultimo scritto resta)
+            files = sorted(self._disk_files())
+            self._disk_bytes = sum(size for _, size, _ in files)
+            for _, size, path in files[:-1]:
+                if self._disk_bytes <= self.disk_max_bytes:
+                    break
+                os.remove(path)
+                self._disk_bytes -= size
+
+    def _remember(self, key, text):
+        with self._lock:
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                return
+            self._lru[key] = text
+            self._chars += len(text)
+            while self._chars > self.max_chars and len(self._lru) > 1:
+                _, old = self._lru.popitem(last=False)
+                self._chars -= len(old)
+
+    def stream(self, data, filename):
+        return ReportStream(self, data, filename)
+
+    def convert(self, data, filename):
+        """(report o None, stato, da_cache): converte solo se il report non è già in cache"""
+        rs = self.stream(data, filename)
+        text = "\n".join(rs)
+        return (text if rs.ok else None), rs.status, rs.cached
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._lru), "chars": self._chars, "hits": self.hits, "misses": self.misses, "version": VERSION}
+
+class ReportStream:
+    """
+    Report a sezioni: iterando si ottengono i blocchi di testo man mano che il
+    convertitore li calcola (o l'intero report, se è già in cache). A fine
+    iterazione il report completo entra in cache; `status`/`ok` valgono dopo
+    l'iterazione, `cached` e `key` subito.
+    """
+
+    def __init__(self, cache, data, filename, key=None, path=None):
+        self.cache = cache
+        self.data = data          # None: si legge `path` solo se serve convertire
+        self.path = path
+        self.filename = filename
+        self.key = key or cache.key(data, filename)
+        # Il report letto qui serve anche a __iter__: una sola lettura (dal disco, se non è in memoria)
+        self._text = cache.get(self.key)
+        self._prefetched = True
+        self.cached = self._text is not None
+        self.status = "OK (cache)" if self.cached else None
+        self.ok = self.cached
+
+    def __iter__(self):
+        from social_logic import load_csv_simple
+        from converter_logic import iter_readable_text, needed_columns
+
+        text = self._text if self._prefetched else self.cache.get(self.key)
+        self._text, self._prefetched = None, False
+        if text is not None:
+            self.cache.hits += 1
+            self.cached, self.ok, self.status = True, True, "OK (cache)"
+            yield text
+            return
+        self.cache.misses += 1
+        self.cached = self.ok = False
+        if self.data is None:
+            with open(self.path, "rb") as f:
+                self.data = f.read()
+        with span("report_cache.convert", size_kb=len(self.data) // 1024):
+            df, self.status = load_csv_simple(_Uploaded(self.data, self.filename),
+                                              columns=lambda header: needed_columns(header, self.filename))
+        if df is None:
+            return
+        parts = []
+        for chunk in iter_readable_text(df, self.filename):
+            parts.append(chunk)
+            yield chunk
+        self.ok = True
+        self.cache.put(self.key, "\n".join(parts))
+
+_cache = ReportCache()
+_stat_hashes = {}   # path -> ((size, mtime_ns), chiave)
+
+def convert_upload(uploaded_file):
+    """Report di un file caricato in Streamlit (getvalue() + name)"""
+    return _cache.convert(uploaded_file.getvalue(), uploaded_file.name)
+
+def stream_upload(uploaded_file):
+    """ReportStream di un file caricato: le sezioni escono man mano che sono pronte"""
+    return _cache.stream(uploaded_file.getvalue(), uploaded_file.name)
+
+def cached_report(key):
+    """Report già calcolato (None se uscito dalla cache)"""
+    return _cache.get(key)
+
+def stream_folder(folder=CSV_FOLDER):
+    """
+    ReportStream di tutti i CSV sotto `folder`: [(path relativo, stream)], in ordine.
+    File non modificati (stessa dimensione e mtime) -> letti dalla cache senza riaprirli.
+    """
+    out = []
+    for root, _dirs, files in os.walk(folder):
+        for name in sorted(files):
+            if not name.lower().endswith((".csv", ".txt")):
+                continue
+            path = os.path.join(root, name)
+            st = os.stat(path)
+            sig = (st.st_size, st.st_mtime_ns)
+            known = _stat_hashes.get(path)
+            if known and known[0] == sig:
+                out.append((os.path.relpath(path, folder), ReportStream(_cache, None, name, key=known[1], path=path)))
+                continue
+            with open(path, "rb") as f:
+                data = f.read()
+            rs = _cache.stream(data, name)
+            _stat_hashes[path] = (sig, rs.key)
+            out.append((os.path.relpath(path, folder), rs))
+    return sorted(out, key=lambda item: item[0])
+
+def convert_folder(folder=CSV_FOLDER):
+    """Report di tutti i CSV sotto `folder`: [(path relativo, report, stato, da_cache)]"""
+    out = []
+    for rel, rs in stream_folder(folder):
+        text = "\n".join(rs)
+        out.append((rel, text if rs.ok else None, rs.status, rs.cached))
+    return out
+
+def stats():
+    return _cache.stats()
@@ -6,70 +6,175 @@ Solo funzioni base per caricare CSV (usato dal convertitore)
 import pandas as pd
 import io
 import re
-from datetime import datetime
+
+from perf_trace import span, traced
+
+# Parole che identificano la riga di intestazione
+HEADER_KEYWORDS = ['date', 'data', 'ora', 'video', 'post', 'link', 'follower', 'view', 'like', 'impression', 'primary']
+HEADER_RE = re.compile("|".join(map(re.escape, HEADER_KEYWORDS)), re.IGNORECASE)
+
+_UNNAMED_RE = re.compile('^Unnamed', re.IGNORECASE)
+
+# ============ DTYPE COMPATTI ============
+
+CATEGORY_MAX_RATIO = 0.5   # category se i valori distinti sono al massimo metà delle righe
+CATEGORY_MIN_ROWS = 20     # sotto, una category non fa risparmiare nulla
+
+def _arrow_string_dtype():
+    # Stringhe Arrow con NaN come valore mancante (come dtype=str): str(cella) resta 'nan'
+    try:
+        import pyarrow  # noqa: F401
+        return pd.StringDtype("pyarrow", na_value=float("nan"))
+    except (ImportError, TypeError):
+        return None
+
+STRING_DTYPE = _arrow_string_dtype()
+
+def compact_dtypes(df):
+    """
+    Colonne testo -> `category` per le dimensioni con pochi valori distinti
+    (piattaforma, genere, territorio, fascia oraria, nome inserzione), stringhe
+    Arrow per le altre. Senza pyarrow le colonne non categoriche restano com'erano.
+    """
+    if df.empty:
+        return df
+    dtypes = {}
+    for col in df.columns:
+        distinct = df[col].nunique(dropna=True)
+        if len(df) >= CATEGORY_MIN_ROWS and distinct <= len(df) * CATEGORY_MAX_RATIO:
+            dtypes[col] = "category"
+        elif STRING_DTYPE is not None:
+            dtypes[col] = STRING_DTYPE
+    return df.astype(dtypes) if dtypes else df
+
+def column_values(df, col, fn):
+    """
+    [fn(cella) per ogni riga di df[col]], in ordine. Sulle colonne category fn gira
+    una volta per categoria; sulle altre una volta per valore distinto.
+    """
+    s = df[col]
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        mapped = [fn(v) for v in s.cat.categories]
+        missing = fn(float("nan"))
+        return [mapped[c] if c >= 0 else missing for c in s.cat.codes.tolist()]
+    memo = {}
+    out = []
+    for v in s.tolist():
+        if v not in memo:
+            memo[v] = fn(v)
+        out.append(memo[v])
+    return out
 
 # ============ CSV LOADER ============
 
-def load_csv_simple(uploaded_file):
-    """Carica CSV con encoding auto-detect"""
+def _clean_column(name):
+    return str(name).strip().replace('\x00', '').replace('', '')
+
+
+@traced("load_csv_simple", rows=lambda res: len(res[0]) if res[0] is not None else 0)
+def load_csv_simple(uploaded_file, columns=None):
+    """
+    Carica CSV con auto-rilevamento encoding e cleaning avanzato.
+    columns: funzione (intestazione -> colonne da leggere, None = tutte). Si legge
+    prima solo l'intestazione, poi read_csv(usecols=...) materializza solo quelle:
+    gli export Meta hanno ~160 colonne e un report ne usa una decina.
+    """
     try:
         bytes_data = uploaded_file.getvalue()
         content = None
-        
-        # Try encodings
-        for enc in ['utf-8', 'utf-16', 'utf-8-sig', 'latin-1', 'cp1252']:
-            try:
-                content = bytes_data.decode(enc)
-                break
-            except:
-                continue
-        
-        if not content:
-            return None, "Errore di encoding"
-        
-        lines = content.splitlines()
-        
-        # Find separator
-        sep = ','
-        comma_count = sum(l.count(',') for l in lines[:10])
-        semi_count = sum(l.count(';') for l in lines[:10])
-        tab_count = sum(l.count('\t') for l in lines[:10])
-        
-        if tab_count > max(comma_count, semi_count):
-            sep = '\t'
-        elif semi_count > comma_count:
-            sep = ';'
-        
-        # Find header row
-        header_keywords = ['date', 'data', 'time', 'giorno', 'video', 'post', 'link', 
-                          'gender', 'sesso', 'territor', 'countr', 'follower', 'view', 'like']
-        
-        header_row = 0
-        for i, line in enumerate(lines[:50]):
-            line_lower = line.lower()
-            if sep not in line:
-                continue
-            if any(kw in line_lower for kw in header_keywords):
-                header_row = i
-                break
-        
-        # Read CSV
-        data_io = io.StringIO(content)
-        df = pd.read_csv(
-            data_io,
-            sep=sep,
-            skiprows=header_row,
-            dtype=str,
-            on_bad_lines='skip',
-            engine='python'
-        )
-        
-        # Clean columns
-        df.columns = [str(c).strip() for c in df.columns]
+
+        # Gemini MODE: robust encoding detection (chardet importato al primo upload)
+        with span("csv.decode", size_kb=len(bytes_data) // 1024) as sp:
+            import chardet
+            guess = chardet.detect(bytes_data)
+            encodings_to_try = ['utf-8-sig', 'utf-16', 'utf-8', 'latin-1', 'cp1252']
+            if guess['encoding'] not in encodings_to_try and guess['encoding'] is not None:
+                encodings_to_try.insert(0, guess['encoding'])
+
+            decode_success = False
+            for enc in encodings_to_try:
+                try:
+                    content = bytes_data.decode(enc)
+                    decode_success = True
+                    sp.meta["encoding"] = enc
+                    break
+                except Exception:
+                    continue
+
+        if not decode_success or not content:
+            return None, "Errore di encoding (fallita auto-detection decodifica)"
+
+        with span("csv.clean") as sp:
+            # Pulizia: rimuove caratteri strani/broken da IG/Excel etc
+            content = content.replace('\x00', '')  # null char
+            content = content.replace('\ufffd', '')  # utf-8 replacement
+            content = content.replace('\u200b', '')  # zero-width space
+            content = content.replace('', '')  # altro replacement
+
+            # Filtro su righe non vuote/significative
+            lines = [l for l in content.splitlines() if l.strip() and len(l.replace(',', '').replace(';', '').replace('\t', '')) > 3]
+            sp.rows = len(lines)
+
+        with span("csv.sniff"):
+            # Individuazione separatore
+            sep = ','
+            comma_count = sum(l.count(',') for l in lines[:10])
+            semi_count = sum(l.count(';') for l in lines[:10])
+            tab_count = sum(l.count('\t') for l in lines[:10])
+            if tab_count > max(comma_count, semi_count):
+                sep = '\t'
+            elif semi_count > comma_count:
+                sep = ';'
+
+            # Individuazione header: prima riga con una parola chiave (una sola regex compilata)
+            header_row = next((i for i, line in enumerate(lines[:30]) if HEADER_RE.search(line)), 0)
+
+        text = '\n'.join(lines)
+        usecols = None
+        if columns is not None:
+            with span("csv.header") as sp:
+                # Fase 1: solo l'intestazione, con gli stessi nomi che darebbe la lettura completa
+                header = pd.read_csv(io.StringIO(lines[header_row] if lines else ''), sep=sep, nrows=0, engine='python').columns
+                header = [_clean_column(c) for c in header]
+                named = [c for c in header if not _UNNAMED_RE.match(c)]
+                wanted = columns(named)
+                if wanted is not None:
+                    wanted = set(wanted)
+                    # Posizioni, non nomi: le intestazioni duplicate vengono rinominate da pandas
+                    usecols = [i for i, c in enumerate(header) if c in wanted]
+                    sp.meta["columns"] = f"{len(usecols)}/{len(header)}"
+
+        with span("csv.read_csv") as sp:
+            if usecols is None:
+                df = pd.read_csv(
+                    io.StringIO(text),
+                    sep=sep,
+                    skiprows=header_row,
+                    dtype=str,
+                    on_bad_lines='skip',
+                    engine='python'
+                )
+            else:
+                # Fase 2: solo le colonne richieste, con il parser C (con usecols salta il resto della riga)
+                try:
+                    df = pd.read_csv(io.StringIO(text), sep=sep, skiprows=header_row, usecols=usecols,
+                                     dtype=str, on_bad_lines='skip', engine='c')
+                except pd.errors.ParserError:
+                    df = pd.read_csv(io.StringIO(text), sep=sep, skiprows=header_row, usecols=usecols,
+                                     dtype=str, on_bad_lines='skip', engine='python')
+            sp.rows = len(df)
+
+        # Pulizia colonne vuote/Unnamed/NaN
+        df.columns = [_clean_column(c) for c in df.columns]
         df = df.loc[:, ~df.columns.str.contains('^Unnamed', case=False, na=False)]
         df = df.dropna(how='all')
-        
+        with span("csv.dtypes"):
+            df = compact_dtypes(df)
+        if usecols is not None:
+            # Il report mostra quante colonne ha il file, non quante ne sono state lette
+            df.attrs["source_columns"] = len(named)
+
         return df, "OK"
-        
+
     except Exception as e:
         return None, f"Errore: {str(e)}"
@@ -1,5 +1,8 @@
-import requests
 import base64
+from urllib.parse import quote
+
+import database
+import storage
 from database import get_connection
 
 class SpotifyAPI:
@@ -8,12 +11,12 @@ class SpotifyAPI:
     TOKEN_URL = "https://accounts.spotify.com/api/token"
     BASE_URL = "https://api.spotify.com/v1"
 
-    def __init__(self): 
-        conn=get_connection(); r=conn.execute("SELECT client_id,client_secret,access_token FROM api_credentials WHERE platform='spotify'").fetchone(); conn.close()
-        self.cid,self.csec,self.tok=r if r else (None,None,None)
+    def __init__(self, artist=None): 
+        self.artist = artist or database.ARTIST  # artista del workspace attivo
+        conn=get_connection(); self.cid,self.csec,self.tok=storage.get_credentials(conn,'spotify'); conn.close()
         
     def save(self,i,s): 
-        conn=get_connection(); conn.execute("INSERT OR REPLACE INTO api_credentials (platform,client_id,client_secret) VALUES ('spotify',?,?)",(i,s)); conn.commit(); conn.close()
+        conn=get_connection(); storage.save_credentials(conn,'spotify',i,s); conn.commit(); conn.close()
         
     def get_auth(self): 
         # Redirect URI deve combaciare con quello nelle impostazioni developer di Spotify
@@ -23,24 +26,26 @@ class SpotifyAPI:
         auth_str = base64.b64encode(f"{self.cid}:{self.csec}".encode()).decode()
         headers = {'Authorization': f'Basic {auth_str}', 'Content-Type': 'application/x-www-form-urlencoded'}
         data = {'grant_type': 'authorization_code', 'code': code, 'redirect_uri': 'http://127.0.0.1:8501'}
+        import requests
         
         try:
             r=requests.post(self.TOKEN_URL, headers=headers, data=data)
             if r.status_code==200: 
                 token = r.json()['access_token']
-                conn=get_connection(); conn.execute("UPDATE api_credentials SET access_token=? WHERE platform='spotify'",(token,)); conn.commit(); conn.close()
+                conn=get_connection(); storage.set_access_token(conn,'spotify',token); conn.commit(); conn.close()
                 return True
             return False
         except: return False
         
     def data(self):
         if not self.tok: return "Spotify non connesso."
+        import requests
         try: 
             h={'Authorization':f'Bearer {self.tok}'}
-            # Cerca l'artista (es. "YangKidd" o il nome dell'account)
+            # Cerca l'artista del workspace (es. "YangKidd" o il nome dell'account)
             me = requests.get(f"{self.BASE_URL}/me", headers=h).json()
             # Se è un account utente, cerca l'artista
-            search = requests.get(f"{self.BASE_URL}/search?q=YangKidd&type=artist&limit=1", headers=h)
+            search = requests.get(f"{self.BASE_URL}/search?q={quote(self.artist)}&type=artist&limit=1", headers=h)
             
             if search.status_code == 200 and search.json()['artists']['items']:
                 a = search.json()['artists']['items'][0]
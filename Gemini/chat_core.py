@@ -1,7 +1,13 @@
 import streamlit as st
-import ollama
-import sqlite3
 import time
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # moduli condivisi nella root del repo
+from llm_scheduler import get_scheduler, SchedulerBusy
+from write_buffer import get_buffer
+import workspace
+from workspace import connect
 
 # --- CONFIGURAZIONE ---
 st.set_page_config(page_title="YANGKIDD CHAT CORE", page_icon="🧠", layout="centered")
@@ -16,9 +22,16 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# --- ARTISTA (workspace: una memoria per artista) ---
+with st.sidebar:
+    ARTIST = st.selectbox("🎤 Artista", workspace.artists(), key="artist")
+WS = workspace.get(ARTIST)
+DB = WS.path('yangkidd_chat.db')
+
 # --- DATABASE MANAGER (MEMORIA ETERNA) ---
-def init_chat_db():
-    conn = sqlite3.connect('yangkidd_chat.db')
+@st.cache_resource
+def init_chat_db(db):
+    conn = connect(db)
     c = conn.cursor()
     # Tabella per salvare la cronologia
     c.execute('''CREATE TABLE IF NOT EXISTS messages
@@ -30,14 +43,12 @@ def init_chat_db():
     conn.close()
 
 def save_message(role, content):
-    conn = sqlite3.connect('yangkidd_chat.db')
-    c = conn.cursor()
-    c.execute("INSERT INTO messages (role, content) VALUES (?, ?)", (role, content))
-    conn.commit()
-    conn.close()
+    # Accodato: il write buffer scrive i messaggi in batch, in una transazione
+    get_buffer(DB).add("INSERT INTO messages (role, content) VALUES (?, ?)", (role, content))
 
 def load_history():
-    conn = sqlite3.connect('yangkidd_chat.db')
+    get_buffer(DB).flush()  # anche i messaggi ancora in coda
+    conn = connect(DB)
     # Carica gli ultimi 50 messaggi per dare contesto ma non intasare
     messages = []
     cursor = conn.cursor()
@@ -51,24 +62,28 @@ def load_history():
     return messages
 
 def clear_history():
-    conn = sqlite3.connect('yangkidd_chat.db')
+    get_buffer(DB).flush()  # altrimenti i messaggi in coda tornerebbero dopo il reset
+    conn = connect(DB)
     c = conn.cursor()
     c.execute("DELETE FROM messages")
     conn.commit()
     conn.close()
 
 # Inizializza DB
-init_chat_db()
+init_chat_db(DB)
 
 # --- MOTORE AI ---
-MODEL = "mistral-nemo" # Assicurati di averlo installato
+# Modello configurato con OLLAMA_MODEL (default mistral-nemo), precaricato in
+# background all'avvio e tenuto in memoria con keep_alive; le chat di più tab
+# passano da un'unica coda (una generazione alla volta sulla CPU)
+llm = get_scheduler()
 
 def stream_ai_response(messages):
     """Chiama Ollama e genera risposta in streaming"""
     try:
-        stream = ollama.chat(model=MODEL, messages=messages, stream=True)
-        for chunk in stream:
-            yield chunk['message']['content']
+        yield from llm.stream(messages)
+    except SchedulerBusy:
+        yield "⏳ AI occupata: troppe richieste in coda, riprova tra poco."
     except Exception as e:
         yield f"⚠️ Errore AI: {str(e)}. Controlla che Ollama sia aperto."
 
@@ -77,11 +92,14 @@ st.title("🧠 Strategic AI Chat")
 st.caption("Memoria Persistente Attiva • Database Locale")
 
 # 1. Carica la storia dal Database (se la sessione è vuota)
+if st.session_state.get("messages_artist") != WS.slug:
+    st.session_state.messages_artist = WS.slug
+    st.session_state.messages = []
 if "messages" not in st.session_state or len(st.session_state.messages) == 0:
     history = load_history()
     if not history:
         # Messaggio di benvenuto se il DB è vuoto
-        welcome_msg = "Ciao YangKidd. Sono il tuo AI Manager. I nostri dati sono al sicuro nel database locale. Su cosa lavoriamo oggi?"
+        welcome_msg = f"Ciao {WS.name}. Sono il tuo AI Manager. I nostri dati sono al sicuro nel database locale. Su cosa lavoriamo oggi?"
         save_message("assistant", welcome_msg)
         st.session_state.messages = [{"role": "assistant", "content": welcome_msg}]
     else:
@@ -131,4 +149,9 @@ with st.sidebar:
         st.session_state.messages = []
         st.rerun()
     
-    st.info("Ogni messaggio viene salvato automaticamente nel file 'yangkidd_chat.db'. Puoi chiudere e riaprire quando vuoi.")
\ No newline at end of file
+    st.info(f"Ogni messaggio viene salvato automaticamente nel file '{DB}'. Puoi chiudere e riaprire quando vuoi.")
+
+    m = llm.metrics()
+    st.caption(f"🧠 Modello: {m['active_model']}" + (f" • primo token ~{m['avg_ttft_ms']/1000:.1f}s" if m['avg_ttft_ms'] else "")
+               + (f" • {m['last_tokens_per_s']} tok/s" if m.get('last_tokens_per_s') else "")
+               + (f" • coda {m['queued']} (attesa p90 {m['interactive_wait_p90_ms']/1000:.1f}s)" if m['queued'] and m['interactive_wait_p90_ms'] else ""))
@@ -0,0 +1,130 @@
+"""
+Competitor Tracker in batch: ricerche web in parallelo (concorrenza limitata),
+cache dei risultati per (query, giorno) e estrazioni AI in pipeline, così mentre
+il modello analizza un competitor le ricerche dei successivi sono già in corso.
+
+Nessuna dipendenza da Streamlit: la ricerca e l'estrazione sono funzioni
+passate dall'esterno (in prime_os: DDGS + ollama; per prove in locale basta
+un provider di ricerca finto, senza rete).
+"""
+
+import json
+import sqlite3
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+DB_PATH = 'yangkidd_marketing.db'
+MAX_SEARCH_WORKERS = 4   # ricerche DDGS contemporanee
+MAX_LLM_WORKERS = 1      # il modello locale gira su CPU: una estrazione alla volta
+
+# --- CACHE RICERCHE (query, giorno) ---
+class SearchCache:
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = db_path
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('''CREATE TABLE IF NOT EXISTS search_cache
+                        (query TEXT, day TEXT, results TEXT, PRIMARY KEY (query, day))''')
+        conn.commit()
+        conn.close()
+
+    def get(self, query, day):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            row = conn.execute("SELECT results FROM search_cache WHERE query=? AND day=?", (query, day)).fetchone()
+            return json.loads(row[0]) if row else None
+        finally:
+            conn.close()
+
+    def put(self, query, day, results):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.execute("INSERT OR REPLACE INTO search_cache (query, day, results) VALUES (?, ?, ?)",
+                         (query, day, json.dumps(results, ensure_ascii=False)))
+            conn.commit()
+        finally:
+            conn.close()
+
+# --- PROMPT & PARSING ---
+def search_query(name):
+    return f"{name} instagram followers spotify listeners stats"
+
+def extraction_prompt(name, results):
+    return (f"Dai seguenti risultati web su {name}, estrai: 1. Numero Followers (stima), "
+            f"2. Sentiment (Positivo/Neutro/Negativo). Rispondi SOLO nel formato: 'FOLLOWERS|SENTIMENT'. "
+            f"Dati: {str(results)}")
+
+def parse_extraction(text):
+    """'12k|Positivo' -> ('12k', 'Positivo'); None se la risposta non è nel formato FOLLOWERS|SENTIMENT"""
+    parts = [p.strip().strip("'\"`").strip() for p in str(text or "").strip().strip("'\"`").split("|")]
+    if len(parts) != 2 or not all(parts):
+        return None
+    return parts[0], parts[1]
+
+def parse_names(raw):
+    """'Lazza, Sfera\nGeolier' -> ['Lazza', 'Sfera', 'Geolier'] (senza duplicati, ordine mantenuto)"""
+    names = []
+    for chunk in raw.replace("\n", ",").split(","):
+        n = chunk.strip()
+        if n and n.lower() not in [x.lower() for x in names]:
+            names.append(n)
+    return names
+
+# --- PIPELINE ---
+def track_competitors(names, search_fn, extract_fn, cache=None, max_results=5,
+                      search_workers=MAX_SEARCH_WORKERS, llm_workers=MAX_LLM_WORKERS, day=None):
+    """
+    Generatore: restituisce un dict per competitor appena la sua estrazione è pronta
+    {name, followers, sentiment, cached, error}. error non è None se la ricerca o
+    l'estrazione è fallita: il risultato non va salvato.
+
+    search_fn(query, max_res) -> lista risultati (vuota = ricerca fallita)
+    extract_fn(prompt) -> testo 'FOLLOWERS|SENTIMENT' (altro formato = estrazione fallita)
+    """
+    day = day or datetime.now().strftime("%Y-%m-%d")
+
+    def do_search(name):
+        q = search_query(name)
+        hit = cache.get(q, day) if cache else None
+        if hit is not None:
+            return hit, True
+        res = search_fn(q, max_results)
+        if not res:
+            # Nessun risultato (DDGS bloccato, rete giù): come un errore, il modello non deve tirare a indovinare
+            raise LookupError("nessun risultato")
+        if cache:
+            cache.put(q, day, res)
+        return res, False
+
+    def do_extract(name, results, cached):
+        try:
+            reply = extract_fn(extraction_prompt(name, results))
+            parsed = parse_extraction(reply)
+            if parsed is None:
+                raise ValueError(f"risposta non valida: {str(reply)[:80]!r}")
+            foll, sent = parsed
+            return {"name": name, "followers": foll, "sentiment": sent, "cached": cached, "error": None}
+        except Exception as e:
+            return {"name": name, "followers": "N/A", "sentiment": "Neutro", "cached": cached, "error": str(e)}
+
+    with ThreadPoolExecutor(max_workers=search_workers) as search_pool, \
+         ThreadPoolExecutor(max_workers=llm_workers) as llm_pool:
+        pending_search = {search_pool.submit(do_search, n): n for n in names}
+        pending_llm = set()
+        # Appena una ricerca finisce parte la sua estrazione, mentre le altre ricerche continuano;
+        # ogni estrazione pronta viene restituita subito (la UI aggiorna il progresso)
+        while pending_search or pending_llm:
+            done, _ = wait(set(pending_search) | pending_llm, return_when=FIRST_COMPLETED)
+            for fut in done:
+                if fut in pending_search:
+                    name = pending_search.pop(fut)
+                    try:
+                        results, cached = fut.result()
+                    except Exception as e:
+                        # Senza dati il modello inventerebbe: errore, niente estrazione
+                        yield {"name": name, "followers": "N/A", "sentiment": "Neutro", "cached": False,
+                               "error": f"ricerca fallita: {e}"}
+                        continue
+                    pending_llm.add(llm_pool.submit(do_extract, name, results, cached))
+                else:
+                    pending_llm.discard(fut)
+                    yield fut.result()
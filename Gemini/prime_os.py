@@ -1,67 +1,125 @@
 import streamlit as st
-import ollama
 import pandas as pd
-import sqlite3
-import plotly.express as px
-import plotly.graph_objects as go
-from duckduckgo_search import DDGS
 from datetime import datetime, timedelta
 import time
+import os
+import sys
+from competitor_tracker import SearchCache, track_competitors, parse_names
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # moduli condivisi nella root del repo
+import rerun_profiler
+rerun_profiler.begin("prime_os")  # attivo solo con RERUN_PROFILE=1
+from llm_scheduler import get_scheduler, BATCH, SchedulerBusy
+from context_serializer import campaigns_context
+import workspace
+import storage
+from storage import bump_table_version
+from workspace import connect
+
+# NB: ollama, plotly e duckduckgo_search sono importati al primo utilizzo
+# dentro le pagine/funzioni che li usano, così l'avvio resta leggero.
 
 # --- CONFIGURAZIONE PAGINA ---
 st.set_page_config(page_title="YANGKIDD ENTERPRISE", page_icon="💎", layout="wide")
 
+# --- ARTISTA (workspace: un DB per artista) ---
+with st.sidebar:
+    st.title("💎 ENTERPRISE OS")
+    ARTIST = st.selectbox("🎤 Artista", workspace.artists(), key="artist")
+WS = workspace.get(ARTIST)
+DB = WS.path('yangkidd_marketing.db')
+
 # --- DATABASE MANAGER (La parte "Pro" che mancava) ---
-def init_db():
-    conn = sqlite3.connect('yangkidd_marketing.db')
+@st.cache_resource
+def init_db(db):
+    """DDL eseguito una sola volta per processo e per shard (non a ogni rerun)"""
+    # campaigns, competitors (chiave unica name+platform) e table_versions: schema comune di storage.py
+    conn = storage.connect(db)
     c = conn.cursor()
     
-    # Tabella Campagne
-    c.execute('''CREATE TABLE IF NOT EXISTS campaigns
-                 (id INTEGER PRIMARY KEY, name TEXT, platform TEXT, status TEXT, 
-                  budget REAL, spend REAL, revenue REAL, roas REAL, date TEXT)''')
+    # KPI pre-aggregati per piattaforma (aggiornati a ogni save_campaign)
+    c.execute('''CREATE TABLE IF NOT EXISTS campaign_kpis
+                 (platform TEXT PRIMARY KEY, n INTEGER, budget REAL, spend REAL, revenue REAL,
+                  roas_min REAL, roas_max REAL, spend_max REAL, revenue_max REAL)''')
     
-    # Tabella Competitor
-    c.execute('''CREATE TABLE IF NOT EXISTS competitors
-                 (id INTEGER PRIMARY KEY, name TEXT, platform TEXT, followers TEXT, 
-                  sentiment TEXT, last_check TEXT)''')
+    # Primo avvio con campagne già presenti: ricostruisci il riepilogo
+    if c.execute("SELECT COUNT(*) FROM campaign_kpis").fetchone()[0] == 0:
+        rebuild_campaign_kpis(c)
     
     conn.commit()
     conn.close()
 
+def rebuild_campaign_kpis(c):
+    """Ricalcolo completo del riepilogo (solo migrazione/riparazione, non a ogni rerun)"""
+    c.execute("DELETE FROM campaign_kpis")
+    c.execute('''INSERT INTO campaign_kpis
+                 SELECT platform, COUNT(*), TOTAL(budget), TOTAL(spend), TOTAL(revenue),
+                        MIN(roas), MAX(roas), MAX(spend), MAX(revenue)
+                 FROM campaigns GROUP BY platform''')
+    bump_table_version(c, "campaign_kpis")
+
+def update_campaign_kpis(c, platform, budget, spend, revenue, roas):
+    """Aggiornamento incrementale O(1) del riepilogo per una nuova campagna"""
+    c.execute('''INSERT INTO campaign_kpis VALUES (?, 1, ?, ?, ?, ?, ?, ?, ?)
+                 ON CONFLICT(platform) DO UPDATE SET
+                    n = n + 1,
+                    budget = budget + excluded.budget,
+                    spend = spend + excluded.spend,
+                    revenue = revenue + excluded.revenue,
+                    roas_min = MIN(roas_min, excluded.roas_min),
+                    roas_max = MAX(roas_max, excluded.roas_max),
+                    spend_max = MAX(spend_max, excluded.spend_max),
+                    revenue_max = MAX(revenue_max, excluded.revenue_max)''',
+              (platform, budget, spend, revenue, roas, roas, spend, revenue))
+    bump_table_version(c, "campaign_kpis")
+
+# --- CACHE LETTURE (query + versione tabelle) ---
+def cached_read(sql, tables, params=()):
+    """Legge dalla memoria finché nessuna delle `tables` viene modificata (stesso rerun o rerun successivi)"""
+    return storage.cached_read(DB, sql, tables, params)
+
 def save_campaign(name, platform, budget, spend, revenue):
-    conn = sqlite3.connect('yangkidd_marketing.db')
+    conn = connect(DB)
     c = conn.cursor()
     roas = revenue / spend if spend > 0 else 0
-    c.execute("INSERT INTO campaigns (name, platform, status, budget, spend, revenue, roas, date) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-              (name, platform, "Active", budget, spend, revenue, roas, datetime.now().strftime("%Y-%m-%d")))
+    storage.add_campaign(c, storage.Campaign(name, platform, budget=budget, spend=spend, revenue=revenue, roas=roas,
+                                             start_date=datetime.now().strftime("%Y-%m-%d")))
+    update_campaign_kpis(c, platform, budget, spend, revenue, roas)
     conn.commit()
     conn.close()
 
 def get_campaigns():
-    conn = sqlite3.connect('yangkidd_marketing.db')
-    df = pd.read_sql_query("SELECT * FROM campaigns", conn)
-    conn.close()
-    return df
+    return cached_read("SELECT * FROM campaigns", ("campaigns",))
+
+def get_campaign_kpis():
+    """Riepilogo per piattaforma (poche righe, qualunque sia il numero di campagne)"""
+    return cached_read("SELECT * FROM campaign_kpis ORDER BY platform", ("campaign_kpis",))
+
+# Oltre questa soglia i grafici usano dati aggregati/binnati lato server
+CHART_MAX_POINTS = 3000
+CHART_BINS = 40
+
+def get_campaign_bins(spend_max, revenue_max, bins=CHART_BINS):
+    """Griglia spend x revenue calcolata in SQLite: al browser arrivano al massimo bins² punti per piattaforma"""
+    w_s = (spend_max or 1) / bins
+    w_r = (revenue_max or 1) / bins
+    return cached_read('''SELECT platform,
+                                  CAST(spend / ? AS INTEGER) AS bx, CAST(revenue / ? AS INTEGER) AS by,
+                                  COUNT(*) AS campaigns, AVG(spend) AS spend, AVG(revenue) AS revenue,
+                                  AVG(budget) AS budget
+                           FROM campaigns GROUP BY platform, bx, by''', ("campaigns",), (w_s, w_r))
 
 def save_competitor(name, platform, followers, sentiment):
-    conn = sqlite3.connect('yangkidd_marketing.db')
-    c = conn.cursor()
-    # Controlla se esiste già, se sì aggiorna
-    c.execute("DELETE FROM competitors WHERE name=? AND platform=?", (name, platform))
-    c.execute("INSERT INTO competitors (name, platform, followers, sentiment, last_check) VALUES (?, ?, ?, ?, ?)",
-              (name, platform, followers, sentiment, datetime.now().strftime("%Y-%m-%d")))
+    conn = connect(DB)
+    storage.save_competitor(conn, name, platform, followers, sentiment, datetime.now().strftime("%Y-%m-%d"))
     conn.commit()
     conn.close()
 
 def get_competitors():
-    conn = sqlite3.connect('yangkidd_marketing.db')
-    df = pd.read_sql_query("SELECT * FROM competitors", conn)
-    conn.close()
-    return df
+    return cached_read("SELECT * FROM competitors", ("competitors",))
 
 # Inizializza il DB all'avvio
-init_db()
+init_db(DB)
 
 # --- STILE CYBERPUNK ---
 st.markdown("""
@@ -100,92 +158,128 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # --- ENGINE AI ---
-MODEL = "mistral-nemo"
+# Modello tenuto caldo (model_manager) dietro una coda unica del processo: la chat ha la
+# precedenza sulle estrazioni dei competitor e i prompt identici in corso vengono uniti
+llm = get_scheduler()
+
+def extract_ai(prompt):
+    """Chiamata AI non in streaming (estrazioni strutturate)"""
+    return llm.complete([{"role": "user", "content": prompt}], priority=BATCH)
 
 def stream_ai(messages):
     try:
-        stream = ollama.chat(model=MODEL, messages=messages, stream=True)
-        for chunk in stream:
-            yield chunk['message']['content']
+        yield from llm.stream(messages)
+    except SchedulerBusy:
+        yield "⏳ AI occupata: troppe richieste in coda, riprova tra poco."
     except Exception as e:
         yield f"⚠️ Errore AI: {str(e)}"
 
 # --- TOOLS DI RICERCA ---
 def web_search(query, max_res=8):
-    results = []
-    try:
-        with DDGS() as ddgs:
-            for r in ddgs.text(query, max_results=max_res):
-                results.append(r)
-        return results
-    except:
-        return []
+    """Risultati DDGS; gli errori arrivano al chiamante (track_competitors li segnala come ricerca fallita)"""
+    from duckduckgo_search import DDGS
+    with DDGS() as ddgs:
+        return list(ddgs.text(query, max_results=max_res))
 
 # --- INTERFACCIA ---
 
 # Sidebar
 with st.sidebar:
-    st.title("💎 ENTERPRISE OS")
     st.caption("Local • Persistent • AI")
     nav = st.radio("SISTEMA", ["Dashboard (ROI)", "AI War Room", "Competitor Tracker", "Campaign Manager"])
     st.divider()
     
-    # KPI Veloci
-    df_c = get_campaigns()
-    if not df_c.empty:
-        tot_spend = df_c['spend'].sum()
-        tot_rev = df_c['revenue'].sum()
+    # KPI Veloci (dal riepilogo pre-aggregato)
+    df_k = get_campaign_kpis()
+    if not df_k.empty:
+        tot_spend = df_k['spend'].sum()
+        tot_rev = df_k['revenue'].sum()
         roi_tot = ((tot_rev - tot_spend) / tot_spend * 100) if tot_spend > 0 else 0
         st.metric("Total Spend", f"€{tot_spend:,.0f}")
         st.metric("Total Revenue", f"€{tot_rev:,.0f}")
         st.metric("Global ROI", f"{roi_tot:+.1f}%", delta_color="normal")
 
+    st.divider()
+    m = llm.metrics()
+    st.caption(f"🧠 {m['active_model']}" + (f" (riserva: {m['fallback_reason']})" if m['fallback_reason'] else "")
+               + (f" • primo token ~{m['avg_ttft_ms']/1000:.1f}s" if m['avg_ttft_ms'] else "")
+               + (f" • {m['last_tokens_per_s']} tok/s" if m.get('last_tokens_per_s') else "")
+               + (f" • coda {m['queued']} (attesa p90 {m['interactive_wait_p90_ms']/1000:.1f}s)" if m['queued'] and m['interactive_wait_p90_ms'] else ""))
+    if m['preload_error'] and not m['requests']:
+        st.caption(f"⚠️ Ollama non raggiungibile: {m['preload_error'][:80]}")
+
 # --- MODULO 1: DASHBOARD (Visualizzazione Dati) ---
 if nav == "Dashboard (ROI)":
     st.title("📊 Financial Command Center")
     
-    df = get_campaigns()
+    kpi = get_campaign_kpis()
+    n_campaigns = int(kpi['n'].sum()) if not kpi.empty else 0
     
-    if df.empty:
+    if n_campaigns == 0:
         st.info("Nessuna campagna salvata. Vai su 'Campaign Manager' per inserirne una.")
     else:
-        # Top Metrics
+        import plotly.express as px
+        
+        # Top Metrics (nessuna scansione della tabella campagne)
         c1, c2, c3, c4 = st.columns(4)
-        c1.metric("Campagne Attive", len(df))
-        c2.metric("Best ROAS", f"{df['roas'].max():.2f}x")
-        c3.metric("Worst ROAS", f"{df['roas'].min():.2f}x")
-        c4.metric("Avg. Budget", f"€{df['budget'].mean():.0f}")
+        c1.metric("Campagne Attive", n_campaigns)
+        c2.metric("Best ROAS", f"{kpi['roas_max'].max():.2f}x")
+        c3.metric("Worst ROAS", f"{kpi['roas_min'].min():.2f}x")
+        c4.metric("Avg. Budget", f"€{kpi['budget'].sum() / n_campaigns:.0f}")
+        
+        small = n_campaigns <= CHART_MAX_POINTS
+        df = get_campaigns() if small else None
         
         # Grafico 1: Performance Platform
         col_g1, col_g2 = st.columns(2)
         
         with col_g1:
             st.subheader("Performance per Piattaforma")
-            fig_bar = px.bar(df, x="platform", y="roas", color="platform", 
-                             title="ROAS per Piattaforma", template="plotly_dark",
-                             color_discrete_sequence=["#00ff99", "#00ccff", "#ff00ff"])
+            if small:
+                fig_bar = px.bar(df, x="platform", y="roas", color="platform", 
+                                 title="ROAS per Piattaforma", template="plotly_dark",
+                                 color_discrete_sequence=["#00ff99", "#00ccff", "#ff00ff"])
+            else:
+                df_bar = kpi.assign(roas=kpi['revenue'] / kpi['spend'].where(kpi['spend'] > 0))
+                fig_bar = px.bar(df_bar, x="platform", y="roas", color="platform",
+                                 title="ROAS aggregato per Piattaforma", template="plotly_dark",
+                                 color_discrete_sequence=["#00ff99", "#00ccff", "#ff00ff"])
             st.plotly_chart(fig_bar, use_container_width=True)
             
         with col_g2:
             st.subheader("Spend vs Revenue")
-            fig_scat = px.scatter(df, x="spend", y="revenue", size="budget", color="platform",
-                                  hover_name="name", title="Efficienza Campagne", template="plotly_dark")
+            if small:
+                fig_scat = px.scatter(df, x="spend", y="revenue", size="budget", color="platform",
+                                      hover_name="name", title="Efficienza Campagne", template="plotly_dark")
+            else:
+                df_bins = get_campaign_bins(kpi['spend_max'].max(), kpi['revenue_max'].max())
+                fig_scat = px.scatter(df_bins, x="spend", y="revenue", size="campaigns", color="platform",
+                                      hover_data=["campaigns", "budget"], template="plotly_dark",
+                                      title=f"Efficienza Campagne ({n_campaigns:,} campagne, griglia {CHART_BINS}x{CHART_BINS})")
             st.plotly_chart(fig_scat, use_container_width=True)
             
         # Tabella Dati
-        st.dataframe(df, use_container_width=True)
+        if small:
+            st.dataframe(df, use_container_width=True)
+        else:
+            st.caption(f"Ultime 1000 campagne su {n_campaigns:,}")
+            st.dataframe(cached_read("SELECT * FROM campaigns ORDER BY id DESC LIMIT 1000", ("campaigns",)), use_container_width=True)
 
 # --- MODULO 2: AI WAR ROOM (Strategia) ---
 elif nav == "AI War Room":
     st.title("💬 Strategic AI Chat")
     
     # Inietta contesto dal database
-    df_context = get_campaigns().to_string() if not get_campaigns().empty else "Nessun dato storico."
+    df_hist = get_campaigns()
+    # Totali per piattaforma + campagne principali in CSV compatto (budget di token fisso)
+    df_context = campaigns_context(df_hist)
     
-    if "messages" not in st.session_state:
+    # Cambio artista: la conversazione riparte con i dati del nuovo shard
+    if "messages" not in st.session_state or st.session_state.get("messages_artist") != WS.slug:
+        st.session_state.messages_artist = WS.slug
         st.session_state.messages = [{
             "role": "system", 
-            "content": f"Sei il Manager di YangKidd. Hai accesso a questi dati storici delle campagne: {df_context}. Usa questi dati per dare consigli basati sui numeri. Sii breve e diretto."
+            "content": f"Sei il Manager di {WS.name}. Hai accesso a questi dati storici delle campagne: {df_context}. Usa questi dati per dare consigli basati sui numeri. Sii breve e diretto."
         }]
 
     # Mostra chat
@@ -214,32 +308,28 @@ elif nav == "Competitor Tracker":
     st.title("👁️ Competitor Intelligence")
     
     c1, c2 = st.columns([3, 1])
-    target = c1.text_input("Competitor da tracciare", placeholder="Es: Lazza, Sfera, Geolier")
+    raw_targets = c1.text_area("Competitor da tracciare (uno per riga o separati da virgola)",
+                               placeholder="Es: Lazza, Sfera, Geolier", height=80)
     if c2.button("Analizza & Salva"):
-        with st.spinner(f"Analizzando {target}..."):
-            # 1. Cerca dati
-            res = web_search(f"{target} instagram followers spotify listeners stats", 5)
-            
-            # 2. AI Estrae i dati strutturati
-            prompt = f"Dai seguenti risultati web su {target}, estrai: 1. Numero Followers (stima), 2. Sentiment (Positivo/Neutro/Negativo). Rispondi SOLO nel formato: 'FOLLOWERS|SENTIMENT'. Dati: {str(res)}"
-            ai_extraction = ollama.chat(model=MODEL, messages=[{"role": "user", "content": prompt}])['message']['content']
-            
-            try:
-                parts = ai_extraction.split("|")
-                foll = parts[0].strip()
-                sent = parts[1].strip()
-            except:
-                foll = "N/A"
-                sent = "Neutro"
-                
-            # 3. Salva nel DB
-            save_competitor(target, "Social/Music", foll, sent)
-            st.success(f"Tracciato: {target} | {foll} | {sent}")
+        targets = parse_names(raw_targets)
+        if targets:
+            bar = st.progress(0.0, text=f"Analizzando {len(targets)} competitor...")
+            # Ricerche in parallelo (max 4), cache per (query, giorno), estrazioni AI in pipeline
+            for i, r in enumerate(track_competitors(targets, web_search, extract_ai, cache=SearchCache(DB)), 1):
+                src = " (cache)" if r['cached'] else ""
+                if r['error']:
+                    # Niente salvataggio: l'upsert sovrascriverebbe l'ultimo dato buono con N/A
+                    st.warning(f"{r['name']}: estrazione fallita ({r['error']})")
+                else:
+                    save_competitor(r['name'], "Social/Music", r['followers'], r['sentiment'])
+                    st.success(f"Tracciato: {r['name']} | {r['followers']} | {r['sentiment']}{src}")
+                bar.progress(i / len(targets), text=f"{i}/{len(targets)} completati")
             
     # Mostra tabella competitor salvati
     st.subheader("Database Competitor")
     df_comp = get_competitors()
     if not df_comp.empty:
+        import plotly.express as px
         st.dataframe(df_comp, use_container_width=True)
         
         # Grafico Sentiment
@@ -250,7 +340,7 @@ elif nav == "Competitor Tracker":
 # --- MODULO 4: CAMPAIGN MANAGER (Input Dati) ---
 elif nav == "Campaign Manager":
     st.title("⚙️ Campaign Builder")
-    st.info("I dati inseriti qui verranno salvati nel database locale (yangkidd_marketing.db)")
+    st.info(f"I dati inseriti qui verranno salvati nel database locale ({DB})")
     
     with st.form("new_campaign"):
         c1, c2 = st.columns(2)
@@ -270,4 +360,6 @@ elif nav == "Campaign Manager":
 
     st.markdown("---")
     st.subheader("Storico Campagne")
-    st.dataframe(get_campaigns(), use_container_width=True)
\ No newline at end of file
+    st.dataframe(get_campaigns(), use_container_width=True)
+
+rerun_profiler.end()
@@ -0,0 +1,99 @@
+"""
+Benchmark del percorso di import: lettura CSV, report leggibile del convertitore
+e salvataggio nel DB (social_stats / posts_*), su export sintetici a varie scale.
+"""
+
+import os
+
+import pytest
+
+from conftest import SCALES
+
+# Un campione per famiglia di export: serie IG (UTF-16), Meta Ads largo, contenuti e overview TikTok
+SAMPLES = [
+    "IG/Follower.csv",
+    "meta/GIORNO_ORA.csv",
+    "tiktok/Content.csv",
+    "tiktok/Overview.csv",
+]
+
+PLATFORMS = {"IG": "Instagram", "meta": "Meta Ads", "tiktok": "TikTok"}
+
+def _id(sample):
+    return sample.replace("/", "-").replace(".csv", "")
+
+@pytest.mark.parametrize("scale", SCALES)
+@pytest.mark.parametrize("sample", SAMPLES, ids=_id)
+def bench_load_csv_simple(benchmark, upload, sample, scale):
+    from social_logic import load_csv_simple
+
+    def run():
+        return load_csv_simple(upload(sample, scale))
+
+    df, _msg = benchmark(run)
+    assert df is not None and len(df) > 0
+    # Memoria del DataFrame (category / stringhe Arrow contro oggetti str)
+    benchmark.extra_info["memory_mb"] = round(df.memory_usage(deep=True).sum() / 1e6, 2)
+
+@pytest.mark.parametrize("scale", SCALES)
+@pytest.mark.parametrize("sample", SAMPLES, ids=_id)
+def bench_csv_to_readable_text(benchmark, upload, sample, scale):
+    from social_logic import load_csv_simple
+    from converter_logic import csv_to_readable_text
+
+    df, _msg = load_csv_simple(upload(sample, scale))
+    text = benchmark(csv_to_readable_text, df, os.path.basename(sample))
+    assert text
+
+@pytest.mark.parametrize("scale", SCALES)
+@pytest.mark.parametrize("sample", SAMPLES, ids=_id)
+def bench_save_social_bulk(benchmark, upload, temp_db, sample, scale):
+    import sqlite3
+    from social_ingest import smart_csv_loader, save_social_bulk
+
+    df, _status, file_type = smart_csv_loader(upload(sample, scale))
+    platform = PLATFORMS[sample.split("/")[0]]
+
+    def empty_tables():
+        # Ogni round parte da tabelle vuote: altrimenti l'upsert salterebbe le righe già presenti
+        conn = sqlite3.connect(temp_db)
+        conn.executescript("DELETE FROM social_stats; DELETE FROM posts_inventory; DELETE FROM posts_performance;")
+        conn.close()
+        return (df, platform, file_type), {}
+
+    rows, msg = benchmark.pedantic(save_social_bulk, setup=empty_tables, rounds=5)
+    assert msg == "OK" and rows > 0
+
+# Export Meta larghi (~140 colonne): lettura completa contro sola proiezione usata dal report
+WIDE_SAMPLES = ["meta/GIORNO_ORA.csv", "meta/TLP_INSERZ.csv", "meta/ETA_DESTINAZI.csv"]
+
+@pytest.mark.parametrize("projected", [False, True], ids=["all", "usecols"])
+@pytest.mark.parametrize("scale", SCALES)
+@pytest.mark.parametrize("sample", WIDE_SAMPLES, ids=_id)
+def bench_load_wide_csv(benchmark, upload, sample, scale, projected):
+    from social_logic import load_csv_simple
+    from converter_logic import needed_columns
+
+    name = os.path.basename(sample)
+    columns = (lambda header: needed_columns(header, name)) if projected else None
+
+    def run():
+        return load_csv_simple(upload(sample, scale), columns=columns)
+
+    df, _msg = benchmark(run)
+    assert df is not None and len(df) > 0
+    benchmark.extra_info["columns"] = len(df.columns)
+    benchmark.extra_info["memory_mb"] = round(df.memory_usage(deep=True).sum() / 1e6, 2)
+
+@pytest.mark.parametrize("projected", [False, True], ids=["all", "usecols"])
+@pytest.mark.parametrize("scale", SCALES)
+@pytest.mark.parametrize("sample", WIDE_SAMPLES, ids=_id)
+def bench_wide_readable_text(benchmark, upload, sample, scale, projected):
+    from social_logic import load_csv_simple
+    from converter_logic import csv_to_readable_text, needed_columns
+
+    name = os.path.basename(sample)
+    columns = (lambda header: needed_columns(header, name)) if projected else None
+    df, _msg = load_csv_simple(upload(sample, scale), columns=columns)
+    text = benchmark(csv_to_readable_text, df, name)
+    assert text
@@ -0,0 +1,95 @@
+"""
+Benchmark delle letture usate dalle pagine: salute contenuti, contesto knowledge
+per l'AI e analisi d'impatto delle campagne, su un DB popolato con dati sintetici.
+Le letture in cache (database.cached_read) vengono misurate a freddo: la cache è
+svuotata prima di ogni round.
+"""
+
+import random
+import sqlite3
+from datetime import date, timedelta
+
+import pytest
+
+import database
+import storage  # dopo database, che mette la root del repo nel path
+from knowledge_codec import pack
+from conftest import SCALES
+
+def _fill_db(path, upload, scale):
+    """Importa i campioni sintetici e aggiunge knowledge e campagne proporzionali alla scala"""
+    from social_ingest import smart_csv_loader, save_social_bulk
+
+    for sample, platform in (("tiktok/Content.csv", "TikTok"),
+                             ("tiktok/FollowerHistory.csv", "TikTok"),
+                             ("IG/Follower.csv", "Instagram"),
+                             ("IG/Visualizzazioni.csv", "Instagram")):
+        df, _status, file_type = smart_csv_loader(upload(sample, scale))
+        save_social_bulk(df, platform, file_type)
+
+    rnd = random.Random(scale)
+    conn = sqlite3.connect(path)
+    # Contenuto compresso come lo salva knowledge_dedup.insert_document
+    conn.executemany(
+        "INSERT INTO knowledge_base (source, content, orig_len, preview) VALUES (?, ?, ?, ?)",
+        [(f"doc_{i}.pdf", *pack("Strategia di lancio e piano editoriale. " * rnd.randint(20, 200))) for i in range(10 * scale)]
+    )
+    # Campagne dentro il periodo coperto dalle serie di ciascuna piattaforma
+    # (le date TikTok senza anno cadono nell'anno corrente, quelle IG no)
+    ranges = conn.execute("SELECT platform, MIN(date_recorded), MAX(date_recorded) FROM social_stats "
+                          "WHERE platform IN ('Instagram', 'TikTok') GROUP BY platform").fetchall()
+    camps = []
+    for i in range(max(5, scale // 2)):
+        platform, d_min, d_max = ranges[i % len(ranges)]
+        d0 = date.fromisoformat(d_min[:10])
+        span = max((date.fromisoformat(d_max[:10]) - d0).days, 30)
+        start = d0 + timedelta(days=rnd.randint(0, span - 14))
+        camps.append((f"Camp {i}", platform, 500.0, rnd.uniform(50, 500), 0.0,
+                      rnd.randint(0, 5000), rnd.randint(1000, 100000),
+                      start.isoformat(), (start + timedelta(days=rnd.randint(3, 14))).isoformat()))
+    conn.executemany(
+        "INSERT INTO campaigns (name, platform, budget, spend, revenue, streams, impressions, start_date, end_date) "
+        "VALUES (?,?,?,?,?,?,?,?,?)", camps
+    )
+    conn.commit()
+    conn.close()
+
+@pytest.fixture
+def filled_db(temp_db, upload, scale):
+    _fill_db(temp_db, upload, scale)
+    storage.clear_read_cache()
+    return temp_db
+
+def _cold(fn, *args):
+    def run():
+        storage.clear_read_cache()
+        return fn(*args)
+    return run
+
+@pytest.mark.parametrize("scale", SCALES)
+def bench_get_content_health(benchmark, filled_db, scale):
+    from social_ingest import get_content_health
+
+    df = benchmark(_cold(get_content_health))
+    assert not df.empty
+
+@pytest.mark.parametrize("scale", SCALES)
+def bench_get_knowledge_context(benchmark, filled_db, scale):
+    from knowledge_logic import get_knowledge_context
+
+    ctx = benchmark(get_knowledge_context)
+    assert ctx
+
+@pytest.mark.parametrize("scale", SCALES)
+def bench_analyze_campaign_impact(benchmark, filled_db, scale):
+    from campaign_logic import analyze_campaign_impact
+
+    res = benchmark(analyze_campaign_impact, 1)
+    assert res is not None
+
+@pytest.mark.parametrize("scale", SCALES)
+def bench_analyze_campaigns_impact_batch(benchmark, filled_db, scale):
+    from campaign_logic import analyze_campaigns_impact
+
+    impact, _corr = benchmark(analyze_campaigns_impact)
+    assert not impact.empty
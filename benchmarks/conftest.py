@@ -0,0 +1,77 @@
+"""
+Fixture comuni dei benchmark.
+
+Scale degli export sintetici: variabile BENCH_SCALES (default "1,100").
+La scala 10000 (centinaia di MB per GIORNO_ORA) va chiesta esplicitamente:
+    BENCH_SCALES=1,100,10000 python -m pytest benchmarks
+
+I risultati (JSON) finiscono in benchmarks/results/pytest/, uno per esecuzione;
+per confrontare due commit:
+    pytest-benchmark --storage benchmarks/results/pytest compare 0001 0002
+"""
+
+import os
+import io
+import sys
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(os.path.dirname(HERE), "Claude", "2"))
+
+import generators  # noqa: E402
+
+SCALES = [int(s) for s in os.environ.get("BENCH_SCALES", "1,100").split(",") if s.strip()]
+
+class UploadedBytes(io.BytesIO):
+    """Come l'UploadedFile di Streamlit: getvalue() + name"""
+    def __init__(self, data, name):
+        super().__init__(data)
+        self.name = name
+
+@pytest.fixture(scope="session")
+def synthetic_dir(tmp_path_factory):
+    return str(tmp_path_factory.mktemp("synthetic"))
+
+@pytest.fixture(scope="session")
+def synthetic_files(synthetic_dir):
+    """scale -> {sample: path}; i file vengono generati una volta per sessione"""
+    cache = {}
+    def get(scale):
+        if scale not in cache:
+            cache[scale] = generators.write_synthetic(synthetic_dir, scale)
+        return cache[scale]
+    return get
+
+@pytest.fixture
+def upload(synthetic_files):
+    """upload(sample, scale) -> oggetto tipo UploadedFile con i bytes dell'export sintetico"""
+    def make(sample, scale):
+        path = synthetic_files(scale)[sample]
+        with open(path, "rb") as f:
+            return UploadedBytes(f.read(), os.path.basename(sample))
+    return make
+
+@pytest.fixture(scope="session", autouse=True)
+def _session_db(tmp_path_factory):
+    """
+    DB_NAME temporaneo per tutta la sessione: gli eventi di perf_trace (e ogni
+    altra scrittura fuori da temp_db) non finiscono in enterprise_os.db nella
+    cartella corrente
+    """
+    import database
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(database, "DB_NAME", str(tmp_path_factory.mktemp("session_db") / "enterprise_os.db"))
+        yield
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    """enterprise_os.db temporaneo con lo schema di database.init_advanced_db"""
+    import database
+    import storage
+    path = str(tmp_path / "bench.db")
+    monkeypatch.setattr(database, "DB_NAME", path)
+    storage.clear_read_cache()
+    database.init_advanced_db()
+    return path
@@ -0,0 +1,137 @@
+"""
+GENERATORS.PY - Export sintetici IG / TikTok / Meta per i benchmark
+
+Prende come modello i file veri in Claude/2/knowledge_docs/CSV e li "ingrandisce":
+stesse righe di intestazione, stesso encoding (UTF-16 per IG, UTF-8 con BOM per
+TikTok, UTF-8 per Meta), stesse colonne, ma le righe dati vengono replicate
+`scale` volte con numeri perturbati, date ISO spostate in avanti e ID video univoci.
+
+    python benchmarks/generators.py --scale 100 --out /tmp/synthetic
+"""
+
+import os
+import io
+import re
+import csv
+import random
+import argparse
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLES_DIR = os.path.join(ROOT, "Claude", "2", "knowledge_docs", "CSV")
+
+_NUM_RE = re.compile(r'^-?\d+(?:[.,]\d+)?$')
+_ISO_RE = re.compile(r'^(\d{4}-\d{2}-\d{2})(T.*)?$')
+_VIDEO_RE = re.compile(r'(video/)(\d+)')
+
+# ============ LETTURA CAMPIONI ============
+
+def list_samples(samples_dir=SAMPLES_DIR):
+    """Percorsi relativi (es. 'IG/Follower.csv') di tutti gli export di esempio"""
+    out = []
+    for folder in sorted(os.listdir(samples_dir)):
+        base = os.path.join(samples_dir, folder)
+        if not os.path.isdir(base):
+            continue
+        out += [f"{folder}/{f}" for f in sorted(os.listdir(base)) if f.lower().endswith('.csv')]
+    return out
+
+def _decode(raw):
+    if raw.startswith(b'\xff\xfe') or raw.startswith(b'\xfe\xff'):
+        return raw.decode('utf-16'), 'utf-16'
+    if raw.startswith(b'\xef\xbb\xbf'):
+        return raw[3:].decode('utf-8'), 'utf-8-sig'
+    return raw.decode('utf-8'), 'utf-8'
+
+def split_sample(text):
+    """
+    Divide l'export in (preambolo, header, righe dati, coda).
+    L'header è la prima riga con >=2 campi seguita da una riga con lo stesso numero
+    di campi; i dati proseguono finché la larghezza non cambia (es. seconda sezione
+    di Pubblico.csv, che finisce nella coda).
+    """
+    lines = text.splitlines(keepends=True)
+    reader = csv.reader(io.StringIO(text))
+    rows, ends = [], []
+    for row in reader:
+        rows.append(row)
+        ends.append(reader.line_num)
+
+    for i in range(len(rows) - 1):
+        if len(rows[i]) >= 2 and len(rows[i + 1]) == len(rows[i]):
+            width = len(rows[i])
+            j = i + 1
+            while j < len(rows) and len(rows[j]) == width:
+                j += 1
+            start_line = ends[i - 1] if i > 0 else 0
+            preamble = "".join(lines[:start_line])
+            tail = "".join(lines[ends[j - 1]:]) if j < len(rows) else ""
+            return preamble, rows[i], rows[i + 1:j], tail
+    return text, [], [], ""
+
+# ============ PERTURBAZIONE ============
+
+def _jitter_cell(cell, copy_idx, day_shift, rnd):
+    if copy_idx == 0 or not cell:
+        return cell
+    m = _ISO_RE.match(cell)
+    if m:
+        try:
+            d = datetime.strptime(m.group(1), '%Y-%m-%d') + timedelta(days=day_shift)
+            return d.strftime('%Y-%m-%d') + (m.group(2) or '')
+        except ValueError:
+            return cell
+    if _VIDEO_RE.search(cell):
+        return _VIDEO_RE.sub(lambda v: f"{v.group(1)}{int(v.group(2)) + copy_idx}", cell)
+    if _NUM_RE.match(cell):
+        factor = rnd.uniform(0.7, 1.3)
+        if ',' in cell or '.' in cell:
+            dec_sep = ',' if ',' in cell else '.'
+            decimals = len(cell.split(dec_sep)[1])
+            val = float(cell.replace(',', '.')) * factor
+            return f"{val:.{decimals}f}".replace('.', dec_sep)
+        return str(int(round(int(cell) * factor)))
+    return cell
+
+def generate_csv_bytes(sample, scale, seed=0, samples_dir=SAMPLES_DIR):
+    """Export sintetico (bytes, stesso encoding del campione) con le righe dati x scale"""
+    with open(os.path.join(samples_dir, sample), 'rb') as f:
+        text, encoding = _decode(f.read())
+    preamble, header, data, tail = split_sample(text)
+    if not header:
+        return text.encode(encoding)
+
+    rnd = random.Random(seed)
+    # IG quota tutti i campi, Meta solo dove serve: manteniamo lo stile del campione
+    quote_all = text[len(preamble):].lstrip().startswith('"') and all(
+        line.startswith('"') for line in text[len(preamble):].splitlines()[:3] if line)
+    out = io.StringIO()
+    out.write(preamble)
+    w = csv.writer(out, quoting=csv.QUOTE_ALL if quote_all else csv.QUOTE_MINIMAL, lineterminator='\n')
+    w.writerow(header)
+    period = max(len(data), 1)
+    for copy_idx in range(scale):
+        for row in data:
+            w.writerow([_jitter_cell(c, copy_idx, copy_idx * period, rnd) for c in row])
+    out.write(tail)
+    return out.getvalue().encode(encoding)
+
+def write_synthetic(out_dir, scale, samples=None, seed=0):
+    """Scrive gli export sintetici in out_dir/<cartella>/<file>, ritorna {sample: percorso}"""
+    paths = {}
+    for sample in samples or list_samples():
+        dest = os.path.join(out_dir, f"x{scale}", sample)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        if not os.path.exists(dest):
+            with open(dest, 'wb') as f:
+                f.write(generate_csv_bytes(sample, scale, seed))
+        paths[sample] = dest
+    return paths
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Genera export social sintetici per i benchmark")
+    ap.add_argument("--scale", type=int, default=100)
+    ap.add_argument("--out", required=True)
+    args = ap.parse_args()
+    for sample, path in write_synthetic(args.out, args.scale).items():
+        print(f"{sample:<55} {os.path.getsize(path) / 1024:>10.1f} KB")
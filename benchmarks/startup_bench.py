@@ -0,0 +1,155 @@
+"""
+STARTUP_BENCH.PY - Tempo di avvio e di rerun delle app Streamlit
+
+Misura, per ogni app:
+  1. cold start: processo Python nuovo con `-X importtime`, primo run completo
+     dello script (via streamlit.testing AppTest) + i moduli più costosi da importare;
+  2. rerun: latenza mediana di un rerun per ogni pagina del menu.
+
+Uso (dalla root del repo):
+    python benchmarks/startup_bench.py                 # tutte le app
+    python benchmarks/startup_bench.py --app prime_os --reruns 20
+    python benchmarks/startup_bench.py --out results/startup.json
+
+Gli script girano in una cartella temporanea, così i .db del repo non vengono toccati.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# nome -> (script, label del radio di navigazione, pagine)
+APPS = {
+    "yangkidd_pro": ("yangkidd_pro.py", "MENU",
+                     ["📈 Social Tracker", "💬 Strategy", "📚 Knowledge", "🔌 API", "⚙️ Ads"]),
+    "prime_os": (os.path.join("Gemini", "prime_os.py"), "SISTEMA",
+                 ["Dashboard (ROI)", "AI War Room", "Competitor Tracker", "Campaign Manager"]),
+    "chat_core": (os.path.join("Gemini", "chat_core.py"), None, [None]),
+    "converter": (os.path.join("Claude", "2", "main.py"), None, [None]),
+}
+
+# Codice eseguito nel processo figlio per il cold start
+_CHILD = """
+import sys, time, os
+t0 = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file(sys.argv[1], default_timeout=120)
+at.run()
+print("FIRST_RUN_MS", (time.perf_counter() - t0) * 1000)
+"""
+
+# ============ COLD START ============
+
+def parse_importtime(stderr, top=10):
+    """Ritorna (totale_ms, top moduli top-level per tempo cumulativo)"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            _self_us, cum_us, name = line[len("import time:"):].split("|")
+            cum_ms = int(cum_us) / 1000.0
+        except ValueError:
+            continue
+        # Solo import top-level: i sotto-moduli sono indentati nel nome
+        if name.startswith("  "):
+            continue
+        rows.append((name.strip(), cum_ms))
+    total = sum(ms for _, ms in rows)
+    rows.sort(key=lambda x: x[1], reverse=True)
+    return total, rows[:top]
+
+def cold_start(script, workdir):
+    t0 = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _CHILD, os.path.join(ROOT, script)],
+        cwd=workdir, capture_output=True, text=True
+    )
+    wall_ms = (time.perf_counter() - t0) * 1000
+    first_run = None
+    for line in proc.stdout.splitlines():
+        if line.startswith("FIRST_RUN_MS"):
+            first_run = float(line.split()[1])
+    import_total, top = parse_importtime(proc.stderr)
+    return {
+        "ok": proc.returncode == 0,
+        "process_wall_ms": round(wall_ms, 1),
+        "first_run_ms": round(first_run, 1) if first_run is not None else None,
+        "import_total_ms": round(import_total, 1),
+        "top_imports": [{"module": m, "cumulative_ms": round(ms, 1)} for m, ms in top],
+    }
+
+# ============ RERUN ============
+
+def rerun_latency(script, nav_label, pages, reruns, workdir):
+    from streamlit.testing.v1 import AppTest
+
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        at = AppTest.from_file(os.path.join(ROOT, script), default_timeout=120)
+        at.run()
+        results = {}
+        for page in pages:
+            if page is not None:
+                radio = next(r for r in at.radio if r.label == nav_label)
+                radio.set_value(page)
+                at.run()
+            samples = []
+            for _ in range(reruns):
+                t0 = time.perf_counter()
+                at.run()
+                samples.append((time.perf_counter() - t0) * 1000)
+            results[page or "main"] = {
+                "median_ms": round(statistics.median(samples), 2),
+                # Interpolazione lineare come quantile(0.9) di pandas in perf_trace (mai sotto la mediana)
+                "p90_ms": round(statistics.quantiles(samples, n=10, method="inclusive")[-1] if len(samples) > 1 else samples[0], 2),
+                "exceptions": [str(e.value)[:200] for e in at.exception],
+            }
+        return results
+    finally:
+        os.chdir(cwd)
+
+# ============ MAIN ============
+
+def git_sha():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Benchmark avvio/rerun delle app Streamlit")
+    ap.add_argument("--app", choices=sorted(APPS), action="append")
+    ap.add_argument("--reruns", type=int, default=10)
+    ap.add_argument("--out", default=None, help="File JSON di output (default: benchmarks/results/startup-<sha>.json)")
+    args = ap.parse_args()
+
+    report = {"commit": git_sha(), "python": sys.version.split()[0], "apps": {}}
+    for name in args.app or sorted(APPS):
+        script, nav_label, pages = APPS[name]
+        with tempfile.TemporaryDirectory() as wd:
+            cold = cold_start(script, wd)
+            rerun = rerun_latency(script, nav_label, pages, args.reruns, wd)
+        report["apps"][name] = {"cold_start": cold, "rerun": rerun}
+
+        print(f"\n== {name} ({script})")
+        print(f"   cold start: {cold['process_wall_ms']} ms processo | primo run {cold['first_run_ms']} ms | import {cold['import_total_ms']} ms")
+        for mod in cold["top_imports"][:5]:
+            print(f"      {mod['module']:<30} {mod['cumulative_ms']:>8.1f} ms")
+        for page, r in rerun.items():
+            print(f"   rerun {page:<22} mediana {r['median_ms']:>8.2f} ms | p90 {r['p90_ms']:>8.2f} ms")
+
+    out = args.out or os.path.join(ROOT, "benchmarks", "results", f"startup-{report['commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\nRisultati salvati in {out}")
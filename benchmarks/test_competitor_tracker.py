@@ -0,0 +1,127 @@
+"""
+Test del Competitor Tracker (Gemini/competitor_tracker.py) con ricerca ed
+estrazione finte: nessuna rete, nessun modello.
+"""
+
+import os
+import sys
+import threading
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "Gemini"))
+
+import storage  # noqa: E402
+from competitor_tracker import SearchCache, track_competitors, search_query  # noqa: E402
+
+DAY = "2026-01-01"
+
+class FakeSearch:
+    """search_fn finta: registra le query, risultati fissi per nome"""
+    def __init__(self, delays=None, fail=(), empty=()):
+        self.calls = []
+        self.delays = delays or {}
+        self.fail = set(fail)
+        self.empty = set(empty)
+        self.lock = threading.Lock()
+
+    def __call__(self, query, max_res):
+        name = query.split(" instagram")[0]
+        with self.lock:
+            self.calls.append(query)
+        wait = self.delays.get(name)
+        if wait:
+            wait()
+        if name in self.fail:
+            raise ConnectionError("DDGS non raggiungibile")
+        if name in self.empty:
+            return []
+        return [{"title": f"{name} stats", "body": f"{name} ha 10k followers"}]
+
+def fake_extract(prompt):
+    return "10k|Positivo"
+
+def _run(names, search, extract=fake_extract, **kw):
+    return list(track_competitors(names, search, extract, day=DAY, **kw))
+
+def test_second_call_hits_cache(tmp_path):
+    cache = SearchCache(str(tmp_path / "cache.db"))
+    search = FakeSearch()
+    first = _run(["Lazza", "Geolier"], search, cache=cache)
+    assert len(search.calls) == 2 and not any(r["cached"] for r in first)
+
+    second = _run(["Lazza", "Geolier"], search, cache=cache)
+    assert len(search.calls) == 2            # nessuna nuova ricerca
+    assert all(r["cached"] for r in second)
+    assert cache.get(search_query("Lazza"), DAY)[0]["title"] == "Lazza stats"
+
+def test_extraction_starts_while_searches_run():
+    # La ricerca lenta aspetta che sia partita l'estrazione di quella veloce:
+    # senza pipeline resterebbe ferma fino al timeout
+    fast_extracted = threading.Event()
+    search = FakeSearch(delays={"Lento": lambda: fast_extracted.wait(5)})
+
+    def extract(prompt):
+        if "Veloce" in prompt:
+            fast_extracted.set()
+        return "1k|Neutro"
+
+    results = _run(["Lento", "Veloce"], search, extract=extract)
+    assert [r["name"] for r in results] == ["Veloce", "Lento"]   # restituiti appena pronti
+    assert fast_extracted.is_set()
+
+def test_failed_search_is_an_error_without_extraction():
+    prompts = []
+    def extract(prompt):
+        prompts.append(prompt)
+        return "10k|Positivo"
+
+    results = {r["name"]: r for r in _run(["Lazza", "Offline"], FakeSearch(fail={"Offline"}), extract=extract)}
+    assert results["Offline"]["error"] and results["Offline"]["followers"] == "N/A"
+    assert results["Lazza"]["error"] is None and results["Lazza"]["followers"] == "10k"
+    assert not any("Offline" in p for p in prompts)
+
+def test_empty_search_is_an_error_without_extraction(tmp_path):
+    prompts = []
+    def extract(prompt):
+        prompts.append(prompt)
+        return "10k|Positivo"
+
+    cache = SearchCache(str(tmp_path / "cache.db"))
+    (result,) = _run(["Sconosciuto"], FakeSearch(empty={"Sconosciuto"}), extract=extract, cache=cache)
+    assert result["error"] and result["followers"] == "N/A"
+    assert prompts == []
+    assert cache.get(search_query("Sconosciuto"), DAY) is None   # il vuoto non finisce in cache
+
+@pytest.mark.parametrize("reply", ["Non ho trovato dati", "12k", "|Positivo", "12k|Positivo|extra", ""])
+def test_malformed_reply_is_an_error(reply):
+    (result,) = _run(["Lazza"], FakeSearch(), extract=lambda prompt: reply)
+    assert result["error"] and result["followers"] == "N/A"
+
+def test_quoted_reply_is_parsed():
+    (result,) = _run(["Lazza"], FakeSearch(), extract=lambda prompt: " '12k | Neutro'\n")
+    assert result["error"] is None and (result["followers"], result["sentiment"]) == ("12k", "Neutro")
+
+def test_failed_extraction_is_an_error():
+    def extract(prompt):
+        raise RuntimeError("ollama non risponde")
+
+    (result,) = _run(["Lazza"], FakeSearch(), extract=extract)
+    assert result["error"] == "ollama non risponde" and result["sentiment"] == "Neutro"
+
+def test_save_competitor_upserts_on_name_platform(tmp_path):
+    path = str(tmp_path / "marketing.db")
+    conn = storage.connect(path)
+    try:
+        storage.save_competitor(conn, "Lazza", "Social/Music", "10k", "Positivo", "2026-01-01")
+        storage.save_competitor(conn, "Lazza", "Social/Music", "12k", "Neutro", "2026-01-02")
+        storage.save_competitor(conn, "Lazza", "Spotify", "50k", "Positivo", "2026-01-02")
+        conn.commit()
+        rows = conn.execute("SELECT name, platform, followers, sentiment, last_check FROM competitors "
+                            "ORDER BY platform").fetchall()
+    finally:
+        conn.close()
+    assert rows == [("Lazza", "Social/Music", "12k", "Neutro", "2026-01-02"),
+                    ("Lazza", "Spotify", "50k", "Positivo", "2026-01-02")]
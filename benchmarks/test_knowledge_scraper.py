@@ -0,0 +1,146 @@
+"""
+Test del knowledge_scraper contro un http.server locale: richieste condizionali
+(ETag / Last-Modified -> 304 dalla cache), dedup per hash del contenuto e
+limite di richieste contemporanee per host.
+"""
+
+import random
+import sqlite3
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from knowledge_scraper import Fetcher, HttpCache, make_session, scrape_urls
+
+LAST_MODIFIED = "Mon, 05 Jan 2026 10:00:00 GMT"
+
+def _page(seed, title=None):
+    rng = random.Random(seed)
+    words = [rng.choice(["beat", "drill", "stream", "tour", "vinile", "studio", "feat", "remix", "radio",
+                         "palco", "fan", "clip", "testo", "album", "singolo", "premiere"]) + str(rng.randint(0, 999))
+             for _ in range(120)]
+    return f"<html><head><title>{title or seed}</title></head><body><p>{' '.join(words)}</p></body></html>"
+
+class _Site:
+    """Pagine servite dal server di prova + contatori delle richieste"""
+    def __init__(self):
+        self.pages = {}          # path -> (html, {header: valore})
+        self.requests = []       # (path, status, header condizionali)
+        self.delay = 0.0
+        self.in_flight = self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+class _Handler(BaseHTTPRequestHandler):
+    site = None
+
+    def do_GET(self):
+        site = self.site
+        with site.lock:
+            site.in_flight += 1
+            site.max_in_flight = max(site.max_in_flight, site.in_flight)
+        try:
+            time.sleep(site.delay)
+            html, headers = site.pages[self.path]
+            conditional = {k: self.headers[k] for k in ("If-None-Match", "If-Modified-Since") if self.headers[k]}
+            not_modified = (("ETag" in headers and conditional.get("If-None-Match") == headers["ETag"]) or
+                            ("Last-Modified" in headers and conditional.get("If-Modified-Since") == headers["Last-Modified"]))
+            status = 304 if not_modified else 200
+            with site.lock:
+                site.requests.append((self.path, status, conditional))
+            self.send_response(status)
+            for k, v in headers.items():
+                self.send_header(k, v)
+            if status == 304:
+                self.end_headers()
+                return
+            body = html.encode("utf-8")
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with site.lock:
+                site.in_flight -= 1
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def site():
+    s = _Site()
+    handler = type("Handler", (_Handler,), {"site": s})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    s.url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield s
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def fetcher(tmp_path):
+    f = Fetcher(session=make_session(), cache=HttpCache(str(tmp_path / "http_cache")))
+    yield f
+    f.session.close()
+
+@pytest.mark.parametrize("validator", [{"ETag": '"v1"'}, {"Last-Modified": LAST_MODIFIED}], ids=["etag", "last-modified"])
+def test_revalidation_serves_304_from_cache(site, fetcher, validator):
+    site.pages["/a"] = (_page(1), validator)
+
+    first, cached_first = fetcher.fetch(site.url + "/a")
+    second, cached_second = fetcher.fetch(site.url + "/a")
+
+    assert (cached_first, cached_second) == (False, True)
+    assert second == first
+    (_, s1, c1), (_, s2, c2) = site.requests
+    assert (s1, s2) == (200, 304)
+    assert c1 == {}
+    header = "If-None-Match" if "ETag" in validator else "If-Modified-Since"
+    assert c2 == {header: next(iter(validator.values()))}
+
+def test_page_without_validators_is_not_cached(site, fetcher):
+    site.pages["/plain"] = (_page(2), {})
+    fetcher.fetch(site.url + "/plain")
+    _, cached = fetcher.fetch(site.url + "/plain")
+    assert not cached
+    assert [status for _, status, _ in site.requests] == [200, 200]
+
+def test_same_content_is_saved_once(site, fetcher, temp_db):
+    body = _page(3)
+    site.pages["/orig"] = (body, {"ETag": '"o"'})
+    # Stesso testo con maiuscole e spazi diversi: stesso hash normalizzato
+    site.pages["/copia"] = (body.replace("<p>", "<p>\n  ").upper(), {})
+    site.pages["/altra"] = (_page(4), {})
+    urls = [site.url + p for p in ("/orig", "/copia", "/altra")]
+
+    first = {r["url"]: r for r in scrape_urls(urls, fetcher, workers=1)}
+    assert sum(r["saved"] for r in first.values()) == 2
+    assert first[site.url + "/altra"]["saved"]
+    assert sum(r["duplicate"] for r in first.values()) == 1
+
+    # Secondo giro: tutto già in knowledge_base (e /orig rivalidata con 304)
+    second = scrape_urls(urls, fetcher, workers=4)
+    assert all(r["duplicate"] and not r["saved"] for r in second)
+    assert next(r for r in second if r["url"].endswith("/orig"))["cached"]
+
+    conn = sqlite3.connect(temp_db)
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM knowledge_base").fetchone()[0] == 2
+    finally:
+        conn.close()
+
+def test_per_host_limit(site, tmp_path, temp_db):
+    site.delay = 0.1
+    for i in range(8):
+        site.pages[f"/p{i}"] = (_page(10 + i), {})
+    fetcher = Fetcher(session=make_session(), cache=HttpCache(str(tmp_path / "http_cache")), per_host=2)
+    try:
+        results = scrape_urls([f"{site.url}/p{i}" for i in range(8)], fetcher, workers=8)
+    finally:
+        fetcher.session.close()
+    assert all(r["error"] is None for r in results)
+    # 8 worker, ma mai più di PER_HOST richieste insieme verso lo stesso host (e in parallelo fino a lì)
+    assert site.max_in_flight == 2
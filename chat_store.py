@@ -0,0 +1,181 @@
+"""
+CHAT_STORE.PY - Storico chat a sessioni con caricamento a pagine
+
+chat_history veniva letto per intero (session_id='MAIN', ORDER BY id) a ogni
+apertura e la pagina Strategy ridisegnava ogni messaggio a ogni rerun. Qui:
+
+  - indice (session_id, id): ogni lettura è una range-scan sull'indice;
+  - paginazione keyset: page(sessione) dà gli ultimi PAGE_SIZE messaggi,
+    page(sessione, before_id=cursore) quelli ancora prima (niente OFFSET);
+  - tabella chat_sessions (titolo, conteggio, ultimo aggiornamento, archiviata)
+    per la lista delle sessioni senza contare i messaggi;
+  - compact(): i messaggi vecchi escono da chat_history e finiscono compressi
+    (zlib, JSON) in chat_archive a blocchi; page() li rilegge solo se si torna
+    indietro fino a lì.
+
+    from chat_store import ChatStore
+    store = ChatStore("yangkidd_pro.db")
+    msgs, cursor = store.page("MAIN")              # ultima pagina
+    older, cursor = store.page("MAIN", cursor)     # pagina precedente (cursor None = inizio)
+    store.append("MAIN", "user", testo)           # scritto in batch dal write buffer
+"""
+
+import json
+import zlib
+import threading
+
+from write_buffer import get_buffer
+from workspace import connect
+
+DEFAULT_SESSION = "MAIN"
+PAGE_SIZE = 30
+KEEP_RECENT = 200       # compact(): messaggi che restano in chat_history
+ARCHIVE_CHUNK = 500     # messaggi per riga di chat_archive
+
+_ready = set()
+_ready_lock = threading.Lock()
+
+class ChatStore:
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.buffer = get_buffer(db_path)
+        with _ready_lock:
+            if db_path not in _ready:
+                self._ensure_schema()
+                _ready.add(db_path)
+
+    def _conn(self):
+        # Prima di leggere o cancellare si scrivono i messaggi ancora in coda nel buffer
+        self.buffer.flush()
+        return connect(self.db_path)
+
+    def _ensure_schema(self):
+        conn = self._conn()
+        try:
+            conn.execute('''CREATE TABLE IF NOT EXISTS chat_history (id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT, role TEXT, content TEXT, timestamp DATETIME DEFAULT CURRENT_TIMESTAMP)''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_chat_history_session ON chat_history (session_id, id)")
+            conn.execute('''CREATE TABLE IF NOT EXISTS chat_sessions (
+                            session_id TEXT PRIMARY KEY,
+                            title TEXT,
+                            messages INTEGER DEFAULT 0,
+                            archived INTEGER DEFAULT 0,
+                            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP)''')
+            conn.execute('''CREATE TABLE IF NOT EXISTS chat_archive (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            session_id TEXT,
+                            first_id INTEGER,
+                            last_id INTEGER,
+                            n INTEGER,
+                            blob BLOB)''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_chat_archive_session ON chat_archive (session_id, last_id)")
+            # Sessioni già presenti nello storico (DB creati prima di chat_sessions)
+            conn.execute('''INSERT OR IGNORE INTO chat_sessions (session_id, title, messages, updated_at)
+                            SELECT session_id, session_id, COUNT(*), MAX(timestamp) FROM chat_history GROUP BY session_id''')
+            conn.commit()
+        finally:
+            conn.close()
+
+    # --- SCRITTURA ---
+    def append(self, session_id, role, content):
+        """Accoda il messaggio nel write buffer (scritto in batch, vedi write_buffer.py)"""
+        self.buffer.add("INSERT INTO chat_history (session_id, role, content) VALUES (?,?,?)", (session_id, role, content))
+        self.buffer.add('''INSERT INTO chat_sessions (session_id, title, messages) VALUES (?, ?, 1)
+                           ON CONFLICT(session_id) DO UPDATE SET messages = messages + 1, updated_at = CURRENT_TIMESTAMP''',
+                        (session_id, (content or "")[:60] if role == "user" else session_id))
+
+    def clear(self, session_id):
+        conn = self._conn()
+        try:
+            conn.execute("DELETE FROM chat_history WHERE session_id=?", (session_id,))
+            conn.execute("DELETE FROM chat_archive WHERE session_id=?", (session_id,))
+            conn.execute("UPDATE chat_sessions SET messages=0, updated_at=CURRENT_TIMESTAMP WHERE session_id=?", (session_id,))
+            conn.commit()
+        finally:
+            conn.close()
+
+    # --- LETTURA ---
+    def page(self, session_id, before_id=None, limit=PAGE_SIZE):
+        """
+        Messaggi [{id, role, content}] in ordine cronologico, al massimo `limit`,
+        con id < before_id (None = dalla fine). Ritorna (messaggi, cursore per la
+        pagina precedente o None se non c'è altro).
+        """
+        conn = self._conn()
+        try:
+            # Condizione costruita a parte: con "id<?" esplicito SQLite parte dal cursore sull'indice
+            if before_id is None:
+                rows = conn.execute("SELECT id, role, content FROM chat_history WHERE session_id=? ORDER BY id DESC LIMIT ?",
+                                    (session_id, limit)).fetchall()
+            else:
+                rows = conn.execute("SELECT id, role, content FROM chat_history WHERE session_id=? AND id<? ORDER BY id DESC LIMIT ?",
+                                    (session_id, before_id, limit)).fetchall()
+            msgs = [{"id": r[0], "role": r[1], "content": r[2]} for r in reversed(rows)]
+            if len(msgs) < limit:
+                # Fine della parte "calda": si continua nell'archivio compresso
+                edge = msgs[0]["id"] if msgs else before_id
+                msgs = self._archived(conn, session_id, edge, limit - len(msgs)) + msgs
+            if len(msgs) < limit or not msgs:
+                return msgs, None
+            first = msgs[0]["id"]
+            more = conn.execute("SELECT 1 FROM chat_history WHERE session_id=? AND id<? LIMIT 1", (session_id, first)).fetchone() \
+                or conn.execute("SELECT 1 FROM chat_archive WHERE session_id=? AND first_id<? LIMIT 1", (session_id, first)).fetchone()
+            return msgs, first if more else None
+        finally:
+            conn.close()
+
+    def _archived(self, conn, session_id, before_id, limit):
+        out = []
+        sql, args = "SELECT blob FROM chat_archive WHERE session_id=?", (session_id,)
+        if before_id is not None:
+            sql, args = sql + " AND first_id<?", args + (before_id,)
+        for (blob,) in conn.execute(sql + " ORDER BY last_id DESC", args):
+            chunk = [m for m in json.loads(zlib.decompress(blob)) if before_id is None or m["id"] < before_id]
+            out = chunk[-(limit - len(out)):] + out
+            if len(out) >= limit:
+                break
+        return out
+
+    def sessions(self, include_archived=False):
+        conn = self._conn()
+        try:
+            rows = conn.execute(
+                "SELECT session_id, title, messages, archived, updated_at FROM chat_sessions "
+                + ("" if include_archived else "WHERE archived=0 ") + "ORDER BY updated_at DESC").fetchall()
+            return [dict(zip(("session_id", "title", "messages", "archived", "updated_at"), r)) for r in rows]
+        finally:
+            conn.close()
+
+    # --- MANUTENZIONE ---
+    def archive(self, session_id, archived=True):
+        """Nasconde la sessione dalla lista (i messaggi restano) e la compatta"""
+        conn = self._conn()
+        try:
+            conn.execute("UPDATE chat_sessions SET archived=? WHERE session_id=?", (int(archived), session_id))
+            conn.commit()
+        finally:
+            conn.close()
+        if archived:
+            self.compact(session_id, keep_recent=0)
+
+    def compact(self, session_id, keep_recent=KEEP_RECENT):
+        """Sposta in chat_archive (compressi) i messaggi oltre gli ultimi keep_recent; ritorna quanti"""
+        conn = self._conn()
+        try:
+            cut = conn.execute("SELECT id FROM chat_history WHERE session_id=? ORDER BY id DESC LIMIT 1 OFFSET ?",
+                               (session_id, keep_recent - 1)).fetchone() if keep_recent else (None,)
+            if cut is None:
+                return 0
+            sql = "SELECT id, role, content FROM chat_history WHERE session_id=?" + (" AND id<?" if cut[0] is not None else "") + " ORDER BY id"
+            rows = conn.execute(sql, (session_id,) + ((cut[0],) if cut[0] is not None else ())).fetchall()
+            for i in range(0, len(rows), ARCHIVE_CHUNK):
+                part = [{"id": r[0], "role": r[1], "content": r[2]} for r in rows[i:i + ARCHIVE_CHUNK]]
+                conn.execute("INSERT INTO chat_archive (session_id, first_id, last_id, n, blob) VALUES (?,?,?,?,?)",
+                             (session_id, part[0]["id"], part[-1]["id"], len(part),
+                              zlib.compress(json.dumps(part, ensure_ascii=False).encode("utf-8"))))
+            if rows:
+                conn.execute("DELETE FROM chat_history WHERE session_id=? AND id<=?", (session_id, rows[-1][0]))
+            conn.commit()
+            return len(rows)
+        finally:
+            conn.close()
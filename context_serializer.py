@@ -0,0 +1,138 @@
+"""
+CONTEXT_SERIALIZER.PY - Dati compatti per il system prompt dell'AI
+
+Su CPU il tempo di prompt-eval cresce con la lunghezza del prompt: un
+DataFrame.to_string() (tabella a larghezza fissa piena di spazi, id, source_type)
+costa molti token e porta poco segnale. Qui i dati diventano CSV densi:
+
+  social_context()     una riga per (piattaforma, metrica): ultimo valore e data,
+                       variazione a 7 e 30 giorni, min/max e gli ultimi valori della serie
+  campaigns_context()  totali per piattaforma + campagne principali per spesa
+
+Ogni funzione rispetta un budget di token (stima ~4 caratteri per token): prima
+accorcia le serie, poi taglia le righe meno importanti e lo dichiara in coda.
+"""
+
+import pandas as pd
+
+CHARS_PER_TOKEN = 4
+SERIES_POINTS = 7
+# Metriche più utili per la strategia: vanno in cima e vengono tagliate per ultime
+PRIORITY_KEYWORDS = ("follower", "stream", "view", "reach", "copertura", "spend", "interaction")
+
+def approx_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def fmt(value):
+    """Numero compatto: 1234567 -> 1.23M, 12.5 -> 12.5, NaN -> ''"""
+    if value is None or pd.isna(value):
+        return ""
+    v = float(value)
+    for div, suffix in ((1e9, "B"), (1e6, "M"), (1e3, "K")):
+        if abs(v) >= div:
+            return f"{v / div:.3g}{suffix}"
+    if abs(v) >= 100 or v == int(v):
+        return str(int(round(v)))
+    return f"{v:.3g}"
+
+def _pct(new, old):
+    if old is None or pd.isna(old) or old == 0 or pd.isna(new):
+        return ""
+    return f"{(new - old) / abs(old) * 100:+.0f}%"
+
+def _fit(header, rows, max_tokens, note_fn):
+    """Tiene le prime righe che stanno nel budget; note_fn(n_tagliate) descrive il taglio"""
+    out = [header]
+    used = approx_tokens(header)
+    for i, row in enumerate(rows):
+        cost = approx_tokens(row)
+        if used + cost > max_tokens:
+            out.append(note_fn(len(rows) - i))
+            break
+        out.append(row)
+        used += cost
+    return "\n".join(out)
+
+# --- SOCIAL ---
+
+def social_context(df, max_tokens=600, series_points=SERIES_POINTS):
+    """
+    df: righe di social_stats (almeno platform, metric_type, value, date_recorded).
+    Ritorna CSV: piattaforma,metrica,ultimo,data,d7,d30,min,max,serie
+    """
+    if df is None or df.empty:
+        return "Nessun dato social."
+    d = df[["platform", "metric_type", "value", "date_recorded"]].copy()
+    d["date"] = pd.to_datetime(d["date_recorded"], errors="coerce")
+    d["value"] = pd.to_numeric(d["value"], errors="coerce")
+    d = d.dropna(subset=["date", "value"])
+    if d.empty:
+        return "Nessun dato social."
+
+    # Una serie giornaliera per metrica (stesso giorno ripetuto -> ultimo valore)
+    d = d.sort_values("date").groupby(["platform", "metric_type", "date"], as_index=False)["value"].last()
+
+    def summarize(n_series):
+        rows = []
+        for (plat, metric), g in d.groupby(["platform", "metric_type"], sort=False):
+            s = g.set_index("date")["value"]
+            last_date, last = s.index[-1], s.iloc[-1]
+            # Valore più recente a 7/30 giorni dall'ultimo dato
+            v7 = s[s.index <= last_date - pd.Timedelta(days=7)]
+            v30 = s[s.index <= last_date - pd.Timedelta(days=30)]
+            series = " ".join(fmt(v) for v in s.iloc[-n_series:]) if n_series else ""
+            rows.append((plat, metric, last_date, ",".join([
+                plat, metric.replace(",", " "), fmt(last), last_date.strftime("%Y-%m-%d"),
+                _pct(last, v7.iloc[-1] if len(v7) else None), _pct(last, v30.iloc[-1] if len(v30) else None),
+                # Con un solo punto min/max ripeterebbero l'ultimo valore
+                fmt(s.min()) if len(s) > 1 else "", fmt(s.max()) if len(s) > 1 else "", series,
+            ])))
+        # Prima le metriche chiave, poi le più aggiornate
+        rows.sort(key=lambda r: (not any(k in r[1].lower() for k in PRIORITY_KEYWORDS), -r[2].value))
+        return [r[3] for r in rows]
+
+    header = "piattaforma,metrica,ultimo,data,d7,d30,min,max,serie"
+    rows = summarize(series_points)
+    if approx_tokens("\n".join([header] + rows)) > max_tokens and series_points:
+        # Troppo lungo: prima si rinuncia alle serie, poi alle righe
+        header = "piattaforma,metrica,ultimo,data,d7,d30,min,max"
+        rows = [r.rsplit(",", 1)[0] for r in summarize(0)]
+    return _fit(header, rows, max_tokens, lambda n: f"(+{n} metriche omesse)")
+
+def social_query(days=60):
+    """SQL per social_context: solo le colonne utili degli ultimi `days` giorni di dati"""
+    return (f"SELECT platform, metric_type, value, date_recorded FROM social_stats "
+            f"WHERE date_recorded >= date((SELECT MAX(date_recorded) FROM social_stats), '-{int(days)} day')")
+
+# --- CAMPAGNE ---
+
+def campaigns_context(df, max_tokens=500):
+    """
+    df: tabella campaigns. Ritorna totali per piattaforma + campagne per spesa decrescente
+    (solo nome, piattaforma, stato, spesa, revenue, ROAS e date).
+    """
+    if df is None or df.empty:
+        return "Nessun dato storico."
+    d = df.copy()
+    for col in ("spend", "revenue", "budget"):
+        d[col] = pd.to_numeric(d[col], errors="coerce").fillna(0) if col in d.columns else 0.0
+
+    lines = ["piattaforma,campagne,spesa,revenue,roas"]
+    for plat, g in d.groupby("platform"):
+        spend, rev = g["spend"].sum(), g["revenue"].sum()
+        lines.append(f"{plat},{len(g)},{fmt(spend)},{fmt(rev)},{fmt(rev / spend) if spend else ''}")
+    totals = "\n".join(lines)
+
+    date_col = next((c for c in ("start_date", "date") if c in d.columns), None)
+    cols = ["name", "platform"] + (["status"] if "status" in d.columns else [])
+    header = ",".join(["nome", "piattaforma"] + (["stato"] if "status" in d.columns else []) + ["spesa", "revenue", "roas"] + (["data"] if date_col else []))
+    rows = []
+    for _, r in d.sort_values("spend", ascending=False).iterrows():
+        roas = r["revenue"] / r["spend"] if r["spend"] else None
+        vals = [str(r[c]).replace(",", " ") for c in cols] + [fmt(r["spend"]), fmt(r["revenue"]), fmt(roas)]
+        if date_col:
+            vals.append(str(r[date_col])[:10])
+        rows.append(",".join(vals))
+    budget_left = max_tokens - approx_tokens(totals)
+    detail = _fit(header, rows, budget_left, lambda n: f"(+{n} campagne minori omesse)")
+    return f"TOTALI\n{totals}\nCAMPAGNE (per spesa)\n{detail}"
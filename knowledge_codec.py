@@ -0,0 +1,52 @@
+"""
+KNOWLEDGE_CODEC.PY - Contenuto di knowledge_base compresso (zlib)
+
+knowledge_base.content contiene un BLOB zlib invece del testo; accanto restano
+orig_len (caratteri del testo originale) e preview (primi PREVIEW_CHARS caratteri)
+per le liste e la UI, che così non toccano mai il blob.
+Le righe vecchie con testo in chiaro restano leggibili: unpack() accetta entrambi.
+
+Per i prompt si decomprime solo il pezzo che serve: unpack(blob, max_chars) si ferma
+appena ha abbastanza testo, senza espandere il resto del libro.
+
+Condiviso da tutte le app: storage.add_knowledge comprime all'inserimento e la
+migrazione 3 di storage.py aggiunge le colonne e comprime le righe esistenti.
+"""
+
+import zlib
+
+LEVEL = 6
+PREVIEW_CHARS = 300
+MIGRATE_BATCH = 200
+
+def pack(text):
+    """(blob, orig_len, preview) da salvare in knowledge_base"""
+    text = text or ""
+    return zlib.compress(text.encode("utf-8"), LEVEL), len(text), text[:PREVIEW_CHARS]
+
+def unpack(value, max_chars=None):
+    """Testo da content (BLOB compresso o TEXT delle righe non migrate), al massimo max_chars caratteri"""
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value if max_chars is None else value[:max_chars]
+    if max_chars is None:
+        return zlib.decompress(value).decode("utf-8")
+    # UTF-8: al massimo 4 byte per carattere; il carattere spezzato in coda si scarta
+    raw = zlib.decompressobj().decompress(value, max_chars * 4)
+    return raw.decode("utf-8", errors="ignore")[:max_chars]
+
+def migrate(conn, commit=True):
+    """Comprime sul posto le righe con content ancora in chiaro; ritorna quante.
+    commit=False: tutto nella transazione del chiamante (migrazioni di storage)"""
+    done = 0
+    while True:
+        rows = conn.execute("SELECT id, content FROM knowledge_base WHERE typeof(content)='text' LIMIT ?",
+                            (MIGRATE_BATCH,)).fetchall()
+        if not rows:
+            return done
+        conn.executemany("UPDATE knowledge_base SET content=?, orig_len=?, preview=? WHERE id=?",
+                         [(*pack(text), i) for i, text in rows])
+        if commit:
+            conn.commit()
+        done += len(rows)
@@ -0,0 +1,199 @@
+"""
+LLM_SCHEDULER.PY - Coda unica per le chiamate al modello locale
+
+Il modello gira su CPU: due chat aperte in due tab, o l'estrazione dei competitor
+mentre si chatta, lanciavano ognuna il proprio ollama.chat e si rallentavano a
+vicenda. Lo scheduler (uno per processo Streamlit, condiviso da tutte le sessioni):
+
+  - coda limitata (LLM_QUEUE_MAX) con priorità: la chat (INTERACTIVE) passa davanti
+    alle estrazioni in batch (BATCH);
+  - LLM_WORKERS chiamate contemporanee al modello (default 1);
+  - single-flight: un prompt identico a uno già in coda o in esecuzione non genera
+    una seconda chiamata, si aggancia allo stesso stream;
+  - attesa in coda misurata per ogni richiesta (ticket.wait_ms) e in stats().
+
+Le chiamate passano dal ModelManager (modello caldo, keep_alive, riserva).
+
+    from llm_scheduler import get_scheduler, INTERACTIVE, BATCH
+    llm = get_scheduler()
+    for text in llm.stream(messages): ...                 # chat
+    llm.complete([{"role": "user", "content": p}], priority=BATCH)
+"""
+
+import os
+import json
+import time
+import queue
+import itertools
+import threading
+from collections import deque
+
+from model_manager import get_manager
+
+INTERACTIVE = 0
+BATCH = 10
+
+QUEUE_MAX = int(os.environ.get("LLM_QUEUE_MAX", "32"))
+WORKERS = int(os.environ.get("LLM_WORKERS", "1"))
+
+class SchedulerBusy(Exception):
+    """Coda piena: la richiesta viene rifiutata subito invece di aspettare all'infinito"""
+
+class _Job:
+    def __init__(self, key, messages, options, priority):
+        self.key = key
+        self.messages = messages
+        self.options = options
+        self.priority = priority
+        self.cond = threading.Condition()
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.subscribers = 0
+        self.enqueued = time.perf_counter()
+        self.started = None
+
+class Ticket:
+    """Una richiesta: legge lo stream del job (proprio o condiviso) dall'inizio"""
+
+    def __init__(self, job, merged):
+        self.job = job
+        self.merged = merged
+
+    @property
+    def wait_ms(self):
+        """Attesa in coda (None finché il modello non ha iniziato)"""
+        if self.job.started is None:
+            return None
+        return round((self.job.started - self.job.enqueued) * 1000, 1)
+
+    def stream(self):
+        job = self.job
+        i = 0
+        try:
+            while True:
+                with job.cond:
+                    while i >= len(job.chunks) and not job.done:
+                        job.cond.wait()
+                    new = job.chunks[i:]
+                    finished = job.done
+                i += len(new)
+                yield from new
+                if finished and i >= len(job.chunks):
+                    break
+            if job.error is not None:
+                raise job.error
+        finally:
+            with job.cond:
+                job.subscribers -= 1
+
+    def result(self):
+        return "".join(self.stream())
+
+class LLMScheduler:
+    def __init__(self, manager=None, workers=WORKERS, queue_max=QUEUE_MAX):
+        self.manager = manager or get_manager()
+        self.queue_max = queue_max
+        self._q = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._inflight = {}   # chiave prompt -> job in coda o in esecuzione
+        self._queued = 0
+        self._running = 0
+        self._merged = 0
+        self._waits = {INTERACTIVE: deque(maxlen=200), BATCH: deque(maxlen=200)}
+        for n in range(workers):
+            threading.Thread(target=self._worker, name=f"llm-worker-{n}", daemon=True).start()
+
+    # --- INVIO ---
+    def submit(self, messages, priority=INTERACTIVE, **options):
+        key = json.dumps([messages, options], sort_keys=True, ensure_ascii=False, default=str)
+        with self._lock:
+            job = self._inflight.get(key)
+            if job is not None:
+                with job.cond:
+                    if not job.done:
+                        job.subscribers += 1
+                        self._merged += 1
+                        # Una chat agganciata a un job batch ancora in coda lo fa salire di priorità
+                        if job.started is None and priority < job.priority:
+                            job.priority = priority
+                            self._q.put((priority, next(self._seq), job))
+                        return Ticket(job, merged=True)
+            if self._queued >= self.queue_max:
+                raise SchedulerBusy(f"coda AI piena ({self.queue_max} richieste in attesa)")
+            job = _Job(key, messages, options, priority)
+            job.subscribers = 1
+            self._inflight[key] = job
+            self._queued += 1
+            self._q.put((priority, next(self._seq), job))
+            return Ticket(job, merged=False)
+
+    def stream(self, messages, priority=INTERACTIVE, **options):
+        yield from self.submit(messages, priority, **options).stream()
+
+    def complete(self, messages, priority=BATCH, **options):
+        return self.submit(messages, priority, **options).result()
+
+    # --- ESECUZIONE ---
+    def _worker(self):
+        while True:
+            _prio, _seq, job = self._q.get()
+            with job.cond:
+                if job.started is not None:
+                    continue  # voce duplicata dopo un cambio di priorità
+                job.started = time.perf_counter()
+                abandoned = job.subscribers <= 0
+            with self._lock:
+                self._queued -= 1
+                self._running += 1
+                self._waits[BATCH if job.priority >= BATCH else INTERACTIVE].append((job.started - job.enqueued) * 1000)
+            try:
+                if not abandoned:
+                    for text in self.manager.stream(job.messages, **job.options):
+                        with job.cond:
+                            job.chunks.append(text)
+                            job.cond.notify_all()
+                            # Nessuno legge più (pagina cambiata): inutile continuare a generare
+                            if job.subscribers <= 0:
+                                break
+            except Exception as e:
+                job.error = e
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    if self._inflight.get(job.key) is job:
+                        del self._inflight[job.key]
+                with job.cond:
+                    job.done = True
+                    job.cond.notify_all()
+
+    # --- METRICHE ---
+    def stats(self):
+        def pct(vals, q):
+            vals = sorted(vals)
+            return round(vals[min(int(q * len(vals)), len(vals) - 1)], 1) if vals else None
+        with self._lock:
+            out = {"queued": self._queued, "running": self._running, "merged": self._merged}
+            for prio, name in ((INTERACTIVE, "interactive"), (BATCH, "batch")):
+                w = list(self._waits[prio])
+                out[f"{name}_wait_p50_ms"] = pct(w, 0.5)
+                out[f"{name}_wait_p90_ms"] = pct(w, 0.9)
+        return out
+
+    def metrics(self):
+        """Metriche del modello (ModelManager) + stato della coda"""
+        return {**self.manager.metrics(), **self.stats()}
+
+    def active_model(self):
+        return self.manager.active_model()
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler():
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = LLMScheduler()
+        return _scheduler
@@ -0,0 +1,227 @@
+"""
+MODEL_MANAGER.PY - Modello Ollama sempre "caldo"
+
+Tutte le app chiamavano ollama.chat(model="mistral-nemo") a freddo: dopo qualche
+minuto di inattività Ollama scarica il modello e il primo messaggio paga il
+caricamento. Il manager:
+
+  - all'avvio dell'app verifica che il modello esista e lo precarica in background
+    (generate con prompt vuoto) con un keep_alive configurabile;
+  - passa keep_alive a ogni chiamata, così il modello resta in memoria;
+  - misura caricamento, tempo al primo token, prompt-eval e token/s;
+  - se il tempo al primo token supera il budget per FALLBACK_AFTER risposte di fila
+    (o il modello principale non c'è) passa al modello di riserva più piccolo, e
+    riprova il principale dopo FALLBACK_COOLDOWN_S.
+
+Configurazione (variabili d'ambiente):
+    OLLAMA_MODEL            modello principale       (default mistral-nemo)
+    OLLAMA_FALLBACK_MODEL   modello di riserva       (default llama3.2:3b, vuoto = nessuno)
+    OLLAMA_KEEP_ALIVE       keep_alive di Ollama     (default 30m, -1 = sempre)
+    OLLAMA_TTFT_BUDGET_S    budget primo token (s)   (default 20)
+
+Uso:
+    from model_manager import get_manager
+    llm = get_manager()            # prima chiamata: parte il preload
+    for text in llm.stream(messages): ...
+    llm.complete(messages)         # risposta intera (estrazioni)
+    llm.metrics()                  # dict per la UI
+"""
+
+import os
+import time
+import itertools
+import threading
+
+MODEL = os.environ.get("OLLAMA_MODEL", "mistral-nemo")
+FALLBACK_MODEL = os.environ.get("OLLAMA_FALLBACK_MODEL", "llama3.2:3b") or None
+KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+TTFT_BUDGET_S = float(os.environ.get("OLLAMA_TTFT_BUDGET_S", "20"))
+FALLBACK_AFTER = 2          # risposte lente di fila prima di passare alla riserva
+FALLBACK_COOLDOWN_S = 600   # dopo quanto si riprova il modello principale
+
+def _field(chunk, name):
+    """Campo di una risposta ollama (dict nelle versioni vecchie, oggetto nelle nuove)"""
+    try:
+        return chunk[name]
+    except (KeyError, TypeError):
+        return getattr(chunk, name, None)
+
+def _keep_alive(value):
+    # "-1" / "300" da env -> numero (secondi), "30m" resta stringa
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
+
+class ModelManager:
+    def __init__(self, model=MODEL, fallback=FALLBACK_MODEL, keep_alive=KEEP_ALIVE, ttft_budget_s=TTFT_BUDGET_S):
+        self.model = model
+        self.fallback = fallback if fallback != model else None
+        self.keep_alive = _keep_alive(keep_alive)
+        self.ttft_budget_s = ttft_budget_s
+        self._lock = threading.Lock()
+        self._preload_thread = None
+        self._slow_streak = 0
+        self._fallback_until = 0.0
+        self.stats = {
+            "available": None,        # modelli installati (None = Ollama non ancora contattato)
+            "loaded": {},             # modello -> ms di caricamento al preload
+            "preload_error": None,
+            "fallback_reason": None,
+            "requests": 0,
+            "last": {},               # metriche dell'ultima risposta
+            "ttft_ms": [],            # ultimi tempi al primo token (per la media)
+        }
+
+    # --- PRELOAD ---
+    def preload_async(self):
+        """Precarica il modello in un thread daemon (una sola volta)"""
+        with self._lock:
+            if self._preload_thread is None:
+                self._preload_thread = threading.Thread(target=self.preload, name="ollama-preload", daemon=True)
+                self._preload_thread.start()
+        return self._preload_thread
+
+    def preload(self):
+        try:
+            import ollama
+            listed = ollama.list()
+            models = _field(listed, "models") or []
+            names = {(_field(m, "model") or _field(m, "name") or "") for m in models}
+            self.stats["available"] = sorted(names)
+            if not self._installed(self.model):
+                self._use_fallback(f"{self.model} non installato")
+            self._warm(self.active_model())
+        except Exception as e:
+            self.stats["preload_error"] = str(e)
+
+    def _warm(self, model):
+        import ollama
+        t0 = time.perf_counter()
+        # Prompt vuoto: Ollama carica il modello senza generare nulla
+        res = ollama.generate(model=model, prompt="", keep_alive=self.keep_alive)
+        load_ns = _field(res, "load_duration")
+        self.stats["loaded"][model] = round(load_ns / 1e6 if load_ns else (time.perf_counter() - t0) * 1000, 1)
+
+    def _installed(self, model):
+        names = self.stats["available"]
+        if names is None:
+            return True  # non sappiamo: proviamo comunque
+        return any(n == model or n.split(":")[0] == model for n in names)
+
+    # --- SCELTA MODELLO ---
+    def active_model(self):
+        if self.fallback and time.time() < self._fallback_until:
+            return self.fallback
+        return self.model
+
+    def _use_fallback(self, reason):
+        if not self.fallback:
+            return
+        self._fallback_until = time.time() + FALLBACK_COOLDOWN_S
+        self.stats["fallback_reason"] = reason
+        if self.fallback not in self.stats["loaded"]:
+            # Carica la riserva subito, senza far aspettare la prossima richiesta
+            threading.Thread(target=self._warm_quietly, args=(self.fallback,), daemon=True).start()
+
+    def _warm_quietly(self, model):
+        try:
+            self._warm(model)
+        except Exception as e:
+            self.stats["preload_error"] = str(e)
+
+    def _observe(self, model, t0, t_first, n_chunks, final):
+        ttft = (t_first - t0) if t_first else None
+        gen_s = time.perf_counter() - (t_first or t0)
+        eval_count = _field(final, "eval_count") if final is not None else None
+        eval_ns = _field(final, "eval_duration") if final is not None else None
+        prompt_ns = _field(final, "prompt_eval_duration") if final is not None else None
+        load_ns = _field(final, "load_duration") if final is not None else None
+        last = {
+            "model": model,
+            "ttft_ms": round(ttft * 1000, 1) if ttft is not None else None,
+            "tokens": eval_count or n_chunks,
+            "tokens_per_s": round(eval_count / (eval_ns / 1e9), 1) if eval_count and eval_ns else
+                            (round(n_chunks / gen_s, 1) if gen_s > 0 and n_chunks else None),
+            "prompt_eval_ms": round(prompt_ns / 1e6, 1) if prompt_ns else None,
+            "load_ms": round(load_ns / 1e6, 1) if load_ns else None,
+        }
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["last"] = last
+            if last["ttft_ms"] is not None:
+                self.stats["ttft_ms"] = (self.stats["ttft_ms"] + [last["ttft_ms"]])[-50:]
+            # Budget di latenza: solo il modello principale può "retrocedere"
+            if model == self.model and ttft is not None:
+                self._slow_streak = self._slow_streak + 1 if ttft > self.ttft_budget_s else 0
+                if self._slow_streak >= FALLBACK_AFTER:
+                    self._slow_streak = 0
+                    self._use_fallback(f"primo token oltre {self.ttft_budget_s:g}s per {FALLBACK_AFTER} risposte")
+        return last
+
+    # --- CHIAMATE ---
+    def stream(self, messages, model=None, **options):
+        """Generatore di pezzi di testo; aggiorna le metriche a fine risposta"""
+        import ollama
+        model = model or self.active_model()
+        t0 = time.perf_counter()
+        t_first, n_chunks, final = None, 0, None
+        try:
+            chunks = iter(ollama.chat(model=model, messages=messages, stream=True, keep_alive=self.keep_alive, **options))
+            # Lo stream è pigro: l'errore del modello mancante arriva solo con il primo pezzo
+            first = next(chunks, None)
+        except Exception as e:
+            # Modello principale mancante: riprova una volta con la riserva
+            if model == self.model and self.fallback and "not found" in str(e).lower():
+                self._use_fallback(f"{self.model} non trovato")
+                yield from self.stream(messages, model=self.fallback, **options)
+                return
+            raise
+        for ch in itertools.chain([first] if first is not None else [], chunks):
+            if t_first is None:
+                t_first = time.perf_counter()
+            n_chunks += 1
+            if _field(ch, "done"):
+                final = ch
+            yield _field(ch, "message")["content"]
+        self._observe(model, t0, t_first, n_chunks, final)
+
+    def complete(self, messages, model=None, **options):
+        """Risposta intera (non in streaming): usata per le estrazioni strutturate"""
+        import ollama
+        model = model or self.active_model()
+        t0 = time.perf_counter()
+        res = ollama.chat(model=model, messages=messages, keep_alive=self.keep_alive, **options)
+        # Senza streaming il primo token non si vede: lo si ricava da caricamento + lettura del prompt
+        # (senza queste durate la chiamata non entra nel TTFT né nel conteggio per la riserva)
+        load_ns = _field(res, "load_duration") or 0
+        prompt_ns = _field(res, "prompt_eval_duration") or 0
+        t_first = t0 + (load_ns + prompt_ns) / 1e9 if load_ns or prompt_ns else None
+        self._observe(model, t0, t_first, 1, res)
+        return _field(res, "message")["content"]
+
+    def metrics(self):
+        ttfts = self.stats["ttft_ms"]
+        return {
+            "model": self.model,
+            "active_model": self.active_model(),
+            "fallback_reason": self.stats["fallback_reason"] if self.active_model() != self.model else None,
+            "installed": self._installed(self.model) if self.stats["available"] is not None else None,
+            "preload_ms": self.stats["loaded"].get(self.active_model()),
+            "preload_error": self.stats["preload_error"],
+            "requests": self.stats["requests"],
+            "avg_ttft_ms": round(sum(ttfts) / len(ttfts), 1) if ttfts else None,
+            **{f"last_{k}": v for k, v in self.stats["last"].items() if k != "model"},
+        }
+
+_manager = None
+_manager_lock = threading.Lock()
+
+def get_manager():
+    """Manager condiviso dal processo; la prima chiamata avvia il preload in background"""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = ModelManager()
+            _manager.preload_async()
+        return _manager
@@ -0,0 +1,172 @@
+"""
+RERUN_PROFILER.PY - Profilazione opzionale dei rerun Streamlit
+
+Ogni interazione riesegue tutto lo script: con RERUN_PROFILE=1 ogni rerun viene
+profilato (cProfile + campionamento dello stack), le statistiche si sommano e
+ogni RERUN_PROFILE_N rerun vengono scritte in RERUN_PROFILE_DIR/<app>/:
+
+    <app>-<ts>.prof       pstats (snakeviz, python -m pstats)
+    <app>-<ts>.folded     stack "collassati" per flamegraph.pl / speedscope
+    <app>-<ts>-top.txt    top-N funzioni per tempo cumulativo e proprio
+
+Uso nello script (subito dopo gli import):
+
+    import rerun_profiler
+    rerun_profiler.begin("prime_os")
+    ...
+    rerun_profiler.end()   # ultima riga (se manca, per st.stop/st.rerun, chiude begin() al giro dopo)
+
+Avvio:
+    RERUN_PROFILE=1 RERUN_PROFILE_N=10 streamlit run Gemini/prime_os.py
+
+Senza RERUN_PROFILE begin()/end() non fanno nulla.
+"""
+
+import os
+import io
+import sys
+import time
+import atexit
+import pstats
+import cProfile
+import threading
+from collections import Counter
+from datetime import datetime
+
+ENABLED = os.environ.get("RERUN_PROFILE", "0") not in ("", "0")
+EVERY_N = int(os.environ.get("RERUN_PROFILE_N", "20"))
+OUT_DIR = os.environ.get("RERUN_PROFILE_DIR", "profiles")
+TOP_N = int(os.environ.get("RERUN_PROFILE_TOP", "30"))
+SAMPLE_INTERVAL = float(os.environ.get("RERUN_PROFILE_INTERVAL_MS", "5")) / 1000
+
+_lock = threading.Lock()
+_current = {}     # thread -> rerun in corso (ogni sessione Streamlit riesegue lo script nel suo thread)
+_apps = {}        # app -> _Aggregate
+
+# --- CAMPIONAMENTO STACK (per il flamegraph) ---
+
+class _Sampler(threading.Thread):
+    """Legge lo stack del thread dello script ogni SAMPLE_INTERVAL e conta gli stack collassati"""
+
+    def __init__(self, thread_id, script_file):
+        super().__init__(name="rerun-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.script_file = script_file
+        self.stacks = Counter()
+        self.last_seen = None  # ultimo campione con lo script in esecuzione
+        self._halt = threading.Event()
+
+    def run(self):
+        while not self._halt.wait(SAMPLE_INTERVAL):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{code.co_firstlineno}")
+                # Sopra lo script ci sono solo gli internals di Streamlit
+                if code.co_filename == self.script_file and code.co_name == "<module>":
+                    self.stacks[";".join(reversed(names))] += 1
+                    self.last_seen = time.perf_counter()
+                    break
+                frame = frame.f_back
+
+    def stop(self):
+        self._halt.set()
+        self.join(timeout=1)
+
+# --- AGGREGAZIONE ---
+
+class _Aggregate:
+    def __init__(self, app):
+        self.app = app
+        self.stats = None
+        self.stacks = Counter()
+        self.reruns = 0
+        self.wall_ms = []
+
+    def add(self, prof, stacks, wall_ms):
+        if self.stats is None:
+            self.stats = pstats.Stats(prof)
+        else:
+            self.stats.add(prof)
+        self.stacks.update(stacks)
+        self.reruns += 1
+        self.wall_ms.append(wall_ms)
+
+    def dump(self):
+        folder = os.path.join(OUT_DIR, self.app)
+        os.makedirs(folder, exist_ok=True)
+        base = os.path.join(folder, f"{self.app}-{datetime.now().strftime('%Y%m%d-%H%M%S')}")
+
+        self.stats.dump_stats(base + ".prof")
+        with open(base + ".folded", "w", encoding="utf-8") as f:
+            for stack, n in self.stacks.most_common():
+                f.write(f"{stack} {n}\n")
+
+        walls = sorted(self.wall_ms)
+        buf = io.StringIO()
+        buf.write(f"{self.app}: {self.reruns} rerun | mediana {walls[len(walls) // 2]:.1f} ms | max {walls[-1]:.1f} ms\n\n")
+        for key, title in (("cumulative", "TEMPO CUMULATIVO"), ("tottime", "TEMPO PROPRIO")):
+            buf.write(f"=== TOP {TOP_N} PER {title} ===\n")
+            pstats.Stats(base + ".prof", stream=buf).sort_stats(key).print_stats(TOP_N)
+        with open(base + "-top.txt", "w", encoding="utf-8") as f:
+            f.write(buf.getvalue())
+        print(f"[rerun_profiler] {self.reruns} rerun di {self.app} -> {base}.*")
+        return base
+
+# --- API ---
+
+def _finish(run, ended=True):
+    prof, sampler, app, t0 = run
+    prof.disable()
+    sampler.stop()
+    # Rerun interrotto (st.stop / st.rerun / eccezione): la durata arriva fino all'ultimo campione utile
+    t1 = time.perf_counter() if ended else (sampler.last_seen or t0)
+    agg = _apps.setdefault(app, _Aggregate(app))
+    agg.add(prof, sampler.stacks, (t1 - t0) * 1000)
+    if agg.reruns >= EVERY_N:
+        agg.dump()
+        _apps[app] = _Aggregate(app)
+
+def _close_stale(ident=None):
+    """Chiude i rerun rimasti aperti nel thread `ident` e in quelli già terminati (chiamare con _lock)"""
+    alive = {t.ident for t in threading.enumerate()}
+    for tid in [t for t in _current if t == ident or t not in alive]:
+        _finish(_current.pop(tid), ended=False)
+
+def begin(app):
+    """Inizio rerun: chiude l'eventuale rerun precedente rimasto aperto e avvia il profiler"""
+    if not ENABLED:
+        return
+    ident = threading.get_ident()
+    with _lock:
+        _close_stale(ident)
+        script_file = sys._getframe(1).f_code.co_filename
+        sampler = _Sampler(ident, script_file)
+        prof = cProfile.Profile()
+        _current[ident] = (prof, sampler, app, time.perf_counter())
+        sampler.start()
+        prof.enable()
+
+def end():
+    """Fine rerun (ultima riga dello script)"""
+    if not ENABLED:
+        return
+    with _lock:
+        run = _current.pop(threading.get_ident(), None)
+        if run is not None:
+            _finish(run)
+
+def flush():
+    """Scrive subito i rerun accumulati (anche se meno di RERUN_PROFILE_N)"""
+    end()
+    with _lock:
+        _close_stale()
+        for app, agg in list(_apps.items()):
+            if agg.reruns:
+                agg.dump()
+                _apps[app] = _Aggregate(app)
+
+if ENABLED:
+    # Alla chiusura del server scrive anche gli ultimi rerun (meno di N)
+    atexit.register(flush)
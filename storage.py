@@ -0,0 +1,333 @@
+"""
+STORAGE.PY - Schema unico e versionato dei DB delle app (con migrazioni)
+
+`campaigns` esisteva in tre versioni (database.py senza status/roas,
+yangkidd_pro con ctr/notes, prime_os con `date` al posto di start_date) e il
+CREATE TABLE IF NOT EXISTS di campaign_logic.save_campaign non cambiava nulla
+su un DB già creato: le query su colonne mancanti fallivano e finivano in
+`except: return pd.DataFrame()`. Qui:
+
+  - TABLES: lo schema comune (campaigns, social_stats, knowledge_base,
+    api_credentials, competitors, upload_logs, posts_*, table_versions), uguale
+    in enterprise_os.db, yangkidd_pro.db, yangkidd_marketing.db e negli shard
+    dei workspace;
+  - MIGRATIONS: passi numerati, la versione raggiunta sta in PRAGMA user_version.
+    Il passo 1 porta qualunque DB esistente allo schema comune (ALTER delle
+    colonne mancanti, start_date da `date`, roas/status dove mancano);
+  - connect(path): connessione dal pool di workspace, con le migrazioni
+    mancanti applicate prima di restituirla;
+  - funzioni di repository con SQL fisso e parametri: lo statement preparato
+    resta nella cache di sqlite3 della connessione (che il pool riusa);
+  - cached_read(db, sql, tables): SELECT servite dalla memoria finché le tabelle
+    non cambiano (table_versions, incrementata da ogni scrittura), in una LRU
+    di READ_CACHE_MAX_ENTRIES risultati condivisa da tutte le app.
+
+Le tabelle di un solo modulo restano lì: chat_history/chat_sessions (chat_store),
+perf_events (perf_trace), meta_cube, knowledge_passages, campaign_kpis (prime_os).
+
+    import storage
+    conn = storage.connect(db)
+    storage.add_campaign(conn, storage.Campaign("Lancio", "Instagram", spend=120, revenue=300))
+    conn.commit(); conn.close()
+"""
+
+import os
+import argparse
+import threading
+from collections import OrderedDict
+from typing import NamedTuple, Optional, get_args
+
+import pandas as pd
+
+import knowledge_codec
+from workspace import connect as _pool_connect
+
+READ_CACHE_MAX_ENTRIES = int(os.environ.get("READ_CACHE_MAX_ENTRIES", "256"))
+
+# --- SCHEMA ---
+
+class Campaign(NamedTuple):
+    """Riga di campaigns (senza id); roas None = revenue / spend"""
+    name: str
+    platform: str
+    status: str = "Active"
+    budget: float = 0.0
+    spend: float = 0.0
+    revenue: float = 0.0
+    roas: Optional[float] = None
+    impressions: int = 0
+    clicks: int = 0
+    ctr: Optional[float] = None
+    streams: int = 0
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+    notes: Optional[str] = None
+
+_SQL_TYPES = {str: "TEXT", float: "REAL", int: "INTEGER"}
+
+def _columns(record):
+    """Colonne SQL di una NamedTuple: [(nome, tipo)]"""
+    out = []
+    for name, hint in record.__annotations__.items():
+        hint = next((a for a in get_args(hint) if a is not type(None)), hint)   # Optional[x] -> x
+        out.append((name, _SQL_TYPES[hint]))
+    return out
+
+CAMPAIGN_COLUMNS = _columns(Campaign)
+
+TABLES = {
+    "campaigns": [("id", "INTEGER PRIMARY KEY AUTOINCREMENT")] + CAMPAIGN_COLUMNS,
+    "social_stats": [("id", "INTEGER PRIMARY KEY AUTOINCREMENT"), ("platform", "TEXT"), ("metric_type", "TEXT"),
+                     ("value", "REAL"), ("date_recorded", "DATE"), ("source_type", "TEXT")],
+    # content: BLOB zlib (knowledge_codec); orig_len/preview in chiaro per le liste
+    "knowledge_base": [("id", "INTEGER PRIMARY KEY AUTOINCREMENT"), ("source", "TEXT"), ("content", "TEXT"),
+                       ("timestamp", "TIMESTAMP DEFAULT CURRENT_TIMESTAMP"), ("orig_len", "INTEGER"), ("preview", "TEXT")],
+    "api_credentials": [("id", "INTEGER PRIMARY KEY AUTOINCREMENT"), ("platform", "TEXT UNIQUE"), ("client_id", "TEXT"),
+                        ("client_secret", "TEXT"), ("access_token", "TEXT"), ("refresh_token", "TEXT"), ("expires_at", "TEXT")],
+    "competitors": [("id", "INTEGER PRIMARY KEY"), ("name", "TEXT"), ("platform", "TEXT"), ("followers", "TEXT"),
+                    ("sentiment", "TEXT"), ("last_check", "TEXT")],
+    "upload_logs": [("id", "INTEGER PRIMARY KEY AUTOINCREMENT"), ("filename", "TEXT"), ("platform", "TEXT"),
+                    ("upload_date", "TIMESTAMP DEFAULT CURRENT_TIMESTAMP"), ("status", "TEXT")],
+    "posts_inventory": [("post_id", "TEXT PRIMARY KEY"), ("platform", "TEXT"), ("date_published", "DATE"), ("caption", "TEXT"),
+                        ("link", "TEXT"), ("content_type", "TEXT"), ("duration", "INTEGER")],
+    "posts_performance": [("id", "INTEGER PRIMARY KEY AUTOINCREMENT"), ("post_id", "TEXT"), ("date_recorded", "DATE"),
+                          ("views", "INTEGER"), ("likes", "INTEGER"), ("comments", "INTEGER"), ("shares", "INTEGER")],
+    "table_versions": [("table_name", "TEXT PRIMARY KEY"), ("version", "INTEGER")],
+}
+
+# --- MIGRAZIONI ---
+
+def _table_columns(conn, table):
+    return [r[1] for r in conn.execute(f"PRAGMA table_info({table})")]
+
+def _v1_common_schema(conn):
+    for table, cols in TABLES.items():
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ({', '.join(f'{n} {t}' for n, t in cols)})")
+        have = _table_columns(conn, table)
+        for name, sql_type in cols:
+            # ALTER non accetta PRIMARY KEY/UNIQUE né default non costanti: solo colonne dati
+            if name not in have and " " not in sql_type:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {sql_type}")
+    # prime_os salvava la data della campagna in `date`
+    if "date" in _table_columns(conn, "campaigns"):
+        conn.execute("UPDATE campaigns SET start_date = date WHERE start_date IS NULL")
+    conn.execute("UPDATE campaigns SET status = 'Active' WHERE status IS NULL")
+    conn.execute("UPDATE campaigns SET roas = revenue / spend WHERE roas IS NULL AND spend > 0")
+    # Chiave unica (name, platform) dei competitor per l'upsert: prima via i doppioni storici
+    conn.execute("DELETE FROM competitors WHERE id NOT IN (SELECT MAX(id) FROM competitors GROUP BY name, platform)")
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_competitors_name_platform ON competitors(name, platform)")
+
+def _v2_social_stats_key(conn):
+    # Ogni upsert cancella per (piattaforma, metrica, giorno): senza indice è una scansione per riga
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_social_stats_key ON social_stats (platform, metric_type, date_recorded)")
+
+def _v3_knowledge_compressed(conn):
+    have = _table_columns(conn, "knowledge_base")
+    for name, sql_type in (("orig_len", "INTEGER"), ("preview", "TEXT")):
+        if name not in have:
+            conn.execute(f"ALTER TABLE knowledge_base ADD COLUMN {name} {sql_type}")
+    return knowledge_codec.migrate(conn, commit=False) > 0
+
+MIGRATIONS = [
+    (1, "schema comune (campaigns unificata, competitors con chiave unica)", _v1_common_schema),
+    (2, "indice (platform, metric_type, date_recorded) su social_stats", _v2_social_stats_key),
+    (3, "knowledge_base compressa (orig_len, preview)", _v3_knowledge_compressed),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(conn):
+    """
+    Applica le migrazioni mancanti in una transazione (BEGIN IMMEDIATE: due
+    processi non migrano lo stesso file insieme). Ritorna la versione finale.
+    `conn` non deve avere una transazione aperta.
+    """
+    current = schema_version(conn)
+    if current >= SCHEMA_VERSION:
+        return current
+    conn.execute("BEGIN IMMEDIATE")
+    vacuum = False
+    try:
+        current = schema_version(conn)   # riletta dentro il lock
+        for version, _desc, step in MIGRATIONS:
+            if version > current:
+                # Un passo che ritorna True ha liberato pagine (es. compressione): VACUUM a fine migrazione
+                vacuum = bool(step(conn)) or vacuum
+                conn.execute(f"PRAGMA user_version = {version}")
+                current = version
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    if vacuum:
+        conn.execute("VACUUM")
+    return current
+
+def connect(path):
+    """
+    Connessione (pool di workspace) a un DB con lo schema comune aggiornato.
+    Con lo schema già all'ultima versione il costo è una PRAGMA user_version.
+    """
+    conn = _pool_connect(path)
+    migrate(conn)
+    return conn
+
+# --- REPOSITORY ---
+# SQL fisso e parametri: stesso testo = statement preparato riusato dalla connessione.
+# Le scritture avvengono nella transazione di `conn` (commit del chiamante) e
+# aggiornano table_versions per invalidare le letture in cache.
+
+def bump_table_version(conn, *tables):
+    conn.executemany("INSERT INTO table_versions (table_name, version) VALUES (?, 1) "
+                     "ON CONFLICT(table_name) DO UPDATE SET version = version + 1", [(t,) for t in tables])
+
+_INSERT_CAMPAIGN = (f"INSERT INTO campaigns ({', '.join(n for n, _ in CAMPAIGN_COLUMNS)}) "
+                    f"VALUES ({', '.join('?' * len(CAMPAIGN_COLUMNS))})")
+
+def add_campaign(conn, campaign):
+    """Campaign -> id della riga inserita"""
+    if campaign.roas is None:
+        campaign = campaign._replace(roas=campaign.revenue / campaign.spend if campaign.spend > 0 else 0.0)
+    cur = conn.execute(_INSERT_CAMPAIGN, campaign)
+    bump_table_version(conn, "campaigns")
+    return cur.lastrowid
+
+_DELETE_STAT = "DELETE FROM social_stats WHERE platform=? AND metric_type=? AND date_recorded=?"
+_INSERT_STAT = "INSERT INTO social_stats (platform, metric_type, value, date_recorded, source_type) VALUES (?,?,?,?,?)"
+
+def replace_social_stats(conn, rows, source_type):
+    """
+    rows: [(platform, metric_type, date_recorded, value)]. Un valore per
+    (piattaforma, metrica, giorno): quello già salvato viene sostituito. Ritorna le righe scritte.
+    """
+    latest = {(p, m, d): float(v) for p, m, d, v in rows}   # stesso giorno ripetuto: vince l'ultimo
+    if not latest:
+        return 0
+    conn.executemany(_DELETE_STAT, latest)
+    conn.executemany(_INSERT_STAT, [(p, m, v, d, source_type) for (p, m, d), v in latest.items()])
+    bump_table_version(conn, "social_stats")
+    return len(latest)
+
+def delete_social_stat(conn, stat_id):
+    conn.execute("DELETE FROM social_stats WHERE id=?", (stat_id,))
+    bump_table_version(conn, "social_stats")
+
+def clear_social_stats(conn):
+    conn.execute("DELETE FROM social_stats")
+    bump_table_version(conn, "social_stats")
+
+def add_knowledge(conn, source, content):
+    """Contenuto compresso (knowledge_codec.pack) con lunghezza e anteprima"""
+    cur = conn.execute("INSERT INTO knowledge_base (source, content, orig_len, preview) VALUES (?, ?, ?, ?)",
+                       (source, *knowledge_codec.pack(content)))
+    bump_table_version(conn, "knowledge_base")
+    return cur.lastrowid
+
+def has_knowledge_source(conn, source):
+    return conn.execute("SELECT 1 FROM knowledge_base WHERE source=? LIMIT 1", (source,)).fetchone() is not None
+
+def save_competitor(conn, name, platform, followers, sentiment, last_check):
+    """Upsert sulla chiave unica (name, platform): un controllo nuovo sostituisce il precedente"""
+    conn.execute("""INSERT INTO competitors (name, platform, followers, sentiment, last_check) VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT(name, platform) DO UPDATE SET
+                       followers = excluded.followers, sentiment = excluded.sentiment, last_check = excluded.last_check""",
+                 (name, platform, followers, sentiment, last_check))
+    bump_table_version(conn, "competitors")
+
+def get_credentials(conn, platform):
+    """(client_id, client_secret, access_token), (None, None, None) se la piattaforma non è configurata"""
+    row = conn.execute("SELECT client_id, client_secret, access_token FROM api_credentials WHERE platform=?", (platform,)).fetchone()
+    return row if row else (None, None, None)
+
+def save_credentials(conn, platform, client_id, client_secret):
+    conn.execute("INSERT OR REPLACE INTO api_credentials (platform, client_id, client_secret) VALUES (?, ?, ?)",
+                 (platform, client_id, client_secret))
+
+def set_access_token(conn, platform, token):
+    conn.execute("UPDATE api_credentials SET access_token=? WHERE platform=?", (token, platform))
+
+def log_upload(conn, filename, platform, status):
+    conn.execute("INSERT INTO upload_logs (filename, platform, status) VALUES (?, ?, ?)", (filename, platform, status))
+
+def last_upload(conn, filename, platform):
+    """Data dell'ultimo caricamento riuscito del file (None se mai caricato)"""
+    row = conn.execute("SELECT upload_date FROM upload_logs WHERE filename=? AND platform=? AND status LIKE '%OK%' "
+                       "ORDER BY id DESC LIMIT 1", (filename, platform)).fetchone()
+    return row[0] if row else None
+
+# --- CACHE LETTURE (query + versioni delle tabelle) ---
+
+class ReadCache:
+    """(db, sql, params) -> (versioni delle tabelle, DataFrame); LRU di max_entries risultati"""
+    def __init__(self, max_entries=READ_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, versions):
+        with self._lock:
+            hit = self._lru.get(key)
+            if hit is None or hit[0] != versions:
+                return None
+            self._lru.move_to_end(key)
+            return hit[1]
+
+    def put(self, key, versions, df):
+        with self._lock:
+            self._lru[key] = (versions, df)
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._lru.clear()
+
+    def __len__(self):
+        return len(self._lru)
+
+_read_cache = ReadCache()
+
+def table_versions(conn, tables):
+    marks = ",".join("?" * len(tables))
+    rows = dict(conn.execute(f"SELECT table_name, version FROM table_versions WHERE table_name IN ({marks})",
+                             tuple(tables)).fetchall())
+    return tuple(rows.get(t, 0) for t in tables)
+
+def cached_read(db, sql, tables, params=()):
+    """
+    SELECT su `db` servita dalla memoria finché nessuna delle `tables` viene
+    modificata. Le versioni stanno nel DB, così anche le scritture di altri
+    processi (es. ingest_watcher) invalidano la cache. Ogni chiamata riceve una
+    copia del DataFrame.
+    """
+    params = tuple(params)
+    conn = connect(db)
+    try:
+        versions = table_versions(conn, tables)
+        key = (os.path.abspath(db), sql, params)
+        df = _read_cache.get(key, versions)
+        if df is None:
+            df = pd.read_sql_query(sql, conn, params=params)
+            _read_cache.put(key, versions, df)
+        return df.copy()
+    finally:
+        conn.close()
+
+def clear_read_cache():
+    _read_cache.clear()
+
+# --- CLI ---
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Versione dello schema e migrazioni di un DB")
+    ap.add_argument("db", nargs="+")
+    args = ap.parse_args()
+    for path in args.db:
+        conn = _pool_connect(path)
+        before = schema_version(conn)
+        after = migrate(conn)
+        conn.close()
+        print(f"{path}: versione {before} -> {after}" if after != before else f"{path}: versione {after} (aggiornato)")
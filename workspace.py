@@ -0,0 +1,262 @@
+"""
+WORKSPACE.PY - Un artista, un workspace: shard SQLite per artista
+
+Tutto era cablato su un solo artista (Spotify cercava "YangKidd", ogni app il suo
+unico file .db). Qui ogni artista ha la sua cartella con i suoi DB:
+
+    workspaces/<slug>/workspace.json       nome dell'artista
+    workspaces/<slug>/enterprise_os.db     (e yangkidd_pro.db, yangkidd_chat.db, ...)
+
+(workspaces/ è nella root del repo, qualunque sia la cartella da cui si lancia l'app.)
+
+L'artista storico (LEGACY_ARTIST) resta sui file di sempre nella cartella di
+lavoro: nessuna migrazione. ARTIST (variabile d'ambiente) sceglie l'artista di
+default delle app, WORKSPACES_DIR la cartella dei workspace.
+
+  - connect(path): connessioni da un pool LRU limitato (MAX_IDLE_CONNECTIONS
+    inattive in tutto, tra tutti gli shard; quelle in uso non hanno limite). conn.close() rimette la connessione
+    nel pool (con rollback di una transazione lasciata aperta); quella usata meno
+    di recente viene chiusa davvero quando il pool è pieno. Gli shard di altri
+    artisti non entrano mai nelle query di un artista: aggiungere artisti non le
+    rallenta.
+  - rollup(db_file, sql): la stessa query su tutti gli artisti, in una
+    connessione a parte che fa ATTACH degli shard (in sola lettura, a gruppi
+    sotto il limite di SQLite) e li unisce con UNION ALL + colonna "artist".
+
+    import workspace
+    ws = workspace.get("Altro Artista")
+    conn = ws.connect("enterprise_os.db"); ...; conn.close()   # torna nel pool
+    workspace.rollup("enterprise_os.db", "SELECT platform, SUM(value) AS value FROM {db}.social_stats GROUP BY platform")
+"""
+
+import os
+import re
+import json
+import sqlite3
+import argparse
+import threading
+import unicodedata
+from collections import OrderedDict
+from urllib.request import pathname2url
+
+import pandas as pd
+
+LEGACY_ARTIST = "YangKidd"
+DEFAULT_ARTIST = os.environ.get("ARTIST", LEGACY_ARTIST)
+WORKSPACES_DIR = os.environ.get("WORKSPACES_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "workspaces"))
+MAX_IDLE_CONNECTIONS = int(os.environ.get("MAX_IDLE_CONNECTIONS", "16"))
+ATTACH_BATCH = 8        # SQLite permette 10 ATTACH per connessione (SQLITE_MAX_ATTACHED)
+
+_SLUG_RE = re.compile(r"[^a-z0-9]+")
+
+def slugify(name):
+    """'Yang Kidd!' -> 'yang-kidd' (nome della cartella del workspace)"""
+    ascii_name = unicodedata.normalize("NFKD", str(name)).encode("ascii", "ignore").decode("ascii")
+    return _SLUG_RE.sub("-", ascii_name.lower()).strip("-") or "artist"
+
+# --- POOL DI CONNESSIONI ---
+
+class _PooledConnection(sqlite3.Connection):
+    """close() rimette la connessione nel pool invece di chiuderla"""
+    _pool_path = None
+
+    def close(self):
+        if self._pool_path is None:
+            super().close()
+        else:
+            _pool.release(self)
+
+    def _close(self):
+        super().close()
+
+class ConnectionPool:
+    def __init__(self, max_idle=MAX_IDLE_CONNECTIONS):
+        self.max_idle = max_idle
+        self._idle = OrderedDict()   # path assoluto -> [connessioni inattive]; ultimo = usato più di recente
+        self._count = 0
+        self._lock = threading.Lock()
+        self.stats = {"opened": 0, "reused": 0, "evicted": 0}
+
+    def acquire(self, path):
+        key = os.path.abspath(path)
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                conn = idle.pop()
+                self._count -= 1
+                if not idle:
+                    del self._idle[key]
+                self.stats["reused"] += 1
+                return conn
+            self.stats["opened"] += 1
+        conn = sqlite3.connect(key, check_same_thread=False, factory=_PooledConnection)
+        conn._pool_path = key
+        return conn
+
+    def release(self, conn):
+        try:
+            if conn.in_transaction:
+                conn.rollback()   # come la close() di sqlite3: le modifiche non committate si perdono
+            conn.row_factory = None
+        except sqlite3.Error:
+            conn._close()
+            return
+        evicted = []
+        with self._lock:
+            self._idle.setdefault(conn._pool_path, []).append(conn)
+            self._idle.move_to_end(conn._pool_path)
+            self._count += 1
+            while self._count > self.max_idle:
+                path, idle = next(iter(self._idle.items()))
+                evicted.append(idle.pop(0))
+                self._count -= 1
+                if not idle:
+                    del self._idle[path]
+            self.stats["evicted"] += len(evicted)
+        for old in evicted:
+            old._close()
+
+    def close_all(self, path=None):
+        """Chiude le connessioni inattive (di un solo DB se `path`), es. prima di cancellare il file"""
+        with self._lock:
+            keys = [os.path.abspath(path)] if path else list(self._idle)
+            conns = [c for k in keys for c in self._idle.pop(k, [])]
+            self._count -= len(conns)
+        for c in conns:
+            c._close()
+
+    def idle(self):
+        with self._lock:
+            return self._count
+
+_pool = ConnectionPool()
+
+def connect(path):
+    """Connessione SQLite dal pool (stesse opzioni di prima: check_same_thread=False)"""
+    if path == ":memory:" or str(path).startswith("file:"):
+        return sqlite3.connect(path, check_same_thread=False)
+    return _pool.acquire(path)
+
+def pool_stats():
+    return dict(_pool.stats, idle=_pool.idle())
+
+# --- WORKSPACE ---
+
+class Workspace:
+    def __init__(self, name):
+        self.name = name
+        self.slug = slugify(name)
+        self.legacy = self.slug == slugify(LEGACY_ARTIST)
+        self.dir = "" if self.legacy else os.path.join(WORKSPACES_DIR, self.slug)
+
+    def path(self, db_file, create=True):
+        """Percorso dello shard `db_file` per questo artista (la cartella viene creata al primo uso)"""
+        if self.legacy:
+            return db_file
+        if create and not os.path.isdir(self.dir):
+            os.makedirs(self.dir, exist_ok=True)
+            with open(os.path.join(self.dir, "workspace.json"), "w", encoding="utf-8") as f:
+                json.dump({"name": self.name}, f, ensure_ascii=False)
+        return os.path.join(self.dir, db_file)
+
+    def connect(self, db_file):
+        return connect(self.path(db_file))
+
+    def __repr__(self):
+        return f"Workspace({self.name!r})"
+
+_workspaces = {}
+
+def get(name=None):
+    """Workspace dell'artista (default: ARTIST); lo stesso oggetto per nomi con lo stesso slug"""
+    name = (name or DEFAULT_ARTIST).strip()
+    slug = slugify(name)
+    if slug not in _workspaces:
+        _workspaces[slug] = Workspace(name)
+    return _workspaces[slug]
+
+def create(name):
+    ws = get(name)
+    ws.path("")   # crea cartella e workspace.json
+    return ws
+
+def artists():
+    """Nomi degli artisti: lo storico, quello di default e quelli con una cartella in WORKSPACES_DIR"""
+    names = {slugify(LEGACY_ARTIST): LEGACY_ARTIST, slugify(DEFAULT_ARTIST): DEFAULT_ARTIST}
+    if os.path.isdir(WORKSPACES_DIR):
+        for slug in sorted(os.listdir(WORKSPACES_DIR)):
+            try:
+                with open(os.path.join(WORKSPACES_DIR, slug, "workspace.json"), encoding="utf-8") as f:
+                    names.setdefault(slug, json.load(f)["name"])
+            except (OSError, ValueError, KeyError):
+                continue
+    return list(names.values())
+
+# --- ROLLUP TRA ARTISTI ---
+
+def _attach_uri(path):
+    return "file:" + pathname2url(os.path.abspath(path)) + "?mode=ro"
+
+def rollup(db_file, sql, names=None, params=()):
+    """
+    `sql` su ogni shard `db_file`, con {db} al posto dello schema
+    ("SELECT ... FROM {db}.social_stats ..."): DataFrame con una colonna "artist"
+    in testa. Gli shard che non esistono o non hanno la tabella vengono saltati.
+    I totali tra artisti si fanno sul risultato (groupby): ogni gruppo di ATTACH
+    resta una query separata.
+    """
+    shards = [(ws.name, ws.path(db_file, create=False)) for ws in map(get, names or artists())]
+    shards = [(name, path) for name, path in shards if os.path.exists(path)]
+    frames = []
+    conn = sqlite3.connect(":memory:", uri=True)
+    try:
+        for i in range(0, len(shards), ATTACH_BATCH):
+            batch = shards[i:i + ATTACH_BATCH]
+            aliases = []
+            for j, (name, path) in enumerate(batch):
+                alias = f"a{j}"
+                conn.execute("ATTACH DATABASE ? AS " + alias, (_attach_uri(path),))
+                aliases.append((name, alias))
+            try:
+                parts, args = [], []
+                for name, alias in aliases:
+                    part = f"SELECT ? AS artist, * FROM ({sql.format(db=alias)})"
+                    try:
+                        conn.execute(f"EXPLAIN {part}", (name, *params))   # tabella mancante: shard saltato
+                    except sqlite3.OperationalError:
+                        continue
+                    parts.append(part)
+                    args += [name, *params]
+                if parts:
+                    frames.append(pd.read_sql_query(" UNION ALL ".join(parts), conn, params=tuple(args)))
+            finally:
+                for _, alias in aliases:
+                    conn.execute("DETACH DATABASE " + alias)
+    finally:
+        conn.close()
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return pd.DataFrame(columns=["artist"])
+    return pd.concat(frames, ignore_index=True)
+
+# --- CLI ---
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Workspace per artista: elenco, creazione, query su tutti gli shard")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("list")
+    p_new = sub.add_parser("create")
+    p_new.add_argument("name")
+    p_roll = sub.add_parser("rollup")
+    p_roll.add_argument("db_file", help="es. enterprise_os.db")
+    p_roll.add_argument("sql", help="query con {db} al posto dello schema")
+    args = ap.parse_args()
+
+    if args.cmd == "list":
+        for name in artists():
+            ws = get(name)
+            print(f"{name:<24} {ws.dir or '.'}")
+    elif args.cmd == "create":
+        print(create(args.name).dir)
+    else:
+        print(rollup(args.db_file, args.sql).to_string(index=False))
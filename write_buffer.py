@@ -0,0 +1,174 @@
+"""
+WRITE_BUFFER.PY - Scritture SQLite raggruppate (write-behind)
+
+Ogni messaggio di chat ed ogni evento di tracing apriva una connessione, faceva
+un INSERT e un commit: un fsync per riga. Il buffer accoda le INSERT in memoria e
+le scrive tutte in una sola transazione quando:
+
+  - sono passati FLUSH_INTERVAL_S dall'ultima scrittura (thread daemon),
+  - in coda ci sono MAX_ITEMS righe,
+  - qualcuno chiama flush() (prima di leggere: read-your-writes) o il processo esce.
+
+Crash-safety: il DB passa in WAL e la connessione del buffer usa
+synchronous=FULL (WRITE_BUFFER_SYNC=normal per NORMAL): una volta che flush()
+ritorna, il batch è su disco. Quello che è ancora in coda (al massimo
+FLUSH_INTERVAL_S di dati) si perde solo se il processo muore di colpo.
+Una riga che fallisce non blocca le altre: il batch viene riprovato riga per riga
+e quella sbagliata scartata (con un messaggio).
+
+    from write_buffer import get_buffer
+    buf = get_buffer("yangkidd_pro.db")
+    buf.add("INSERT INTO chat_history (session_id, role, content) VALUES (?,?,?)", (sid, role, text))
+    buf.flush()   # prima di una SELECT che deve vedere le righe appena accodate
+"""
+
+import os
+import time
+import atexit
+import sqlite3
+import threading
+from itertools import groupby
+
+FLUSH_INTERVAL_S = float(os.environ.get("WRITE_BUFFER_INTERVAL_S", "0.5"))
+MAX_ITEMS = int(os.environ.get("WRITE_BUFFER_MAX_ITEMS", "200"))
+SYNC = os.environ.get("WRITE_BUFFER_SYNC", "full").upper()
+
+class WriteBuffer:
+    def __init__(self, db_path, interval_s=FLUSH_INTERVAL_S, max_items=MAX_ITEMS, sync=SYNC):
+        self.db_path = db_path
+        self.interval_s = interval_s
+        self.max_items = max_items
+        self.sync = sync if sync in ("FULL", "NORMAL", "EXTRA") else "FULL"
+        self._items = []
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()   # una sola transazione alla volta sulla connessione
+        self._conn = None
+        self._thread = None
+        self._closed = False
+        self.stats = {"flushes": 0, "rows": 0, "dropped": 0, "last_flush_ms": None, "last_error": None}
+
+    # --- CODA ---
+    def add(self, sql, params=()):
+        self.add_many(sql, [params])
+
+    def add_many(self, sql, rows):
+        rows = [tuple(r) for r in rows]
+        if not rows:
+            return
+        with self._cond:
+            self._items.extend((sql, r) for r in rows)
+            if len(self._items) >= self.max_items:
+                self._cond.notify()
+        self._start()
+
+    def pending(self):
+        with self._cond:
+            return len(self._items)
+
+    # --- SCRITTURA ---
+    def _connection(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=10)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(f"PRAGMA synchronous={self.sync}")
+        return self._conn
+
+    def flush(self):
+        """Scrive tutto quello che è in coda in una transazione; ritorna le righe scritte"""
+        with self._write_lock:
+            with self._cond:
+                items, self._items = self._items, []
+            if not items:
+                return 0
+            t0 = time.perf_counter()
+            conn = self._connection()
+            try:
+                with conn:
+                    # INSERT consecutive uguali -> un solo executemany
+                    for sql, group in groupby(items, key=lambda it: it[0]):
+                        conn.executemany(sql, [p for _, p in group])
+            except sqlite3.OperationalError as e:
+                if "locked" in str(e) or "busy" in str(e):
+                    # DB occupato da un altro processo: si rimette tutto in testa e si riprova al prossimo giro
+                    with self._cond:
+                        self._items = items + self._items
+                    self.stats["last_error"] = str(e)
+                    return 0
+                self._write_one_by_one(conn, items)
+            except sqlite3.Error:
+                self._write_one_by_one(conn, items)
+            self.stats["flushes"] += 1
+            self.stats["rows"] += len(items)
+            self.stats["last_flush_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+            return len(items)
+
+    def _write_one_by_one(self, conn, items):
+        with conn:
+            for sql, params in items:
+                try:
+                    conn.execute(sql, params)
+                except sqlite3.Error as e:
+                    self.stats["dropped"] += 1
+                    self.stats["last_error"] = str(e)
+                    print(f"write_buffer: riga scartata su {self.db_path} ({e}): {sql[:80]}")
+
+    # --- THREAD ---
+    def _start(self):
+        if self._thread is None:
+            with self._cond:
+                if self._thread is None and not self._closed:
+                    self._thread = threading.Thread(target=self._run, name=f"write-buffer-{os.path.basename(self.db_path)}", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while not self._closed:
+            with self._cond:
+                self._cond.wait_for(lambda: len(self._items) >= self.max_items or self._closed, timeout=self.interval_s)
+            try:
+                self.flush()
+            except Exception as e:
+                self.stats["last_error"] = str(e)
+
+    def close(self):
+        self._closed = True
+        with self._cond:
+            self._cond.notify()
+        self.flush()
+        with self._write_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+_buffers = {}
+_buffers_lock = threading.Lock()
+
+def get_buffer(db_path):
+    """Un buffer (e una connessione di scrittura) per file di DB e per processo"""
+    key = os.path.abspath(db_path)
+    with _buffers_lock:
+        if key not in _buffers:
+            _buffers[key] = WriteBuffer(db_path)
+        return _buffers[key]
+
+def flush_all():
+    with _buffers_lock:
+        buffers = list(_buffers.values())
+    for b in buffers:
+        try:
+            b.flush()
+        except Exception as e:
+            print(f"write_buffer: flush di {b.db_path} fallito ({e})")
+
+def close_all():
+    """Flush + chiusura: l'ultima connessione chiusa fa il checkpoint e rimuove -wal/-shm"""
+    with _buffers_lock:
+        buffers = list(_buffers.values())
+        _buffers.clear()
+    for b in buffers:
+        try:
+            b.close()
+        except Exception as e:
+            print(f"write_buffer: chiusura di {b.db_path} fallita ({e})")
+
+# Fine del processo (Ctrl+C su streamlit run): niente righe lasciate in coda
+atexit.register(close_all)
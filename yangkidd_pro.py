@@ -1,19 +1,25 @@
 import streamlit as st
-import ollama
 import pandas as pd
-import sqlite3
-import plotly.express as px
 from datetime import datetime
-import requests
-from urllib.parse import urlencode
 import base64
 import threading
 import time
 import os
-import csv
-from bs4 import BeautifulSoup
-from PyPDF2 import PdfReader
 import io
+from urllib.parse import quote
+
+# NB: ollama, requests, bs4 e PyPDF2 sono importati dentro le funzioni che li usano
+# (import al primo utilizzo) per non pagarne il costo a ogni avvio/rerun.
+
+import rerun_profiler
+rerun_profiler.begin("yangkidd_pro")  # attivo solo con RERUN_PROFILE=1
+from llm_scheduler import get_scheduler
+from context_serializer import social_context, social_query
+from chat_store import ChatStore, DEFAULT_SESSION
+import workspace
+import storage
+from workspace import connect
+from knowledge_codec import unpack
 
 # --- CONFIGURAZIONE ---
 st.set_page_config(page_title="YANGKIDD ENTERPRISE OS", page_icon="💎", layout="wide")
@@ -32,27 +38,39 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# --- ARTISTA (workspace: un DB per artista) ---
+def _new_artist():
+    name = st.session_state.new_artist.strip()
+    if name:
+        st.session_state.artist = workspace.create(name).name
+    st.session_state.new_artist = ""
+
+with st.sidebar:
+    st.title("💎 ENTERPRISE OS")
+    ARTIST = st.selectbox("🎤 Artista", workspace.artists(), key="artist", disabled=st.session_state.get("thinking", False))
+    with st.expander("➕ Nuovo artista"):
+        st.text_input("Nome", key="new_artist", on_change=_new_artist)
+WS = workspace.get(ARTIST)
+DB = WS.path('yangkidd_pro.db')
+
 # --- DATABASE ---
-def init_advanced_db():
-    conn = sqlite3.connect('yangkidd_pro.db', check_same_thread=False)
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS campaigns (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, platform TEXT, status TEXT, budget REAL, spend REAL, revenue REAL, roas REAL, impressions INTEGER, clicks INTEGER, ctr REAL, streams INTEGER, start_date TEXT, end_date TEXT, notes TEXT)''')
-    c.execute('''CREATE TABLE IF NOT EXISTS chat_history (id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT, role TEXT, content TEXT, timestamp DATETIME DEFAULT CURRENT_TIMESTAMP)''')
-    c.execute('''CREATE TABLE IF NOT EXISTS api_credentials (id INTEGER PRIMARY KEY AUTOINCREMENT, platform TEXT UNIQUE, client_id TEXT, client_secret TEXT, access_token TEXT, refresh_token TEXT, expires_at TEXT)''')
-    c.execute('''CREATE TABLE IF NOT EXISTS knowledge_base (id INTEGER PRIMARY KEY AUTOINCREMENT, source TEXT, content TEXT, added_at DATETIME DEFAULT CURRENT_TIMESTAMP)''')
-    c.execute('''CREATE TABLE IF NOT EXISTS social_stats (id INTEGER PRIMARY KEY AUTOINCREMENT, platform TEXT, metric_type TEXT, value REAL, date_recorded DATE, source_type TEXT)''')
-    conn.commit()
-    conn.close()
-
-init_advanced_db()
+@st.cache_resource
+def init_advanced_db(db):
+    """Migrazioni dello schema comune (storage.py) una sola volta per processo e per shard (non a ogni rerun)"""
+    storage.connect(db).close()
+
+init_advanced_db(DB)
+
+# --- CACHE LETTURE (query + versione tabelle, invalidata dalle scritture) ---
+def cached_read(sql, tables, params=()):
+    """SELECT servita dalla memoria finché le tabelle coinvolte non cambiano (anche da altri processi)"""
+    return storage.cached_read(DB, sql, tables, params)
 
 # --- HELPER PER STATO DATI (NUOVO) ---
 def get_data_health():
-    conn = sqlite3.connect('yangkidd_pro.db', check_same_thread=False)
-    
     # 1. Trova l'ultima data registrata
-    last_date_row = conn.execute("SELECT MAX(date_recorded) FROM social_stats").fetchone()
-    last_date_str = last_date_row[0] if last_date_row and last_date_row[0] else None
+    last = cached_read("SELECT MAX(date_recorded) AS last FROM social_stats", ("social_stats",))
+    last_date_str = last['last'].iloc[0] if not last.empty and pd.notna(last['last'].iloc[0]) else None
     
     # 2. Riepilogo per data e piattaforma (Inventario)
     query = """
@@ -63,9 +81,7 @@ def get_data_health():
     GROUP BY date_recorded, platform 
     ORDER BY date_recorded DESC
     """
-    df_summary = pd.read_sql_query(query, conn)
-    
-    conn.close()
+    df_summary = cached_read(query, ("social_stats",))
     return last_date_str, df_summary
 
 # --- CSV LOADER "UNIVERSALE" ---
@@ -112,7 +128,6 @@ def detect_metric_from_filename(filename):
     return "Unknown"
 
 def save_social_bulk(df, platform, metric_type):
-    conn = sqlite3.connect('yangkidd_pro.db', check_same_thread=False)
     df.columns = [str(c).lower().strip() for c in df.columns]
     date_col = next((c for c in df.columns if "data" in c or "date" in c or "giorno" in c), None)
     if not date_col: return 0, "No Data Col"
@@ -122,7 +137,7 @@ def save_social_bulk(df, platform, metric_type):
         if col != date_col: value_col = col; break
     if not value_col: return 0, "No Value Col"
 
-    cnt = 0
+    rows = []
     errors = 0
     for _, row in df.iterrows():
         try:
@@ -139,93 +154,112 @@ def save_social_bulk(df, platform, metric_type):
             if not raw_val or raw_val.lower() == 'nan': continue
             val = float(raw_val)
 
-            conn.execute("DELETE FROM social_stats WHERE platform=? AND metric_type=? AND date_recorded=?", (platform, metric_type, valid_date))
-            conn.execute("INSERT INTO social_stats (platform, metric_type, value, date_recorded, source_type) VALUES (?,?,?,?,?)", (platform, metric_type, val, valid_date, 'csv_batch'))
-            cnt += 1
+            rows.append((platform, metric_type, valid_date, val))
         except: errors += 1; continue
+    # Un solo executemany di DELETE + INSERT (statement preparati) invece di due query per riga
+    conn = connect(DB)
+    storage.replace_social_stats(conn, rows, 'csv_batch')
     conn.commit(); conn.close()
-    return cnt, f"Err:{errors}"
+    return len(rows), f"Err:{errors}"
 
 def delete_social_stat(stat_id):
-    conn = sqlite3.connect('yangkidd_pro.db', check_same_thread=False)
-    conn.execute("DELETE FROM social_stats WHERE id=?", (stat_id,))
+    conn = connect(DB)
+    storage.delete_social_stat(conn, stat_id)
     conn.commit(); conn.close()
 
 # --- ALTRE FUNZIONI (PDF, ETC) ---
 PDF_FOLDER = "knowledge_docs"
 def ingest_local_pdfs():
+    from PyPDF2 import PdfReader
     if not os.path.exists(PDF_FOLDER): os.makedirs(PDF_FOLDER); return "Cartella creata."
     files = [f for f in os.listdir(PDF_FOLDER) if f.endswith('.pdf')]
     if not files: return "Nessun PDF."
-    conn = sqlite3.connect('yangkidd_pro.db', check_same_thread=False)
+    conn = connect(DB)
     c = 0
     for f in files:
-        if conn.execute("SELECT count(*) FROM knowledge_base WHERE source=?",(f"PDF:{f}",)).fetchone()[0]==0:
+        if not storage.has_knowledge_source(conn, f"PDF:{f}"):
             try:
                 r=PdfReader(os.path.join(PDF_FOLDER,f)); txt="\n".join([p.extract_text() for p in r.pages])
-                conn.execute("INSERT INTO knowledge_base (source,content) VALUES (?,?)",(f"PDF:{f}",txt)); c+=1
+                storage.add_knowledge(conn, f"PDF:{f}", txt); c+=1
             except: pass
     conn.commit(); conn.close(); return f"Importati {c}"
 def scrape_webpage(url):
+    import requests
+    from bs4 import BeautifulSoup
     try:
         r=requests.get(url,headers={'User-Agent':'Mozilla/5.0'},timeout=10)
         s=BeautifulSoup(r.text,'html.parser'); [x.decompose() for x in s(["script","style"])]
         return s.title.string," ".join([p.text for p in s.find_all('p')])
     except Exception as e: return None,str(e)
 def save_knowledge(s,c): 
-    conn=sqlite3.connect('yangkidd_pro.db',check_same_thread=False); conn.execute("INSERT INTO knowledge_base (source,content) VALUES (?,?)",(s,c)); conn.commit(); conn.close()
-def get_knowledge_context():
-    conn=sqlite3.connect('yangkidd_pro.db',check_same_thread=False); r=conn.execute("SELECT source,content FROM knowledge_base").fetchall(); conn.close()
-    return "\n".join([f"-- {x[0]} --\n{x[1][:2000]}" for x in r]) if r else ""
+    conn=connect(DB); storage.add_knowledge(conn, s, c); conn.commit(); conn.close()
+def get_knowledge_context(max_chars=2000):
+    # Si decomprime solo l'inizio di ogni documento (quello che finisce nel prompt)
+    r=cached_read("SELECT source,content FROM knowledge_base", ("knowledge_base",))
+    return "\n".join([f"-- {s} --\n{unpack(c, max_chars)}" for s, c in zip(r['source'], r['content'])]) if not r.empty else ""
 def get_campaigns():
-    conn=sqlite3.connect('yangkidd_pro.db',check_same_thread=False)
-    try: df=pd.read_sql_query("SELECT * FROM campaigns ORDER BY id DESC",conn); return df
-    except: return pd.DataFrame()
-    finally: conn.close()
+    return cached_read("SELECT * FROM campaigns ORDER BY id DESC", ("campaigns",))
 def save_campaign(d):
-    conn=sqlite3.connect('yangkidd_pro.db',check_same_thread=False)
-    conn.execute("INSERT INTO campaigns (name,platform,status,budget,spend,revenue,roas,impressions,clicks,streams) VALUES (?,?,?,?,?,?,?,?,?,?)",
-    (d['name'],d['platform'],'Active',0,d['spend'],d['revenue'],d['revenue']/d['spend'] if d['spend']>0 else 0,d['impressions'],0,d['streams'])); conn.commit(); conn.close()
+    conn=connect(DB)
+    storage.add_campaign(conn, storage.Campaign(d['name'], d['platform'], spend=d['spend'], revenue=d['revenue'], impressions=d['impressions'], streams=d['streams'])); conn.commit(); conn.close()
 class SpotifyAPI:
-    def __init__(self): 
-        conn=sqlite3.connect('yangkidd_pro.db',check_same_thread=False); r=conn.execute("SELECT client_id,client_secret,access_token FROM api_credentials WHERE platform='spotify'").fetchone(); conn.close()
-        self.cid,self.csec,self.tok=r if r else (None,None,None)
+    def __init__(self, artist=None): 
+        self.artist=artist or WS.name
+        conn=connect(DB); self.cid,self.csec,self.tok=storage.get_credentials(conn,'spotify'); conn.close()
     def save(self,i,s): 
-        conn=sqlite3.connect('yangkidd_pro.db',check_same_thread=False); conn.execute("INSERT OR REPLACE INTO api_credentials (platform,client_id,client_secret) VALUES ('spotify',?,?)",(i,s)); conn.commit(); conn.close()
+        conn=connect(DB); storage.save_credentials(conn,'spotify',i,s); conn.commit(); conn.close()
     def get_auth(self): return f"https://accounts.spotify.com/authorize?client_id={self.cid}&response_type=code&redirect_uri=http://127.0.0.1:8501&scope=user-read-private"
     def get_tok(self,code):
+        import requests
         r=requests.post("https://accounts.spotify.com/api/token", headers={'Authorization':f'Basic {base64.b64encode(f"{self.cid}:{self.csec}".encode()).decode()}'}, data={'grant_type':'authorization_code','code':code,'redirect_uri':'http://127.0.0.1:8501'})
         if r.status_code==200: 
-            conn=sqlite3.connect('yangkidd_pro.db',check_same_thread=False); conn.execute("UPDATE api_credentials SET access_token=? WHERE platform='spotify'",(r.json()['access_token'],)); conn.commit(); conn.close(); return True
+            conn=connect(DB); storage.set_access_token(conn,'spotify',r.json()['access_token']); conn.commit(); conn.close(); return True
         return False
     def data(self):
         if not self.tok: return "No Token"
+        import requests
         try: 
-            h={'Authorization':f'Bearer {self.tok}'}; a=requests.get(f"https://api.spotify.com/v1/search?q=YangKidd&type=artist&limit=1",headers=h).json()['artists']['items'][0]
+            h={'Authorization':f'Bearer {self.tok}'}; a=requests.get(f"https://api.spotify.com/v1/search?q={quote(self.artist)}&type=artist&limit=1",headers=h).json()['artists']['items'][0]
             t=requests.get(f"https://api.spotify.com/v1/artists/{a['id']}/top-tracks?market=IT",headers=h).json()['tracks']
             return f"Followers:{a['followers']['total']}, Pop:{a['popularity']}\nTop:{[x['name'] for x in t[:3]]}"
         except: return "Error"
 
-def ai_thread(msgs, sp_ctx, kb_ctx, soc_hist, resp):
+# --- MOTORE AI (modello tenuto caldo, chiamate in coda unica con priorità) ---
+llm = get_scheduler()
+
+chat = ChatStore(DB)  # storico a sessioni dell'artista, letto a pagine
+PROMPT_MESSAGES = 20  # messaggi più recenti passati al modello
+
+def ai_thread(msgs, sp_ctx, kb_ctx, soc_hist, resp, session_id=DEFAULT_SESSION):
     c=get_campaigns(); sp=c['spend'].sum() if not c.empty else 0; rv=c['revenue'].sum() if not c.empty else 0
     sys = f"SEI UN MANAGER. KB:{kb_ctx}. SPOTIFY:{sp_ctx}. ADS: Spend €{sp}, Rev €{rv}. SOCIAL TRENDS:\n{soc_hist}. Analizza correlazione Ads/Organico."
     try:
-        for ch in ollama.chat(model="mistral-nemo", messages=[{'role':'system','content':sys}]+msgs, stream=True):
-            resp['content']+=ch['message']['content']
-        sqlite3.connect('yangkidd_pro.db').execute("INSERT INTO chat_history (session_id,role,content) VALUES ('MAIN','assistant',?)",(resp['content'],)).commit()
+        # Al modello va solo la pagina caricata (ultimi messaggi), senza gli id
+        for text in llm.stream([{'role':'system','content':sys}]+[{'role':m['role'],'content':m['content']} for m in msgs]):
+            resp['content']+=text
+        chat.append(session_id,'assistant',resp['content'])
         resp['done']=True
     except Exception as e: resp['content']+=str(e); resp['done']=True
 
 # --- UI ---
-if 'init' not in st.session_state: st.session_state.update({'init':True,'messages':[],'thinking':False})
-if not st.session_state.messages:
-    conn = sqlite3.connect('yangkidd_pro.db', check_same_thread=False)
-    st.session_state.messages = [{"role":r[0],"content":r[1]} for r in conn.execute("SELECT role,content FROM chat_history WHERE session_id='MAIN'").fetchall()]
-    conn.close()
+if 'init' not in st.session_state: st.session_state.update({'init':True,'messages':[],'thinking':False,'chat_session':DEFAULT_SESSION,'chat_cursor':None,'chat_loaded':False})
+# Cambio artista: la chat riparte dalla sessione principale del suo shard
+if st.session_state.get('chat_artist') != WS.slug: st.session_state.update({'chat_artist':WS.slug,'messages':[],'chat_session':DEFAULT_SESSION,'chat_cursor':None,'chat_loaded':False})
+
+def open_chat(session_id):
+    """Carica solo l'ultima pagina della sessione; le precedenti su richiesta"""
+    chat.compact(session_id)  # thread molto lunghi: i vecchi messaggi vanno nell'archivio compresso
+    st.session_state.messages, st.session_state.chat_cursor = chat.page(session_id)
+    st.session_state.update({'chat_session':session_id,'chat_loaded':True})
+
+if not st.session_state.chat_loaded: open_chat(st.session_state.chat_session)
 
 with st.sidebar:
-    st.title("💎 ENTERPRISE OS")
     nav = st.radio("MENU", ["📈 Social Tracker", "💬 Strategy", "📚 Knowledge", "🔌 API", "⚙️ Ads"])
+    m = llm.metrics()
+    st.caption(f"🧠 {m['active_model']}" + (f" • 1° token ~{m['avg_ttft_ms']/1000:.1f}s" if m['avg_ttft_ms'] else "")
+               + (f" • {m['last_tokens_per_s']} tok/s" if m.get('last_tokens_per_s') else "")
+               + (f" • coda {m['queued']} (attesa p90 {m['interactive_wait_p90_ms']/1000:.1f}s)" if m['queued'] and m['interactive_wait_p90_ms'] else ""))
 
 # --- MODULO SOCIAL TRACKER ---
 if nav == "📈 Social Tracker":
@@ -291,33 +325,43 @@ if nav == "📈 Social Tracker":
 
     # 3. DATABASE COMPLETO
     with st.expander("🗄️ Visualizza Dati Grezzi Completi"):
-        conn = sqlite3.connect('yangkidd_pro.db', check_same_thread=False)
-        history_df = pd.read_sql_query("SELECT * FROM social_stats ORDER BY date_recorded DESC", conn)
-        conn.close()
+        history_df = cached_read("SELECT * FROM social_stats ORDER BY date_recorded DESC", ("social_stats",))
         
         if not history_df.empty:
             st.dataframe(history_df, use_container_width=True)
             if st.button("🗑️ RESET DB SOCIAL"):
-                conn = sqlite3.connect('yangkidd_pro.db', check_same_thread=False)
-                conn.execute("DELETE FROM social_stats")
+                conn = connect(DB)
+                storage.clear_social_stats(conn)
                 conn.commit(); conn.close()
                 st.rerun()
 
 # --- ALTRI MODULI ---
 elif nav == "💬 Strategy":
     st.title("🧠 Strategy Room")
-    if st.button("Reset"): 
-        sqlite3.connect('yangkidd_pro.db').execute("DELETE FROM chat_history WHERE session_id='MAIN'").commit()
-        st.session_state.messages=[]; st.rerun()
+    sid = st.session_state.chat_session
+    sessions = {x['session_id']: x['title'] for x in chat.sessions()}
+    sessions.setdefault(sid, "Nuova sessione")
+    c1,c2,c3,c4 = st.columns([4,1,1,1])
+    pick = c1.selectbox("Sessione", list(sessions), index=list(sessions).index(sid), format_func=lambda k: sessions[k], disabled=st.session_state.thinking)
+    if pick != sid: open_chat(pick); st.rerun()
+    if c2.button("➕ Nuova", disabled=st.session_state.thinking): open_chat(f"S{datetime.now():%Y%m%d-%H%M%S}"); st.rerun()
+    if c3.button("🗄️ Archivia", disabled=st.session_state.thinking):
+        chat.archive(sid); open_chat(DEFAULT_SESSION if sid != DEFAULT_SESSION else f"S{datetime.now():%Y%m%d-%H%M%S}"); st.rerun()
+    if c4.button("Reset", disabled=st.session_state.thinking):
+        chat.clear(sid); open_chat(sid); st.rerun()
+    # Storico precedente solo quando si torna indietro
+    if st.session_state.chat_cursor and st.button("⬆️ Messaggi precedenti"):
+        older, st.session_state.chat_cursor = chat.page(sid, st.session_state.chat_cursor)
+        st.session_state.messages = older + st.session_state.messages; st.rerun()
     for m in st.session_state.messages: st.chat_message(m["role"]).write(m["content"])
     if st.session_state.get('thinking'): st.chat_message("assistant").write(st.session_state.buf['content']+" ▌")
     if p:=st.chat_input():
-        st.session_state.messages.append({"role":"user","content":p})
-        sqlite3.connect('yangkidd_pro.db').execute("INSERT INTO chat_history (session_id,role,content) VALUES ('MAIN','user',?)",(p,)).commit()
+        st.session_state.messages.append({"role":"user","content":p}); chat.append(sid,'user',p)
         st.session_state.update({'thinking':True, 'buf':{'content':'','done':False}})
         sp=SpotifyAPI().data(); kb=get_knowledge_context()
-        conn=sqlite3.connect('yangkidd_pro.db'); soc=pd.read_sql("SELECT * FROM social_stats ORDER BY date_recorded DESC LIMIT 30",conn).to_string(); conn.close()
-        threading.Thread(target=ai_thread, args=(st.session_state.messages, sp, kb, soc, st.session_state.buf)).start()
+        # Serie per metrica riassunte in CSV compatto (ultimo, Δ7/30gg, min/max) invece della tabella grezza
+        soc=social_context(cached_read(social_query(), ("social_stats",)))
+        threading.Thread(target=ai_thread, args=(st.session_state.messages[-PROMPT_MESSAGES:], sp, kb, soc, st.session_state.buf, sid)).start()
         st.rerun()
     if st.session_state.get('thinking') and st.session_state.buf.get('done'):
         st.session_state.thinking=False; st.session_state.messages.append({"role":"assistant","content":st.session_state.buf['content']}); st.rerun()
@@ -326,7 +370,8 @@ elif nav == "💬 Strategy":
 elif nav == "📚 Knowledge":
     st.title("Knowledge"); st.write(ingest_local_pdfs() if st.button("Scan PDF") else "")
     u=st.text_input("URL"); st.write(save_knowledge(*scrape_webpage(u)) if st.button("Scrape") and u else "")
-    conn=sqlite3.connect('yangkidd_pro.db'); k=pd.read_sql("SELECT * FROM knowledge_base",conn); conn.close(); st.dataframe(k)
+    # Anteprima e lunghezza: la lista non legge i blob compressi
+    st.dataframe(cached_read("SELECT id, source, orig_len, preview FROM knowledge_base ORDER BY id DESC", ("knowledge_base",)))
 
 elif nav == "🔌 API":
     s=SpotifyAPI(); st.write(s.data() if s.tok else "No Token")
@@ -341,4 +386,6 @@ elif nav == "⚙️ Ads":
     with st.form("a"):
         n=st.text_input("Name"); s=st.number_input("Spend"); r=st.number_input("Rev")
         if st.form_submit_button("Save"): save_campaign({'name':n,'platform':'Meta','spend':s,'revenue':r,'impressions':0,'streams':0}); st.rerun()
-    st.dataframe(get_campaigns())
\ No newline at end of file
+    st.dataframe(get_campaigns())
+
+rerun_profiler.end()